@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.core import checks as django_checks
+        from django.db.backends.signals import connection_created
+
+        from api import checks, metrics, query_stats, request_timing
+
+        django_checks.register(checks.check_shared_cache, django_checks.Tags.caches)
+
+        connection_created.connect(request_timing.install_db_wrapper)
+        connection_created.connect(query_stats.install_db_wrapper)
+        connection_created.connect(metrics.install_db_wrapper)
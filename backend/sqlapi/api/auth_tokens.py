@@ -0,0 +1,153 @@
+"""
+Signed session tokens and the per-process principal cache.
+
+- issue: token for an account, returned by login ("Authorization: Bearer <token>")
+- authenticate: request -> Principal (account_number, is_admin, is_student) or None
+- revoke: invalidate every token of some accounts (logout, account deletion)
+- requires_principal: view decorator enforcing a token, the admin flag and/or
+  that an account_number URL argument is the caller's own
+
+A token is signed with SECRET_KEY (django.core.signing) and carries the account
+number, the account's session version at issue time and the issue time.
+Resolved principals are kept in an LRU cache per worker keyed by token, for
+AUTH_PRINCIPAL_TTL seconds: a cached token is authorized with one dictionary
+lookup. On a miss the signature and age (AUTH_TOKEN_MAX_AGE) are checked, and
+the flags and the session version are read with one query.
+
+Session versions live in the ACCOUNT_SESSION table (CREATE_TABLE, migration
+0002; an account without a row is at version 0), so every worker sees the same
+version and a restart or cache eviction does not log anyone out. revoke()
+increments the accounts' versions and drops their principals from this
+worker's cache; other workers reject the old tokens once their cached entry
+expires, i.e. within AUTH_PRINCIPAL_TTL seconds.
+"""
+import functools
+from collections import namedtuple
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from rest_framework.response import Response
+
+from api.ttl_cache import TTLCache
+
+
+Principal = namedtuple("Principal", ["account_number", "is_admin", "is_student"])
+
+SALT = "api.auth_tokens"
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS ACCOUNT_SESSION (
+        Account_number INT PRIMARY KEY,
+        Version INT NOT NULL DEFAULT 0
+    )
+"""
+
+_principals = TTLCache(settings.AUTH_PRINCIPAL_CACHE_MAX_ENTRIES, settings.AUTH_PRINCIPAL_TTL)
+
+
+def issue(account_number) -> str:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT Version FROM ACCOUNT_SESSION WHERE Account_number = %s", [account_number]
+        )
+        row = cursor.fetchone()
+    return signing.dumps(
+        {"a": account_number, "v": row[0] if row else 0}, salt=SALT, compress=False
+    )
+
+
+def _resolve(token):
+    try:
+        data = signing.loads(token, salt=SALT, max_age=settings.AUTH_TOKEN_MAX_AGE)
+    except signing.BadSignature:  # includes SignatureExpired
+        return None
+    account_number = data.get("a")
+
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            SELECT a.Admin_flag, a.Student_flag, COALESCE(s.Version, 0)
+            FROM ACCOUNT a
+            LEFT JOIN ACCOUNT_SESSION s ON s.Account_number = a.Account_number
+            WHERE a.Account_number = %s
+        """, [account_number])
+        row = cursor.fetchone()
+    if row is None or data.get("v") != row[2]:
+        return None  # no such account, or revoked
+    return Principal(account_number, bool(row[0]), bool(row[1]))
+
+
+def _bearer(request):
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def authenticate(request):
+    """Principal for the request's bearer token, or None (no token or invalid)."""
+    token = _bearer(request)
+    if token is None:
+        return None
+    principal = _principals.get(token)
+    if principal is None:
+        principal = _resolve(token)
+        if principal is not None:
+            _principals.set(token, principal)
+    return principal
+
+
+def revoke(account_numbers):
+    """
+    Bump the session version of those accounts that exist; the tokens of a
+    deleted account already fail (its ACCOUNT row is gone), so it gets no row.
+    """
+    numbers = sorted(set(account_numbers))
+    if numbers:
+        with connection.cursor() as cursor:
+            cursor.execute(f"""
+                INSERT INTO ACCOUNT_SESSION (Account_number, Version)
+                SELECT Account_number, 1 FROM ACCOUNT
+                WHERE Account_number IN ({", ".join(["%s"] * len(numbers))})
+                ON DUPLICATE KEY UPDATE Version = Version + 1
+            """, numbers)
+    revoked = set(numbers)
+    _principals.evict_if(lambda principal: principal.account_number in revoked)
+
+
+def requires_principal(admin=False, account_kwarg=None, enforce=True):
+    """
+    Authorize a view by bearer token and set request.principal.
+
+    - admin: the principal must have the admin flag
+    - account_kwarg: the principal must own this URL argument's account
+      (admins may access any account)
+    - enforce: whether a request without a token is refused; None follows
+      settings.AUTH_REQUIRE_TOKENS. A token that is sent is always checked.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            required = settings.AUTH_REQUIRE_TOKENS if enforce is None else enforce
+            request.principal = None
+            if _bearer(request) is None and not required:
+                return view(request, *args, **kwargs)
+
+            principal = authenticate(request)
+            if principal is None:
+                return Response(
+                    {"success": False, "message": "Authentication required"}, status=401
+                )
+            if admin and not principal.is_admin:
+                return Response({"success": False, "message": "Admin only"}, status=403)
+            if (
+                account_kwarg is not None and not principal.is_admin
+                and int(kwargs[account_kwarg]) != principal.account_number
+            ):
+                return Response({"success": False, "message": "Not your account"}, status=403)
+
+            request.principal = principal
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
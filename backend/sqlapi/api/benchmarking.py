@@ -0,0 +1,23 @@
+"""
+Helpers shared by the benchmark and advisor management commands.
+
+- percentile: nearest-rank percentile of a list of samples
+- rolled_back: run a block (test client calls) in a transaction that is always
+  rolled back, so benchmarks leave the database as they found it
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+@contextmanager
+def rolled_back(using=DEFAULT_DB_ALIAS):
+    with transaction.atomic(using=using):
+        yield
+        transaction.set_rollback(True, using=using)
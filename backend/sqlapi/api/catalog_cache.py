@@ -0,0 +1,94 @@
+"""
+Versioned cache for the problem/tag catalog.
+
+- get_or_build: return the already-serialized JSON body for (view, key), building and caching it on a miss
+- json_response: wrap a cached body in an HttpResponse
+- cached_response: get_or_build plus an ETag and 304 handling for conditional GETs
+- bump_version: invalidate every cached catalog entry (call after any PROBLEM write)
+
+Bodies live in a bounded in-process LRU. The catalog version lives in the Django
+cache (settings.CACHES), so with a shared backend a bump in one worker invalidates
+the entries held by every other worker on their next read.
+"""
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from api import conditional, fast_json, request_timing, versions
+
+
+_entries = OrderedDict()
+_entries_version = None
+_lock = threading.Lock()
+
+
+def current_version():
+    """Current catalog version, read from the shared Django cache."""
+    return versions.current(versions.CATALOG)
+
+
+def bump_version():
+    versions.bump(versions.CATALOG)
+
+
+def _sync(version):
+    # drop everything cached under an older version
+    global _entries_version
+    if version != _entries_version:
+        _entries.clear()
+        _entries_version = version
+
+
+def get_or_build(view, key, build):
+    """
+    Return the cached JSON body for (view, key). On a miss, call build() and cache
+    the serialized payload it returns. If build() returns None nothing is cached
+    and None is returned (e.g. not found).
+    """
+    version = current_version()
+    with _lock:
+        _sync(version)
+        body = _entries.get((view, key))
+        if body is not None:
+            _entries.move_to_end((view, key))
+            return body
+
+    payload = build()
+    if payload is None:
+        return None
+    with request_timing.span("serialize"):
+        body = fast_json.dumps(payload)
+
+    with _lock:
+        # skip the store if the catalog changed while we were building
+        if _entries_version == version:
+            _entries[(view, key)] = body
+            while len(_entries) > settings.CATALOG_CACHE_MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return body
+
+
+def json_response(body):
+    return HttpResponse(body, content_type="application/json")
+
+
+def cached_response(request, view, key, build):
+    """
+    Serve (view, key) from the catalog cache with a strong ETag. Answers 304 when
+    the client's If-None-Match is current, without touching the cache entry.
+    Returns None when build() finds nothing.
+    """
+    etag = conditional.make_etag("catalog", current_version())
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag)
+
+    body = get_or_build(view, key, build)
+    if body is None:
+        return None
+
+    response = json_response(body)
+    if etag:
+        response["ETag"] = etag
+    return response
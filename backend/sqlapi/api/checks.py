@@ -0,0 +1,22 @@
+"""
+System checks for deployment settings the api app relies on.
+
+- check_shared_cache (registered in ApiConfig.ready): the version counters (api/versions.py) need a cache
+  backend shared by all worker processes
+"""
+from django.core.checks import Warning
+
+from api import versions
+
+
+def check_shared_cache(app_configs, **kwargs):
+    if versions.is_shared():
+        return []
+    return [Warning(
+        "The default cache backend keeps its data in each process.",
+        hint=(
+            "With more than one worker, catalog invalidation and ETags differ between "
+            "workers. Set CACHE_BACKEND to a shared backend (file-based or Redis)."
+        ),
+        id="api.W001",
+    )]
@@ -0,0 +1,42 @@
+"""
+ETag / If-None-Match support for read endpoints.
+
+- make_etag: build a strong ETag from cheap version markers
+- is_not_modified: whether the request's If-None-Match matches the ETag
+- not_modified: the 304 response to send instead of the body
+- etag_headers: response headers carrying the ETag, if any
+
+The version markers come from api/versions.py. When its counters are kept per
+process (see versions.is_shared), each worker would send its own ETag for the
+same content, so make_etag returns None and responses go out without one.
+"""
+from django.http import HttpResponseNotModified
+
+from api import versions
+
+
+def make_etag(*parts):
+    if not versions.is_shared():
+        return None
+    return '"' + "-".join(str(p) for p in parts) + '"'
+
+
+def is_not_modified(request, etag):
+    header = request.headers.get("If-None-Match")
+    if not header or etag is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison, so ignore any W/ prefix
+    candidates = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return etag in candidates
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    return response
+
+
+def etag_headers(etag):
+    return {"ETag": etag} if etag else {}
@@ -0,0 +1,241 @@
+"""
+Server-side grading for submitted SQL answers.
+
+- is_order_sensitive: whether a query's result order matters (top-level ORDER BY)
+- fingerprint_rows: hash a result set, either as an ordered list or as a multiset
+- reference / reference_fingerprint: fingerprint (and tables read) of the SOLUTION
+  query for a problem, computed once and cached
+- grade_submission: run the submitted SQL once and compare its fingerprint with the reference
+- invalidate_reference: drop the cached reference after a solution is added or changed
+
+Queries run against settings.GRADING_DATABASE, a dedicated alias holding the
+fixture dataset (never "default", the live data), inside a transaction that is
+always rolled back and under the GRADING_MAX_EXECUTION_MS statement limit.
+Submissions may read the tables the problem's reference solution reads, plus
+settings.GRADING_ALLOWED_TABLES.
+
+GradingError means a submission could not be graded; GradingUnavailable, a
+subclass, that no submission to the problem can be (no grading database, no
+working reference solution). Neither is a verdict: callers store nothing.
+"""
+import datetime
+import hashlib
+import re
+import threading
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, transaction
+
+from api.sql_guard import is_timeout_error, with_time_limit
+from api.sql_validator import SQLValidationError, validate_sql
+
+
+Fingerprint = namedtuple("Fingerprint", ["ordered", "column_count", "row_count", "digest"])
+# fingerprint of a reference solution and the (unqualified) tables it reads
+Reference = namedtuple("Reference", ["fingerprint", "tables"])
+
+REFERENCE_CACHE_KEY = "grading:reference:v2:{pid}"
+
+_STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`")
+_INNER_PARENS = re.compile(r"\([^()]*\)")
+_ORDER_BY = re.compile(r"\border\s+by\b", re.IGNORECASE)
+
+_NULL = "\x00"
+_FIELD_SEP = "\x1f"
+
+# striped per-problem locks, so a burst of first submissions runs its solution
+# once without holding up reference builds of most other problems
+_REFERENCE_LOCK_STRIPES = 64
+_reference_locks = [threading.Lock() for _ in range(_REFERENCE_LOCK_STRIPES)]
+
+
+class GradingError(Exception):
+    """Raised when a submission cannot be graded (bad SQL, timeout, oversized result)."""
+
+
+class GradingUnavailable(GradingError):
+    """Raised when a problem cannot be graded at all (no grading database or reference)."""
+
+
+def is_order_sensitive(sql: str) -> bool:
+    """
+    True when the statement has an ORDER BY outside any subquery,
+    i.e. the expected result is an ordered list rather than a multiset.
+    """
+    text = _STRING_LITERAL.sub("''", sql)
+    previous = None
+    while previous != text:
+        previous, text = text, _INNER_PARENS.sub("()", text)
+    return bool(_ORDER_BY.search(text))
+
+
+def _normalize_value(value) -> str:
+    if value is None:
+        return _NULL
+    if isinstance(value, (bool, int, float, Decimal)):
+        # COUNT() returns int, SUM()/AVG() return Decimal: compare numerically
+        try:
+            number = Decimal(str(value)).normalize()
+        except InvalidOperation:
+            return str(value)
+        return format(number, "f")
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="replace")
+    return str(value)
+
+
+def _row_digest(row) -> bytes:
+    encoded = _FIELD_SEP.join(_normalize_value(v) for v in row)
+    return hashlib.sha1(encoded.encode("utf-8")).digest()
+
+
+def fingerprint_rows(rows, column_count: int, ordered: bool) -> Fingerprint:
+    """
+    Hash a result set. Column names are ignored so aliases don't matter.
+    - ordered=True:  row order is part of the fingerprint
+    - ordered=False: rows are compared as a multiset (duplicates still count)
+    """
+    digests = [_row_digest(row) for row in rows]
+    if not ordered:
+        digests.sort()
+
+    h = hashlib.sha256()
+    for d in digests:
+        h.update(d)
+
+    return Fingerprint(ordered, column_count, len(digests), h.hexdigest())
+
+
+def _grading_alias() -> str:
+    alias = settings.GRADING_DATABASE
+    if alias == DEFAULT_DB_ALIAS or alias not in settings.DATABASES:
+        raise GradingUnavailable("Grading is not available: no grading database is configured.")
+    return alias
+
+
+def _validate(sql: str, allowed_tables):
+    try:
+        return validate_sql(sql, allowed_tables, using=_grading_alias())
+    except SQLValidationError as e:
+        raise GradingError(str(e))
+
+
+def _run_query(validated):
+    """
+    Execute one validated read-only query on the grading database.
+    Returns (column_count, rows); the transaction is always rolled back.
+    """
+    alias = _grading_alias()
+    max_rows = settings.GRADING_MAX_ROWS
+    sql = with_time_limit(validated, settings.GRADING_MAX_EXECUTION_MS, using=alias)
+
+    with transaction.atomic(using=alias):
+        with connections[alias].cursor() as cursor:
+            try:
+                cursor.execute(sql)
+            except DatabaseError as e:
+                if is_timeout_error(e):
+                    raise GradingError(
+                        f"Query exceeded the {settings.GRADING_MAX_EXECUTION_MS} ms "
+                        "execution limit."
+                    ) from e
+                raise
+            if cursor.description is None:
+                raise GradingError("Query did not return a result set.")
+            column_count = len(cursor.description)
+            rows = cursor.fetchmany(max_rows + 1)
+        transaction.set_rollback(True, using=alias)
+
+    if len(rows) > max_rows:
+        raise GradingError(f"Result set exceeds {max_rows} rows.")
+
+    return column_count, rows
+
+
+def _compute_reference(pid):
+    _grading_alias()  # before anything is read
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT Solution_Description FROM SOLUTION WHERE Problem_ID = %s", [pid]
+        )
+        row = cursor.fetchone()
+
+    if not row or not row[0]:
+        raise GradingUnavailable("No reference solution for this problem.")
+
+    solution_sql = row[0]
+    try:
+        # solutions are trusted to read any table of the fixture dataset
+        validated = _validate(solution_sql, None)
+        column_count, rows = _run_query(validated)
+    except GradingUnavailable:
+        raise
+    except (DatabaseError, GradingError) as e:
+        raise GradingUnavailable(f"Reference solution failed to run: {e}")
+
+    return Reference(
+        fingerprint_rows(rows, column_count, is_order_sensitive(solution_sql)),
+        tuple(sorted(table.rpartition(".")[2] for table in validated.tables)),
+    )
+
+
+def _cached_reference(key):
+    cached = cache.get(key)
+    if cached is None:
+        return None
+    fingerprint, tables = cached
+    return Reference(Fingerprint(*fingerprint), tuple(tables))
+
+
+def reference(pid) -> Reference:
+    """
+    Return the cached fingerprint and tables of the problem's reference
+    solution, computing them on first use.
+    """
+    key = REFERENCE_CACHE_KEY.format(pid=pid)
+    cached = _cached_reference(key)
+    if cached is not None:
+        return cached
+
+    with _reference_locks[hash(pid) % _REFERENCE_LOCK_STRIPES]:
+        cached = _cached_reference(key)
+        if cached is not None:
+            return cached
+
+        result = _compute_reference(pid)
+        cache.set(key, (tuple(result.fingerprint), result.tables), None)
+
+    return result
+
+
+def reference_fingerprint(pid) -> Fingerprint:
+    return reference(pid).fingerprint
+
+
+def invalidate_reference(pid):
+    cache.delete(REFERENCE_CACHE_KEY.format(pid=pid))
+
+
+def grade_submission(pid, sql: str) -> bool:
+    """
+    Grade one submission: a single execution of the student's query
+    plus a fingerprint comparison with the cached reference.
+    Raises GradingError if the submission cannot be graded.
+    """
+    fingerprint, tables = reference(pid)
+    validated = _validate(sql, [*settings.GRADING_ALLOWED_TABLES, *tables])
+
+    try:
+        column_count, rows = _run_query(validated)
+    except DatabaseError as e:
+        raise GradingError(str(e))
+
+    if column_count != fingerprint.column_count or len(rows) != fingerprint.row_count:
+        return False
+
+    return fingerprint_rows(rows, column_count, fingerprint.ordered) == fingerprint
@@ -0,0 +1,36 @@
+"""
+In-process caches for the nl2sql pipeline.
+
+- normalize_question: canonical form of a question used in cache keys
+- question_key: key for generated SQL (normalized question + schema hash + model)
+- sql_cache / result_cache: the shared instances used by chat_views
+"""
+import hashlib
+import re
+import unicodedata
+
+from django.conf import settings
+
+from api.ttl_cache import TTLCache
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """
+    Case-fold, collapse whitespace and drop trailing punctuation so that
+    "How many problems?" and "how many  problems" share a cache entry.
+    """
+    text = unicodedata.normalize("NFKC", question).casefold()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip("?.!; ")
+
+
+def question_key(question: str, schema: str, model: str) -> str:
+    schema_hash = hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+    return f"{model}:{schema_hash}:{normalize_question(question)}"
+
+
+sql_cache = TTLCache(settings.NL2SQL_CACHE_MAX_ENTRIES, settings.NL2SQL_SQL_TTL)
+result_cache = TTLCache(settings.NL2SQL_CACHE_MAX_ENTRIES, settings.NL2SQL_RESULT_TTL)
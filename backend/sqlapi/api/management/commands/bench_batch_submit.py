@@ -0,0 +1,63 @@
+"""
+Compare submission throughput of POST /problems/<pid>/submit/ in a loop against
+one POST /submissions/batch/ with the same entries.
+
+    python manage.py bench_batch_submit --problem-id 1 --account-number 42 --rows 500
+
+Both runs go through the Django test client inside a transaction that is rolled
+back afterwards, so nothing is left in SUBMISSION or the rollups. Every row gets
+a distinct answer (--submission plus a numbered comment), so the batch endpoint
+grades each one like the single submits do; the gap measures the request and
+INSERT overhead, not the batch's grading of identical answers once.
+"""
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api import benchmarking
+
+
+class Command(BaseCommand):
+    help = "Measure rows/sec of single submits vs the batch submission endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--problem-id", type=int, required=True)
+        parser.add_argument("--account-number", type=int, required=True)
+        parser.add_argument("--rows", type=int, default=500)
+        parser.add_argument("--submission", default="SELECT 1",
+                            help="answer text submitted for every row (numbered per row)")
+
+    def handle(self, *args, **options):
+        client = Client()
+        rows = options["rows"]
+        entries = [{
+            "problem_id": options["problem_id"],
+            "account_number": options["account_number"],
+            "submission": f"{options['submission']} /* row {i} */",
+        } for i in range(rows)]
+
+        def single():
+            for entry in entries:
+                response = client.post(f"/problems/{options['problem_id']}/submit/",
+                                       json.dumps(entry), content_type="application/json")
+                if response.status_code != 200:
+                    raise CommandError(f"submit failed: {response.status_code}")
+
+        def batch():
+            body = json.dumps({"submissions": entries})
+            response = client.post("/submissions/batch/", body, content_type="application/json")
+            if response.status_code != 200 or response.json()["inserted"] != rows:
+                raise CommandError(f"batch failed: {response.status_code} {response.content[:200]}")
+
+        timings = {}
+        for label, run in (("single", single), ("batch", batch)):
+            start = time.perf_counter()
+            with benchmarking.rolled_back():
+                run()
+            timings[label] = time.perf_counter() - start
+
+        for label, wall in timings.items():
+            self.stdout.write(f"{label:<7} rows={rows} wall={wall:.2f}s throughput={rows / wall:.0f} rows/s")
+        self.stdout.write(f"speedup: {timings['single'] / timings['batch']:.1f}x")
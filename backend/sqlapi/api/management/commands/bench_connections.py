@@ -0,0 +1,94 @@
+"""
+Compare request latency across DB connection modes (see DB_CONN_MODE in settings).
+
+    python manage.py bench_connections --email a@b.com --password secret --problem-id 1
+
+Each mode runs in its own subprocess (settings are read at startup) and drives
+get_problem and login through the Django test client, so the connection is
+opened/closed/returned exactly as in a real request cycle.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api import benchmarking, catalog_cache
+
+
+MODES = ["none", "persistent", "pooled"]
+
+
+def _summary(samples):
+    return {
+        "mean_ms": statistics.mean(samples),
+        "p50_ms": benchmarking.percentile(samples, 50),
+        "p95_ms": benchmarking.percentile(samples, 95),
+        "p99_ms": benchmarking.percentile(samples, 99),
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark get_problem and login latency under each DB connection mode."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--problem-id", type=int, required=True)
+        parser.add_argument("--email", required=True)
+        parser.add_argument("--password", required=True)
+        parser.add_argument("--modes", default=",".join(MODES))
+        parser.add_argument("--single", action="store_true",
+                            help="run only the current process's mode and print JSON")
+
+    def handle(self, *args, **options):
+        if options["single"]:
+            self.stdout.write(json.dumps(self._run_single(options)))
+            return
+
+        results = {}
+        for mode in options["modes"].split(","):
+            if mode not in MODES:
+                raise CommandError(f"unknown mode: {mode}")
+            env = dict(os.environ, DB_CONN_MODE=mode)
+            proc = subprocess.run(
+                [sys.executable, sys.argv[0], "bench_connections", "--single",
+                 "--requests", str(options["requests"]),
+                 "--problem-id", str(options["problem_id"]),
+                 "--email", options["email"],
+                 "--password", options["password"]],
+                env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                raise CommandError(f"{mode} run failed:\n{proc.stderr}")
+            results[mode] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        self.stdout.write(f"{'mode':<12}{'endpoint':<14}{'mean':>9}{'p50':>9}{'p95':>9}{'p99':>9}  (ms)")
+        for mode, endpoints in results.items():
+            for endpoint, s in endpoints.items():
+                self.stdout.write(
+                    f"{mode:<12}{endpoint:<14}{s['mean_ms']:>9.2f}{s['p50_ms']:>9.2f}"
+                    f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}"
+                )
+
+    def _run_single(self, options):
+        client = Client()
+        problem_url = f"/problems/{options['problem_id']}/"
+        login_body = json.dumps({"email": options["email"], "password": options["password"]})
+
+        timings = {"get_problem": [], "login": []}
+        for _ in range(options["requests"]):
+            # bypass the catalog cache so every call reaches the database
+            catalog_cache.bump_version()
+            start = time.perf_counter()
+            client.get(problem_url)
+            timings["get_problem"].append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            client.post("/auth/login/", login_body, content_type="application/json")
+            timings["login"].append((time.perf_counter() - start) * 1000)
+
+        return {endpoint: _summary(samples) for endpoint, samples in timings.items()}
@@ -0,0 +1,377 @@
+"""
+Benchmark every route in sqlapi/urls.py and write comparable results.
+
+    python manage.py bench_endpoints --seed-scale 0.05 --requests 200 --output bench.json
+    python manage.py bench_endpoints --requests 200 --compare bench.json
+    python manage.py bench_endpoints --server http://127.0.0.1:8000 --output bench.json
+
+Routes are read from the URL resolver and matched to SCENARIOS; a route without a
+scenario is reported as skipped, so a new endpoint shows up in the output the
+day it is added. Each endpoint gets --warmup untimed calls, then --requests timed
+ones, and reports throughput, mean/p50/p95/p99 latency and queries per request.
+
+- test client (default): in-process, so query counts are exact; every call runs
+  in a transaction that is rolled back, so writes (submit, delete, ...) leave
+  the data as it was and can be repeated
+- --server URL: real HTTP against a running server (gunicorn, runserver);
+  latency includes the network stack, query counts are not available, and only
+  read-only routes run unless --include-writes (those writes are kept;
+  destructive routes never run against a server)
+
+--seed-scale first loads test data (api/seeding.py) into the default database,
+which must be a local MySQL stand-in (DB_HOST etc.) unless --force is given.
+The nl2sql routes run with a stubbed LLM, as in loadtest_nl2sql. --cold bumps
+the catalog version before every call so catalog endpoints hit the database.
+
+--output writes the results as JSON (with --label, default the git commit);
+--compare prints the change of each endpoint against such a file.
+"""
+import datetime
+import json
+import statistics
+import subprocess
+import time
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+
+from api import auth_tokens, benchmarking, catalog_cache, llm_cache, seeding
+from api.views import chat_views
+
+
+STUB_SQL = "SELECT COUNT(*) AS n FROM PROBLEM"
+
+# route pattern -> (method, path, JSON body, kind); kind is "read", "write" or
+# "destructive". {pid}, {tag_id}, {account_number}, {email}, {password} come
+# from the database, {n} is the call number (for unique values). Calls send a
+# session token of an admin account (api/auth_tokens.py); auth/logout/ gets a
+# fresh token of {account_number} per call, since it revokes it.
+SCENARIOS = {
+    "auth/signup/": ("POST", "/auth/signup/", {
+        "firstName": "Bench", "lastName": "User",
+        "email": "bench{n}@example.com", "password": "benchpass",
+    }, "write"),
+    "auth/login/": ("POST", "/auth/login/",
+                    {"email": "{email}", "password": "{password}"}, "read"),
+    "auth/logout/": ("POST", "/auth/logout/", None, "destructive"),
+    "profile/<int:account_number>/": ("GET", "/profile/{account_number}/", None, "read"),
+    "profile/<int:account_number>/update/": ("POST", "/profile/{account_number}/update/",
+                                             {"firstName": "Bench", "lastName": "User"}, "write"),
+    "users/": ("GET", "/users/", None, "read"),
+    "users/bulk-delete/": ("POST", "/users/bulk-delete/", {
+        "registered_before": "2100-01-01", "dry_run": True,
+    }, "read"),
+    "users/<int:account_number>/": ("DELETE", "/users/{account_number}/", None, "destructive"),
+    "problems/<int:pid>/update/": ("PUT", "/problems/{pid}/update/", {
+        "title": "Bench problem", "description": "Benchmark update", "tagId": "{tag_id}",
+    }, "write"),
+    "problems/<int:pid>/publish/": ("POST", "/problems/{pid}/publish/", None, "write"),
+    "problems/<int:pid>/delete/": ("DELETE", "/problems/{pid}/delete/", None, "destructive"),
+    "problems/<int:pid>/submit/": ("POST", "/problems/{pid}/submit/", {
+        "account_number": "{account_number}", "submission": "SELECT COUNT(*) FROM PROBLEM",
+    }, "write"),
+    "problems/add/": ("POST", "/problems/add/", {
+        "tag_id": "{tag_id}", "problem_title": "Bench problem {n}",
+        "problem_description": "Benchmark problem",
+    }, "write"),
+    "problems/<int:pid>/": ("GET", "/problems/{pid}/", None, "read"),
+    "problems/": ("GET", "/problems/", None, "read"),
+    "solutions/<int:pId>/": ("GET", "/solutions/{pid}/", None, "read"),
+    "solutions/add/": ("POST", "/solutions/add/",
+                       {"pId": "{pid}", "sDescription": "SELECT 1"}, "write"),
+    "solutions/update/<int:pid>/": ("PUT", "/solutions/update/{pid}/",
+                                    {"sDescription": "SELECT 1"}, "write"),
+    "tags/": ("GET", "/tags/", None, "read"),
+    "tags/<int:tag_id>/problems/": ("GET", "/tags/{tag_id}/problems/", None, "read"),
+    "submissions/batch/": ("POST", "/submissions/batch/", {"submissions": [{
+        "problem_id": "{pid}", "account_number": "{account_number}",
+        "submission": "SELECT COUNT(*) FROM PROBLEM",
+    }] * 50}, "write"),
+    "submissions/buffer/": ("GET", "/submissions/buffer/", None, "read"),
+    "submissions/<int:account_number>/": ("GET", "/submissions/{account_number}/?limit=50",
+                                          None, "read"),
+    "nl2sql/": ("POST", "/nl2sql/", {"question": "bench question {n}"}, "read"),
+    "nl2sql/async/": ("POST", "/nl2sql/async/", {"question": "bench question {n}"}, "read"),
+    "nl2sql/guards/": ("GET", "/nl2sql/guards/", None, "read"),
+    "admin/user-stats/": ("GET", "/admin/user-stats/", None, "read"),
+    "admin/problem-stats/": ("GET", "/admin/problem-stats/", None, "read"),
+    "admin/submission-analytics/": ("GET", "/admin/submission-analytics/?group_by=concept",
+                                    None, "read"),
+    "admin/query-stats/": ("GET", "/admin/query-stats/", None, "read"),
+    "metrics": ("GET", "/metrics", None, "read"),
+}
+
+
+def _fill(value, values):
+    """Substitute placeholders in a body; a value that is exactly "{int field}" stays an int."""
+    if isinstance(value, dict):
+        return {k: _fill(v, values) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, values) for v in value]
+    if isinstance(value, str):
+        filled = value.format(**values)
+        if value.startswith("{") and value.endswith("}") and filled.isdigit():
+            return int(filled)
+        return filled
+    return value
+
+
+def _routes(resolver=None, prefix=""):
+    resolver = resolver or get_resolver()
+    routes = []
+    for entry in resolver.url_patterns:
+        pattern = prefix + str(entry.pattern)
+        if hasattr(entry, "url_patterns"):
+            routes.extend(_routes(entry, pattern))
+        else:
+            routes.append(pattern)
+    return routes
+
+
+def _git_label():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = "Benchmark every route: throughput, latency percentiles and queries per request."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed-scale", type=float,
+                            help="load this scale of test data first (see api/seeding.py)")
+        parser.add_argument("--random-seed", type=int, default=0)
+        parser.add_argument("--force", action="store_true",
+                            help="allow seeding a database that is not on localhost")
+        parser.add_argument("--requests", type=int, default=100, help="timed calls per endpoint")
+        parser.add_argument("--warmup", type=int, default=5, help="untimed calls per endpoint")
+        parser.add_argument("--only", action="append", default=[],
+                            help="substring of the route patterns to run (repeatable)")
+        parser.add_argument("--cold", action="store_true",
+                            help="invalidate the catalog cache before every call")
+        parser.add_argument("--server", help="base URL of a running server instead of the test client")
+        parser.add_argument("--include-writes", action="store_true",
+                            help="with --server, also run (non-destructive) writes; they are kept")
+        parser.add_argument("--label", help="name of this run in the results (default: git commit)")
+        parser.add_argument("--output", help="write results as JSON to this file")
+        parser.add_argument("--compare", help="results JSON of an earlier run to compare against")
+
+    def handle(self, *args, **options):
+        if options["requests"] < 1:
+            raise CommandError("--requests must be at least 1")
+
+        if options["seed_scale"]:
+            try:
+                seeding.check_target(options["force"])
+            except ValueError as e:
+                raise CommandError(str(e))
+            counts = seeding.seed(options["seed_scale"], options["random_seed"])
+            self.stdout.write("seeded " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+
+        values = self._sample_values()
+        results, skipped = {}, []
+
+        original = (chat_views.call_llm_for_sql, chat_views.acall_llm_for_sql)
+        chat_views.call_llm_for_sql = lambda question: STUB_SQL
+
+        async def astub(question):
+            return STUB_SQL
+
+        chat_views.acall_llm_for_sql = astub
+        llm_cache.sql_cache.clear()
+        llm_cache.result_cache.clear()
+        try:
+            for route in _routes():
+                if options["only"] and not any(s in route for s in options["only"]):
+                    continue
+                scenario = SCENARIOS.get(route)
+                if scenario is None:
+                    skipped.append({"route": route, "reason": "no scenario"})
+                    continue
+                method, path, body, kind = scenario
+                if options["server"] and (
+                    kind == "destructive" or (kind == "write" and not options["include_writes"])
+                ):
+                    skipped.append({"route": route, "reason": f"{kind} route against a server"})
+                    continue
+                key = f"{method} {route}"
+                results[key] = self._bench(route, method, path, body, values, options)
+                self._print_line(key, results[key])
+        finally:
+            chat_views.call_llm_for_sql, chat_views.acall_llm_for_sql = original
+
+        for entry in skipped:
+            self.stdout.write(f"skipped {entry['route']}: {entry['reason']}")
+
+        report = {
+            "label": options["label"] or _git_label(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "mode": "server" if options["server"] else "test-client",
+            "server": options["server"],
+            "requests": options["requests"],
+            "warmup": options["warmup"],
+            "cold": options["cold"],
+            "seed_scale": options["seed_scale"],
+            "endpoints": results,
+            "skipped": skipped,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"results written to {options['output']}")
+        if options["compare"]:
+            self._compare(options["compare"], report)
+
+    def _sample_values(self):
+        with connection.cursor() as cursor:
+            def first(sql):
+                cursor.execute(sql)
+                return cursor.fetchone()
+
+            values = {
+                "pid": (first("SELECT MIN(Problem_ID) FROM PROBLEM") or [None])[0],
+                "tag_id": (first("SELECT MIN(Tag_ID) FROM TAG") or [None])[0],
+                "account_number": (first(
+                    "SELECT Account_number FROM SUBMISSION GROUP BY Account_number "
+                    "ORDER BY COUNT(*) DESC LIMIT 1"
+                ) or first("SELECT MIN(Account_number) FROM ACCOUNT") or [None])[0],
+            }
+            admin = first("SELECT MIN(Account_number) FROM ACCOUNT WHERE Admin_flag = 1")
+            login = first("""
+                SELECT a.Email, u.Password FROM ACCOUNT a
+                JOIN USER_AUTH u ON u.Email = a.Email
+                ORDER BY a.Account_number LIMIT 1
+            """)
+        values["email"], values["password"] = login or (None, None)
+        values["admin"] = admin[0] if admin else None
+        values["token"] = auth_tokens.issue(values["admin"]) if values["admin"] else None
+        missing = [k for k, v in values.items() if v is None]
+        if missing:
+            raise CommandError(
+                f"no sample rows for: {', '.join(missing)} (seed the database with --seed-scale)"
+            )
+        return values
+
+    def _bench(self, route, method, path, body, values, options):
+        client = Client() if not options["server"] else httpx.Client(
+            base_url=options["server"].rstrip("/"), timeout=None
+        )
+
+        def call(n):
+            filled = dict(values, n=f"{n}-{time.time_ns()}")
+            url = path.format(**filled)
+            payload = json.dumps(_fill(body, filled)) if body is not None else ""
+            if options["cold"]:
+                catalog_cache.bump_version()
+            token = values["token"]
+            if route == "auth/logout/":
+                token = auth_tokens.issue(values["account_number"])
+
+            if options["server"]:
+                start = time.perf_counter()
+                headers = {"Authorization": f"Bearer {token}"}
+                if payload:
+                    headers["Content-Type"] = "application/json"
+                response = client.request(method, url, content=payload or None, headers=headers)
+                return time.perf_counter() - start, response.status_code, None
+
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                with benchmarking.rolled_back():
+                    auth = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+                    if method == "GET":
+                        response = client.get(url, **auth)
+                    else:
+                        response = getattr(client, method.lower())(
+                            url, payload, content_type="application/json", **auth
+                        )
+                    elapsed = time.perf_counter() - start
+            # the savepoint/transaction statements are the harness's, not the view's
+            queries = sum(
+                1 for q in captured.captured_queries
+                if not q["sql"].upper().startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK"))
+            )
+            return elapsed, response.status_code, queries
+
+        try:
+            for n in range(options["warmup"]):
+                call(f"w{n}")
+            samples = []
+            wall_start = time.perf_counter()
+            for n in range(options["requests"]):
+                samples.append(call(n))
+            wall = time.perf_counter() - wall_start
+        finally:
+            if options["server"]:
+                client.close()
+            if route == "auth/logout/":
+                # the revocation is not rolled back; a shared admin account needs a new token
+                values["token"] = auth_tokens.issue(values["admin"])
+
+        latencies = [s[0] * 1000 for s in samples]
+        queries = [s[2] for s in samples if s[2] is not None]
+        statuses = {}
+        for s in samples:
+            statuses[str(s[1])] = statuses.get(str(s[1]), 0) + 1
+        return {
+            "route": route,
+            "method": method,
+            "requests": len(samples),
+            "errors": sum(1 for s in samples if s[1] >= 400),
+            "statuses": statuses,
+            "throughput": len(samples) / wall,
+            "mean_ms": statistics.mean(latencies),
+            "p50_ms": benchmarking.percentile(latencies, 50),
+            "p95_ms": benchmarking.percentile(latencies, 95),
+            "p99_ms": benchmarking.percentile(latencies, 99),
+            "queries_mean": statistics.mean(queries) if queries else None,
+            "queries_max": max(queries) if queries else None,
+        }
+
+    def _print_line(self, key, r):
+        queries = "" if r["queries_mean"] is None else (
+            f" queries={r['queries_mean']:.1f} (max {r['queries_max']})"
+        )
+        self.stdout.write(
+            f"{key:<48} {r['throughput']:8.1f} req/s  mean={r['mean_ms']:.1f}ms "
+            f"p50={r['p50_ms']:.1f}ms p95={r['p95_ms']:.1f}ms p99={r['p99_ms']:.1f}ms"
+            f"{queries} errors={r['errors']}"
+        )
+
+    def _compare(self, path, report):
+        try:
+            with open(path) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"cannot read {path}: {e}")
+
+        def change(new, old):
+            if new is None or old in (None, 0):
+                return "    n/a"
+            return f"{(new - old) / old * 100:+6.1f}%"
+
+        self.stdout.write(f"\ncompared with {baseline.get('label') or path}:")
+        for key, new in report["endpoints"].items():
+            old = baseline.get("endpoints", {}).get(key)
+            if old is None:
+                self.stdout.write(f"{key:<48} new endpoint")
+                continue
+            queries = ""
+            if new["queries_mean"] is not None and old.get("queries_mean") is not None:
+                queries = f" queries {old['queries_mean']:.1f} -> {new['queries_mean']:.1f}"
+            self.stdout.write(
+                f"{key:<48} throughput {change(new['throughput'], old.get('throughput'))} "
+                f"p50 {change(new['p50_ms'], old.get('p50_ms'))} "
+                f"p95 {change(new['p95_ms'], old.get('p95_ms'))} "
+                f"p99 {change(new['p99_ms'], old.get('p99_ms'))}{queries}"
+            )
+        for key in baseline.get("endpoints", {}):
+            if key not in report["endpoints"]:
+                self.stdout.write(f"{key:<48} not run")
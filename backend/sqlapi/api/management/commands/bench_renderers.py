@@ -0,0 +1,129 @@
+"""
+Compare JSON rendering cost of the stock renderers against api/fast_json.py.
+
+    python manage.py bench_renderers
+    python manage.py bench_renderers --rows 10000 --rows 100000 --repeat 5
+
+For each list endpoint, synthetic rows with the same keys and value types as
+the view returns are rendered by:
+
+- JsonResponse: django.http.JsonResponse with DjangoJSONEncoder
+- drf:          rest_framework JSONRenderer (what Response uses by default)
+- fast:         fast_json.dumps (FastJSONRenderer / FastJsonResponse)
+
+Only serialization is timed (no database), best of --repeat runs.
+"""
+import datetime
+import decimal
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import JsonResponse
+from rest_framework.renderers import JSONRenderer
+
+from api import fast_json
+
+
+def _problems(n):
+    concepts = ["Join", "Group by", "Subquery"]
+    return [{
+        "pId": i,
+        "pTitle": f"Problem {i}",
+        "difficultyTag": ["Easy", "Medium", "Hard"][i % 3],
+        "conceptTag": concepts[: i % 3 + 1],
+        "pDescription": "Return the number of rows in PROBLEM for each review status.",
+        "pSolutionId": i % 30 + 1,
+        "reviewed": bool(i % 2),
+    } for i in range(n)]
+
+
+def _submissions(n):
+    start = datetime.datetime(2025, 1, 1, 9, 0)
+    return {"results": [{
+        "submission_id": i,
+        "problem_id": i % 2000,
+        "is_correct": i % 3 == 0,
+        "time_start": start + datetime.timedelta(minutes=i),
+        "time_end": start + datetime.timedelta(minutes=i, seconds=90),
+    } for i in range(n)], "next_cursor": None}
+
+
+def _users(n):
+    return [{
+        "accountNumber": i,
+        "firstName": f"First{i}",
+        "lastName": f"Last{i}",
+        "email": f"user{i}@example.com",
+        "isStudent": 1,
+        "isAdmin": 0,
+        "registerDate": datetime.date(2025, 1, 1) + datetime.timedelta(days=i % 365),
+    } for i in range(n)]
+
+
+def _user_stats(n):
+    return [{
+        "Account_number": i,
+        "Email": f"user{i}@example.com",
+        "First_name": f"First{i}",
+        "Last_name": f"Last{i}",
+        "total_submissions": i % 500,
+        "correct_submissions": decimal.Decimal(i % 250),
+    } for i in range(n)]
+
+
+def _problem_stats(n):
+    return [{
+        "Problem_ID": i,
+        "Problem_description": "Return the number of rows in PROBLEM for each review status.",
+        "Difficulty_level": ["EASY", "MEDIUM", "HARD"][i % 3],
+        "SQL_concept": "JOIN",
+        "submission_count": decimal.Decimal(i % 5000),
+        "correct_submissions": decimal.Decimal(i % 2500),
+    } for i in range(n)]
+
+
+DATASETS = {
+    "list_problems": _problems,
+    "list_submissions": _submissions,
+    "list_users": _users,
+    "admin_user_stats": _user_stats,
+    "admin_problem_stats": _problem_stats,
+}
+
+RENDERERS = {
+    "JsonResponse": lambda data: JsonResponse(data, safe=False).content,
+    "drf": lambda data: JSONRenderer().render(data),
+    "fast": fast_json.dumps,
+}
+
+
+class Command(BaseCommand):
+    help = "Time JSON rendering of large list responses with each renderer."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, action="append",
+                            help="row counts to test (repeatable, default 10000 and 100000)")
+        parser.add_argument("--repeat", type=int, default=3, help="runs per case (best is reported)")
+
+    def handle(self, *args, **options):
+        sizes = options["rows"] or [10000, 100000]
+        for view, make in DATASETS.items():
+            for size in sizes:
+                data = make(size)
+                timings = {}
+                for name, render in RENDERERS.items():
+                    best = None
+                    for _ in range(max(options["repeat"], 1)):
+                        start = time.perf_counter()
+                        body = render(data)
+                        elapsed = time.perf_counter() - start
+                        best = elapsed if best is None else min(best, elapsed)
+                    timings[name] = (best, len(body))
+
+                baseline = min(timings["JsonResponse"][0], timings["drf"][0])
+                self.stdout.write(
+                    f"{view:<20} rows={size:<7} " + "  ".join(
+                        f"{name}={seconds * 1000:.1f}ms" for name, (seconds, _) in timings.items()
+                    ) + f"  size={timings['fast'][1] / 1024:.0f}KiB"
+                    f"  speedup={baseline / timings['fast'][0]:.1f}x"
+                )
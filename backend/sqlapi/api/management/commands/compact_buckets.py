@@ -0,0 +1,20 @@
+"""
+Fold old daily submission buckets into weekly ones (see api/rollups.py).
+
+    python manage.py compact_buckets
+
+Meant to run daily (e.g. from cron). Only whole weeks that ended more than
+ANALYTICS_DAILY_RETENTION_DAYS ago are compacted.
+"""
+from django.core.management.base import BaseCommand
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    help = "Compact SUBMISSION_DAILY buckets older than the retention window into SUBMISSION_WEEKLY."
+
+    def handle(self, *args, **options):
+        cutoff = rollups.daily_cutoff()
+        compacted = rollups.compact_buckets(cutoff)
+        self.stdout.write(f"compacted {compacted} daily buckets before {cutoff}")
@@ -0,0 +1,67 @@
+"""
+Generate synthetic data at production-like volumes (see api/seeding.py).
+
+    python manage.py generate_data                      # 20k accounts, 2k problems, ~2M submissions
+    python manage.py generate_data --scale 0.1 --seed 7
+    python manage.py generate_data --accounts 50000 --problems 3000 --submissions-per-account 60
+
+Rows are added to what is already there, so run it on an empty database for
+reproducible results: the same --seed and --end-date give the same rows.
+Only a local database (DB_HOST localhost / 127.0.0.1) is accepted unless --force.
+"""
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import seeding
+
+
+class Command(BaseCommand):
+    help = "Bulk-load synthetic accounts, problems, submissions and attempts for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=float, default=1.0,
+                            help=f"multiplies the base volumes ({seeding.BASE_ACCOUNTS} accounts, "
+                                 f"{seeding.BASE_PROBLEMS} problems)")
+        parser.add_argument("--accounts", type=int, help="number of accounts (overrides --scale)")
+        parser.add_argument("--problems", type=int, help="number of problems (overrides --scale)")
+        parser.add_argument("--submissions-per-account", type=int,
+                            help=f"mean submissions per student (default {seeding.SUBMISSIONS_PER_ACCOUNT})")
+        parser.add_argument("--days", type=int, default=365, help="length of the generated history")
+        parser.add_argument("--end-date", type=datetime.date.fromisoformat,
+                            help="last day of the history, YYYY-MM-DD (default today)")
+        parser.add_argument("--seed", type=int, default=0, help="random seed")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="rows per INSERT")
+        parser.add_argument("--force", action="store_true",
+                            help="allow a database that is not on localhost")
+
+    def handle(self, *args, **options):
+        if options["scale"] <= 0 or options["chunk_size"] < 1 or options["days"] < 1:
+            raise CommandError("--scale, --chunk-size and --days must be positive")
+        try:
+            seeding.check_target(options["force"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        start = time.perf_counter()
+
+        def progress(table, rows):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"  {table}: {rows} rows ({elapsed:.0f}s)")
+
+        counts = seeding.seed(
+            scale=options["scale"],
+            random_seed=options["seed"],
+            accounts=options["accounts"],
+            problems=options["problems"],
+            submissions_per_account=options["submissions_per_account"],
+            days=options["days"],
+            end_date=options["end_date"],
+            chunk_size=options["chunk_size"],
+            progress=progress,
+        )
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        self.stdout.write(", ".join(f"{table}={rows}" for table, rows in counts.items()))
+        self.stdout.write(f"{total} rows in {elapsed:.1f}s ({total / elapsed:.0f} rows/s)")
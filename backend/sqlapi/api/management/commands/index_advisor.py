@@ -0,0 +1,284 @@
+"""
+EXPLAIN the SQL behind the hot endpoints and suggest indexes.
+
+    python manage.py index_advisor
+    python manage.py index_advisor --problem-id 1 --account-number 42 --json
+
+Every endpoint in HOT_ENDPOINTS is called through the Django test client inside a
+transaction that is rolled back, and the statements it runs are captured, so the
+advisor sees exactly the SQL the views send (no copy to drift). Each distinct
+SELECT / UPDATE / DELETE is then EXPLAINed on the same database. Plan steps with a
+full table scan (type ALL), "Using filesort" or "Using temporary" are flagged,
+and scans of tables above --min-rows get an index proposal built from the
+columns the query filters, joins and sorts that table on.
+
+The endpoints include writes (a submit, a user deletion), so only a local MySQL
+stand-in is accepted unless --force is given: point DB_HOST / DB_NAME / DB_USER /
+DB_PASSWORD / DB_PORT at it and seed it with test data first. Requests carry the
+token of an admin account, as the admin routes require one. An endpoint that
+raises or answers with a non-2xx status is reported and skipped; the others are
+still explained, and the command then exits with an error.
+"""
+import json
+import re
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from api import auth_tokens, benchmarking, catalog_cache, seeding
+
+
+# (method, path, JSON body); {pid}, {tag_id} and {account_number} are filled in
+HOT_ENDPOINTS = [
+    ("GET", "/problems/", None),
+    ("GET", "/problems/?difficulty=EASY&limit=20", None),
+    ("GET", "/problems/{pid}/", None),
+    ("GET", "/tags/", None),
+    ("GET", "/tags/{tag_id}/problems/", None),
+    ("GET", "/solutions/{pid}/", None),
+    ("GET", "/profile/{account_number}/", None),
+    ("GET", "/users/", None),
+    ("GET", "/submissions/{account_number}/", None),
+    ("GET", "/submissions/{account_number}/?limit=50", None),
+    ("GET", "/admin/user-stats/", None),
+    ("GET", "/admin/problem-stats/", None),
+    ("GET", "/admin/submission-analytics/?group_by=concept", None),
+    ("POST", "/problems/{pid}/submit/",
+     {"account_number": "{account_number}", "submission": "SELECT 1"}),
+    ("DELETE", "/users/{account_number}/", None),
+]
+
+EXPLAINABLE = re.compile(r"^\s*(select|update|delete)\b", re.IGNORECASE)
+TABLE_REF = re.compile(
+    r"\b(?:from|join|update)\s+([A-Za-z_]\w*)(?:\s+(?:as\s+)?([A-Za-z_]\w*))?",
+    re.IGNORECASE,
+)
+NOT_ALIAS = {
+    "on", "where", "join", "left", "right", "inner", "outer", "cross", "group",
+    "order", "limit", "set", "using", "union", "having", "straight_join",
+}
+CLAUSE_END = r"(?=\bgroup\s+by\b|\border\s+by\b|\blimit\b|\bhaving\b|\bunion\b|\)|$)"
+
+
+def _aliases(sql):
+    """alias (lower-case) -> table name, including each table as its own alias."""
+    aliases = {}
+    for table, alias in TABLE_REF.findall(sql):
+        aliases[table.lower()] = table
+        if alias and alias.lower() not in NOT_ALIAS:
+            aliases[alias.lower()] = table
+    return aliases
+
+
+def _columns_for(sql, alias, single_table):
+    """
+    Columns of one table used in the statement, in index order:
+    equality predicates, then ranges, then ORDER BY columns.
+    """
+    prefix = rf"\b{re.escape(alias)}\." if not single_table else r"(?:\b\w+\.)?\b"
+    where_part = " ".join(
+        m.group(1) for m in re.finditer(rf"\b(?:where|on)\b(.*?){CLAUSE_END}", sql,
+                                        re.IGNORECASE | re.DOTALL)
+    )
+    order_part = " ".join(
+        m.group(1) for m in re.finditer(rf"\border\s+by\b(.*?)(?=\blimit\b|\)|$)", sql,
+                                        re.IGNORECASE | re.DOTALL)
+    )
+
+    equality = re.findall(rf"{prefix}([A-Za-z_]\w*)\s*(?:=|\bIN\b|<=>)", where_part, re.IGNORECASE)
+    # join predicates written the other way round (x.col = alias.col)
+    equality += re.findall(rf"(?<![<>!])=\s*{prefix}([A-Za-z_]\w*)", where_part, re.IGNORECASE)
+    ranges = re.findall(rf"{prefix}([A-Za-z_]\w*)\s*(?:<=|>=|<|>|\bBETWEEN\b|\bLIKE\b)",
+                        where_part, re.IGNORECASE)
+    ordering = re.findall(rf"{prefix}([A-Za-z_]\w*)", order_part)
+
+    columns = []
+    for name in equality + ranges + ordering:
+        if name.upper() in ("AND", "OR", "NOT", "NULL", "ASC", "DESC", "TRUE", "FALSE"):
+            continue
+        if name.lower() not in (c.lower() for c in columns):
+            columns.append(name)
+    return columns[:4]
+
+
+def _propose(table, columns):
+    if not columns:
+        return None
+    name = f"idx_{table.lower()}_{'_'.join(c.lower() for c in columns)}"[:64]
+    return f"CREATE INDEX {name} ON {table} ({', '.join(columns)});"
+
+
+def _explain(sql):
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN " + sql)
+        names = [col[0].lower() for col in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the SQL run by the hot endpoints, flag scans/filesorts and propose indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--problem-id", type=int,
+                            help="problem used in URLs (default: lowest Problem_ID)")
+        parser.add_argument("--account-number", type=int,
+                            help="account used in URLs (default: account with most submissions)")
+        parser.add_argument("--tag-id", type=int, help="tag used in URLs (default: lowest Tag_ID)")
+        parser.add_argument("--min-rows", type=int, default=1000,
+                            help="only propose indexes for scans estimated above this many rows")
+        parser.add_argument("--json", action="store_true", help="print the report as JSON")
+        parser.add_argument("--force", action="store_true",
+                            help="allow running the endpoints against a database that is not on localhost")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "mysql":
+            raise CommandError("index_advisor needs a MySQL database (EXPLAIN output is MySQL's)")
+        try:
+            seeding.check_target(options["force"])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        values = self._sample_values(options)
+        statements, failures = self._capture(values)
+
+        report = []
+        proposals = OrderedDict()
+        for sql, endpoints in statements.items():
+            try:
+                plan = _explain(sql)
+            except Exception as e:
+                report.append({"sql": sql, "endpoints": endpoints, "error": str(e)})
+                continue
+
+            aliases = _aliases(sql)
+            single_table = len({t.lower() for t in aliases.values()}) == 1
+            findings = []
+            for step in plan:
+                table_alias = step.get("table") or ""
+                extra = step.get("extra") or ""
+                rows = int(step.get("rows") or 0)
+                issues = []
+                if step.get("type") == "ALL":
+                    issues.append("full scan")
+                if "Using filesort" in extra:
+                    issues.append("filesort")
+                if "Using temporary" in extra:
+                    issues.append("temporary")
+                if not issues:
+                    continue
+
+                finding = {"table": table_alias, "rows": rows, "issues": issues}
+                table = aliases.get(table_alias.lower())
+                if table and rows >= options["min_rows"]:
+                    ddl = _propose(table, _columns_for(sql, table_alias, single_table))
+                    if ddl:
+                        finding["proposal"] = ddl
+                        proposals.setdefault(ddl, []).extend(endpoints)
+                findings.append(finding)
+
+            report.append({"sql": sql, "endpoints": endpoints, "findings": findings})
+
+        if options["json"]:
+            self.stdout.write(json.dumps(
+                {"statements": report, "proposals": list(proposals)}, indent=2, default=str
+            ))
+        else:
+            self._print(report, proposals)
+        if failures:
+            raise CommandError(
+                f"{len(failures)} endpoint(s) failed, their SQL is missing above: "
+                + "; ".join(failures)
+            )
+
+    def _sample_values(self, options):
+        with connection.cursor() as cursor:
+            def first(sql):
+                cursor.execute(sql)
+                row = cursor.fetchone()
+                return row[0] if row else None
+
+            values = {
+                "pid": options["problem_id"] or first("SELECT MIN(Problem_ID) FROM PROBLEM"),
+                "tag_id": options["tag_id"] or first("SELECT MIN(Tag_ID) FROM TAG"),
+                "account_number": options["account_number"] or first(
+                    "SELECT Account_number FROM SUBMISSION GROUP BY Account_number "
+                    "ORDER BY COUNT(*) DESC LIMIT 1"
+                ) or first("SELECT MIN(Account_number) FROM ACCOUNT"),
+                "admin": first("SELECT MIN(Account_number) FROM ACCOUNT WHERE Admin_flag = 1"),
+            }
+        missing = [k for k, v in values.items() if v is None]
+        if missing:
+            raise CommandError(f"no sample rows for: {', '.join(missing)} (seed the database first)")
+        return values
+
+    def _capture(self, values):
+        """
+        Call each endpoint (rolled back) as the admin account. Returns the
+        distinct statements -> endpoints, and the endpoints that failed.
+        """
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {auth_tokens.issue(values['admin'])}")
+        statements = OrderedDict()
+        failures = []
+        for method, path, body in HOT_ENDPOINTS:
+            url = path.format(**values)
+            label = f"{method} {url}"
+            payload = None
+            if body is not None:
+                payload = json.dumps({
+                    k: (int(v.format(**values)) if v.startswith("{") else v)
+                    for k, v in body.items()
+                })
+
+            # bypass the catalog cache so catalog endpoints reach the database
+            catalog_cache.bump_version()
+            with CaptureQueriesContext(connection) as captured:
+                try:
+                    with benchmarking.rolled_back():
+                        if method == "GET":
+                            response = client.get(url)
+                        else:
+                            response = getattr(client, method.lower())(
+                                url, payload or "", content_type="application/json"
+                            )
+                except Exception as e:
+                    failures.append(f"{label} raised {e!r}")
+                    self.stderr.write(failures[-1])
+                    continue
+            if not 200 <= response.status_code < 300:
+                failures.append(f"{label} returned {response.status_code}")
+                self.stderr.write(failures[-1])
+                continue
+
+            for query in captured.captured_queries:
+                sql = query["sql"]
+                if EXPLAINABLE.match(sql):
+                    statements.setdefault(sql, [])
+                    if label not in statements[sql]:
+                        statements[sql].append(label)
+        return statements, failures
+
+    def _print(self, report, proposals):
+        flagged = 0
+        for entry in report:
+            if not entry.get("findings") and not entry.get("error"):
+                continue
+            flagged += 1
+            self.stdout.write(", ".join(entry["endpoints"]))
+            self.stdout.write("  " + " ".join(entry["sql"].split())[:200])
+            if entry.get("error"):
+                self.stdout.write(f"  EXPLAIN failed: {entry['error']}")
+            for finding in entry.get("findings", []):
+                line = f"  - {finding['table']}: {', '.join(finding['issues'])} (~{finding['rows']} rows)"
+                if finding.get("proposal"):
+                    line += f"\n      {finding['proposal']}"
+                self.stdout.write(line)
+            self.stdout.write("")
+
+        self.stdout.write(f"{len(report)} statements explained, {flagged} flagged")
+        if proposals:
+            self.stdout.write("\nProposed indexes:")
+            for ddl, endpoints in proposals.items():
+                self.stdout.write(f"  {ddl}    -- {len(set(endpoints))} endpoint(s)")
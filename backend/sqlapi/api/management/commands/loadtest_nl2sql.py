@@ -0,0 +1,112 @@
+"""
+Load test for the sync and async nl2sql views with a stubbed LLM.
+
+    python manage.py loadtest_nl2sql --requests 200 --llm-latency 1.0 --sync-workers 8
+
+The LLM call is replaced by a sleep of --llm-latency seconds (time.sleep for the
+sync view, asyncio.sleep for the async one) so no API key or spend is needed.
+Every request uses a distinct question and SQL, so neither nl2sql cache helps.
+
+- sync:  --sync-workers threads (a gthread worker's capacity) call POST /nl2sql/
+- async: all requests are in flight at once against POST /nl2sql/async/ through
+         the ASGI application, bounded by --concurrency
+"""
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from api import benchmarking, llm_cache
+from api.views import chat_views
+
+
+def _stub_sql(question):
+    # "loadtest <mode> <n>" -> a unique, trivially cheap query
+    return f"SELECT {question.rsplit(' ', 1)[-1]} AS n"
+
+
+class Command(BaseCommand):
+    help = "Compare sync and async nl2sql throughput under concurrent load with a stubbed LLM."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--llm-latency", type=float, default=1.0,
+                            help="seconds the stubbed LLM call takes")
+        parser.add_argument("--sync-workers", type=int, default=8,
+                            help="threads serving the sync view")
+        parser.add_argument("--concurrency", type=int, default=1000,
+                            help="max in-flight requests for the async view")
+
+    def handle(self, *args, **options):
+        latency = options["llm_latency"]
+
+        def stub_llm(question):
+            time.sleep(latency)
+            return _stub_sql(question)
+
+        async def astub_llm(question):
+            await asyncio.sleep(latency)
+            return _stub_sql(question)
+
+        original = (chat_views.call_llm_for_sql, chat_views.acall_llm_for_sql)
+        chat_views.call_llm_for_sql = stub_llm
+        chat_views.acall_llm_for_sql = astub_llm
+        try:
+            self._report("sync", *self._run_sync(options))
+            self._report("async", *self._run_async(options))
+        finally:
+            chat_views.call_llm_for_sql, chat_views.acall_llm_for_sql = original
+
+    def _run_sync(self, options):
+        llm_cache.sql_cache.clear()
+        llm_cache.result_cache.clear()
+
+        def one(i):
+            client = Client()
+            start = time.perf_counter()
+            response = client.post("/nl2sql/", {"question": f"loadtest sync {i}"},
+                                   content_type="application/json")
+            return time.perf_counter() - start, response.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["sync_workers"]) as pool:
+            results = list(pool.map(one, range(options["requests"])))
+        return time.perf_counter() - start, results
+
+    def _run_async(self, options):
+        llm_cache.sql_cache.clear()
+        llm_cache.result_cache.clear()
+        app = get_asgi_application()
+
+        async def run():
+            limit = asyncio.Semaphore(options["concurrency"])
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://testserver",
+                                         timeout=None) as client:
+                async def one(i):
+                    async with limit:
+                        start = time.perf_counter()
+                        response = await client.post("/nl2sql/async/",
+                                                     json={"question": f"loadtest async {i}"})
+                        return time.perf_counter() - start, response.status_code
+
+                start = time.perf_counter()
+                results = await asyncio.gather(*(one(i) for i in range(options["requests"])))
+                return time.perf_counter() - start, results
+
+        return asyncio.run(run())
+
+    def _report(self, label, wall, results):
+        latencies = [r[0] * 1000 for r in results]
+        errors = sum(1 for r in results if r[1] != 200)
+        self.stdout.write(
+            f"{label:<6} requests={len(results)} errors={errors} wall={wall:.2f}s "
+            f"throughput={len(results) / wall:.1f} req/s "
+            f"mean={statistics.mean(latencies):.0f}ms "
+            f"p50={benchmarking.percentile(latencies, 50):.0f}ms p99={benchmarking.percentile(latencies, 99):.0f}ms"
+        )
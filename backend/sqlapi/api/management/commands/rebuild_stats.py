@@ -0,0 +1,23 @@
+"""
+Backfill the admin dashboard rollups (see api/rollups.py) from SUBMISSION.
+
+    python manage.py rebuild_stats
+
+The tables come from migration 0003; run this once on a database that already
+had submissions. Safe to re-run at any time to correct drift; the recount
+happens in a single transaction.
+"""
+from django.core.management.base import BaseCommand
+
+from api import rollups, versions
+
+
+class Command(BaseCommand):
+    help = "Recompute the rollup tables from SUBMISSION."
+
+    def handle(self, *args, **options):
+        account_rows, problem_rows = rollups.rebuild()
+        versions.bump(versions.SUBMISSIONS)
+        self.stdout.write(
+            f"ACCOUNT_STATS: {account_rows} rows, PROBLEM_STATS: {problem_rows} rows"
+        )
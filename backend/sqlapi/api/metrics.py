@@ -0,0 +1,326 @@
+"""
+Prometheus metrics shared across worker processes.
+
+- Counter / Histogram: metrics with labels, kept in memory per process
+- MetricsMiddleware: request count and latency per route in sqlapi/urls.py
+- install_db_wrapper: query count and latency per database alias
+  (connected to connection_created in ApiConfig.ready)
+- render: the text exposition of all workers' metrics, for GET /metrics
+
+Every process writes a snapshot of its values to METRICS_DIR/<pid>.json every
+METRICS_WRITE_INTERVAL seconds (and at exit); a scrape, which lands on one
+gunicorn worker, adds up the snapshots of all of them. Snapshots of processes
+that are gone are folded into archive.json so their counts are kept. Clear
+METRICS_DIR when the service is redeployed to start the counters from zero.
+"""
+import atexit
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from api import processes
+
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+LLM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+
+_registry = {}
+_lock = threading.Lock()
+# {(name, label values): value} for counters,
+# {(name, label values): [bucket counts..., sum, count]} for histograms
+_values = {}
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        _registry[name] = self
+
+    def inc(self, *label_values, amount=1):
+        key = (self.name, tuple(str(v) for v in label_values))
+        with _lock:
+            _values[key] = _values.get(key, 0) + amount
+        _ensure_writer()
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=REQUEST_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        _registry[name] = self
+
+    def observe(self, seconds, *label_values):
+        key = (self.name, tuple(str(v) for v in label_values))
+        with _lock:
+            slots = _values.get(key)
+            if slots is None:
+                slots = _values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    slots[i] += 1
+                    break
+            slots[-2] += seconds
+            slots[-1] += 1
+        _ensure_writer()
+
+
+http_requests = Counter(
+    "sqlapi_http_requests_total", "HTTP requests by route and status",
+    ("method", "route", "status"),
+)
+http_latency = Histogram(
+    "sqlapi_http_request_duration_seconds", "HTTP request latency by route",
+    ("method", "route"), REQUEST_BUCKETS,
+)
+db_latency = Histogram(
+    "sqlapi_db_query_duration_seconds", "Database statement latency (count = statements)",
+    ("db",), DB_BUCKETS,
+)
+db_errors = Counter("sqlapi_db_errors_total", "Database statements that raised", ("db",))
+llm_latency = Histogram(
+    "sqlapi_llm_request_duration_seconds", "nl2sql LLM call latency", ("mode",), LLM_BUCKETS,
+)
+llm_tokens = Counter("sqlapi_llm_tokens_total", "nl2sql LLM tokens used", ("kind",))
+llm_errors = Counter("sqlapi_llm_errors_total", "nl2sql LLM calls that failed", ("mode",))
+submissions = Counter(
+    "sqlapi_submissions_total", "Graded submissions accepted", ("endpoint", "correct"),
+)
+submission_rows = Counter(
+    "sqlapi_submission_rows_written_total", "Rows written to SUBMISSION", ("path",),
+)
+
+
+# -- snapshots -------------------------------------------------------------
+
+_writer_pid = None
+_writer_lock = threading.Lock()
+
+
+def _path(name):
+    return os.path.join(settings.METRICS_DIR, name)
+
+
+def _dump():
+    with _lock:
+        return [[name, list(labels), value] for (name, labels), value in _values.items()]
+
+
+def _write_snapshot():
+    data = json.dumps(_dump())
+    tmp = _path(f"{os.getpid()}.json.tmp")
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, _path(f"{os.getpid()}.json"))
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+def _merge(into, entries):
+    for name, labels, value in entries:
+        key = (name, tuple(labels))
+        if isinstance(value, list):
+            current = into.setdefault(key, [0] * len(value))
+            for i, v in enumerate(value):
+                current[i] += v
+        else:
+            into[key] = into.get(key, 0) + value
+
+
+@contextmanager
+def _archive_lock():
+    """Serialise archiving and reading the snapshots across processes."""
+    with open(_path("archive.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _archive_dead(reused_pid=None):
+    """
+    Fold the snapshots of exited processes into archive.json (and that of
+    reused_pid, a pid taken over by a new process). Call with _archive_lock held.
+    """
+    dead = []
+    for name in os.listdir(settings.METRICS_DIR):
+        pid = name.split(".")[0]
+        if not name.endswith(".json") or not pid.isdigit():
+            continue
+        if int(pid) == reused_pid or (int(pid) != os.getpid() and not processes.pid_alive(int(pid))):
+            dead.append(name)
+    if not dead:
+        return
+    archive = {}
+    _merge(archive, _load(_path("archive.json")))
+    for name in dead:
+        _merge(archive, _load(_path(name)))
+    tmp = _path("archive.json.tmp")
+    with open(tmp, "w") as f:
+        json.dump([[n, list(l), v] for (n, l), v in archive.items()], f)
+    os.replace(tmp, _path("archive.json"))
+    # removed only once the archive holds their counts
+    for name in dead:
+        os.remove(_path(name))
+
+
+def _writer_loop():
+    while True:
+        time.sleep(settings.METRICS_WRITE_INTERVAL)
+        try:
+            _write_snapshot()
+        except OSError:
+            pass
+
+
+def _ensure_writer():
+    """Start the snapshot thread of this process (after a fork, once per worker)."""
+    global _writer_pid
+    if _writer_pid == os.getpid() or not settings.METRICS_DIR:
+        return
+    with _writer_lock:
+        if _writer_pid == os.getpid():
+            return
+        if _writer_pid is not None:
+            # forked: the parent's values belong to the parent's snapshot
+            with _lock:
+                _values.clear()
+        _writer_pid = os.getpid()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        with _archive_lock():
+            _archive_dead(reused_pid=os.getpid())
+        threading.Thread(target=_writer_loop, name="metrics-writer", daemon=True).start()
+        atexit.register(_write_snapshot)
+
+
+def collect():
+    """{(name, label values): value} summed over every process."""
+    if not settings.METRICS_DIR:
+        totals = {}
+        _merge(totals, _dump())
+        return totals
+
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    _write_snapshot()
+    totals = {}
+    # under the lock, so a snapshot being folded into archive.json by another
+    # worker is counted exactly once
+    with _archive_lock():
+        _archive_dead()
+        for name in os.listdir(settings.METRICS_DIR):
+            if name.endswith(".json"):
+                _merge(totals, _load(_path(name)))
+    return totals
+
+
+# -- exposition ------------------------------------------------------------
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs += [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    totals = collect()
+    lines = []
+    for name, metric in _registry.items():
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        series = sorted((labels, value) for (n, labels), value in totals.items() if n == name)
+        for labels, value in series:
+            if metric.kind == "counter":
+                lines.append(f"{name}{_labels(metric.labels, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets, value):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_labels(metric.labels, labels, [('le', bound)])} {cumulative}"
+                )
+            lines.append(
+                f"{name}_bucket{_labels(metric.labels, labels, [('le', '+Inf')])} {value[-1]}"
+            )
+            lines.append(f"{name}_sum{_labels(metric.labels, labels)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(metric.labels, labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+# -- instrumentation -------------------------------------------------------
+
+def _db_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    alias = context["connection"].alias
+    try:
+        return execute(sql, params, many, context)
+    except Exception:
+        db_errors.inc(alias)
+        raise
+    finally:
+        db_latency.observe(time.perf_counter() - start, alias)
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    return match.route if match else "<unmatched>"
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, response, start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, start)
+        return response
+
+    def _observe(self, request, response, start):
+        route = _route(request)
+        http_latency.observe(time.perf_counter() - start, request.method, route)
+        http_requests.inc(request.method, route, response.status_code)
@@ -0,0 +1,57 @@
+from django.db import migrations
+
+INDEX_NAME = "idx_submission_account_time"
+
+
+def _submission_indexes(cursor):
+    """Index names on SUBMISSION, or None if the table does not exist."""
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.TABLES "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'SUBMISSION'"
+    )
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'SUBMISSION'"
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        indexes = _submission_indexes(cursor)
+        # a fresh database (or the test database) has no SUBMISSION yet; the
+        # seeding schema creates the table with this index
+        if indexes is None or INDEX_NAME in indexes:
+            return
+        cursor.execute(
+            f"CREATE INDEX {INDEX_NAME} "
+            "ON SUBMISSION (Account_number, Time_start, Submission_ID)"
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "mysql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        indexes = _submission_indexes(cursor)
+        if indexes and INDEX_NAME in indexes:
+            cursor.execute(f"DROP INDEX {INDEX_NAME} ON SUBMISSION")
+
+
+class Migration(migrations.Migration):
+    """
+    Index for list_submissions: one account's submissions newest first, with
+    keyset pagination on (Time_start, Submission_ID).
+    SUBMISSION is not a Django model (nor created by a migration), so the index
+    is added only where the table already exists.
+    """
+
+    dependencies = []
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,24 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Session versions of the signed tokens (api/auth_tokens.py), shared by all
+    workers. ACCOUNT_SESSION is not a Django model, so it is created with raw SQL.
+    """
+
+    dependencies = [
+        ("api", "0001_submission_history_index"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS ACCOUNT_SESSION (
+                    Account_number INT PRIMARY KEY,
+                    Version INT NOT NULL DEFAULT 0
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS ACCOUNT_SESSION",
+        ),
+    ]
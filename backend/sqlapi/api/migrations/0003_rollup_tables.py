@@ -0,0 +1,61 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Rollup tables of the admin dashboards (api/rollups.py), which every submit
+    updates. Created empty; on a database that already has submissions run
+    `python manage.py rebuild_stats` once to backfill them.
+    Not Django models, so they are created with raw SQL.
+    """
+
+    dependencies = [
+        ("api", "0002_account_session"),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS ACCOUNT_STATS (
+                    Account_number INT PRIMARY KEY,
+                    Total_submissions INT NOT NULL DEFAULT 0,
+                    Correct_submissions INT NOT NULL DEFAULT 0
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS ACCOUNT_STATS",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS PROBLEM_STATS (
+                    Problem_ID INT PRIMARY KEY,
+                    Submission_count INT NOT NULL DEFAULT 0,
+                    Correct_submissions INT NOT NULL DEFAULT 0
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS PROBLEM_STATS",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS SUBMISSION_DAILY (
+                    Bucket_date DATE NOT NULL,
+                    Problem_ID INT NOT NULL,
+                    Submission_count INT NOT NULL DEFAULT 0,
+                    Correct_submissions INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (Bucket_date, Problem_ID)
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS SUBMISSION_DAILY",
+        ),
+        migrations.RunSQL(
+            sql="""
+                CREATE TABLE IF NOT EXISTS SUBMISSION_WEEKLY (
+                    Week_start DATE NOT NULL,
+                    Problem_ID INT NOT NULL,
+                    Submission_count INT NOT NULL DEFAULT 0,
+                    Correct_submissions INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (Week_start, Problem_ID)
+                )
+            """,
+            reverse_sql="DROP TABLE IF EXISTS SUBMISSION_WEEKLY",
+        ),
+    ]
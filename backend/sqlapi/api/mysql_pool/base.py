@@ -0,0 +1,134 @@
+"""
+MySQL database backend with a per-worker connection pool.
+
+Use ENGINE = "api.mysql_pool" and a POOL entry in the database settings:
+
+    "POOL": {"SIZE": 5, "MAX_AGE": 300, "PRE_PING": True}
+
+- SIZE:     idle connections kept per worker process
+- MAX_AGE:  seconds before a physical connection is recycled
+- PRE_PING: ping a pooled connection before handing it out; dead ones are dropped
+
+Django still closes its connection at the end of each request (CONN_MAX_AGE = 0),
+but close() hands the socket back to the pool instead of tearing it down, so the
+next request skips the TCP + auth handshake.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db.backends.mysql import base
+
+
+class ConnectionPool:
+    def __init__(self, size, max_age, pre_ping):
+        self.size = size
+        self.max_age = max_age
+        self.pre_ping = pre_ping
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def _expired(self, conn):
+        return time.monotonic() - conn._pool_created_at > self.max_age
+
+    def _discard(self, conn):
+        self.discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self, connect):
+        while True:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+
+            if conn is None:
+                conn = connect()
+                conn._pool_created_at = time.monotonic()
+                self.created += 1
+                return conn
+
+            if self._expired(conn):
+                self._discard(conn)
+                continue
+            if self.pre_ping:
+                try:
+                    conn.ping(False)
+                except Exception:
+                    self._discard(conn)
+                    continue
+
+            self.reused += 1
+            return conn
+
+    def release(self, conn):
+        if self._expired(conn):
+            self._discard(conn)
+            return
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        self._discard(conn)
+
+    def stats(self):
+        return {
+            "idle": len(self._idle),
+            "created": self.created,
+            "reused": self.reused,
+            "discarded": self.discarded,
+        }
+
+
+# one pool per (process, alias); a forked worker must not reuse its parent's sockets
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    key = (os.getpid(), alias)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = settings_dict.get("POOL", {})
+            pool = ConnectionPool(
+                size=options.get("SIZE", 5),
+                max_age=options.get("MAX_AGE", 300),
+                pre_ping=options.get("PRE_PING", True),
+            )
+            _pools[key] = pool
+    return pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        parent = super()
+        return self.pool.acquire(lambda: parent.get_new_connection(conn_params))
+
+    def init_connection_state(self):
+        # session settings survive on a pooled connection; only run them once
+        if getattr(self.connection, "_pool_initialized", False):
+            return
+        super().init_connection_state()
+        self.connection._pool_initialized = True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        if self.errors_occurred or self.closed_in_transaction:
+            # don't hand a possibly broken connection to the next request
+            self.pool._discard(self.connection)
+            return
+        with self.wrap_database_errors:
+            if self.in_atomic_block or not self.autocommit:
+                self.connection.rollback()
+        self.pool.release(self.connection)
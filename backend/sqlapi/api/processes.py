@@ -0,0 +1,56 @@
+"""
+Liveness of the worker processes that own files in a shared directory
+(write-behind journal segments, metrics snapshots).
+
+- pid_alive: whether any process has the pid
+- owner_token: "<pid>-<incarnation>" naming this process; the incarnation is the
+  process start time from /proc (a random id where that is unavailable), so a
+  new process that gets an old pid, e.g. a restarted container, has a new token
+- owner_alive: whether the process that a token names is still running
+"""
+import os
+import uuid
+
+
+_own = (None, None)  # (pid, token), recomputed after a fork
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _start_time(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # field 22 (starttime); the fields after the parenthesized command name start at 3
+    return stat.rpartition(")")[2].split()[19]
+
+
+def owner_token() -> str:
+    global _own
+    pid = os.getpid()
+    if _own[0] != pid:
+        _own = (pid, f"{pid}-{_start_time(pid) or uuid.uuid4().hex[:16]}")
+    return _own[1]
+
+
+def owner_alive(token: str) -> bool:
+    pid, _, incarnation = token.partition("-")
+    if not pid.isdigit() or not incarnation:
+        return False
+    if int(pid) == os.getpid():
+        return token == owner_token()
+    if not pid_alive(int(pid)):
+        return False
+    started = _start_time(int(pid))
+    # without /proc a live pid is taken to be the same process
+    return started is None or started == incarnation
@@ -0,0 +1,43 @@
+"""
+Parsing of query-string parameters shared by the list endpoints.
+
+- parse_bool: "true"/"false" (also 1/0, yes/no) -> bool, missing -> None
+- encode_cursor / decode_cursor: opaque, URL-safe keyset cursor for a
+  (datetime, id) sort key
+
+A ValueError means the parameter is malformed; the views answer it with a 400.
+"""
+import base64
+import datetime
+
+
+def parse_bool(value):
+    if value is None or value == "":
+        return None
+    lowered = value.strip().lower()
+    if lowered in ("1", "true", "yes"):
+        return True
+    if lowered in ("0", "false", "no"):
+        return False
+    raise ValueError(f"invalid boolean: {value}")
+
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def encode_cursor(moment, row_id):
+    # naive UTC (TIME_ZONE) microseconds since the epoch: no "+" or ":" reaches the URL
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    micros = (moment - _EPOCH) // datetime.timedelta(microseconds=1)
+    return base64.urlsafe_b64encode(f"{micros}:{row_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(value):
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        micros, row_id = (int(part) for part in raw.split(":"))
+    except (ValueError, UnicodeDecodeError):  # binascii.Error is a ValueError
+        raise ValueError(f"invalid cursor: {value}")
+    moment = _EPOCH + datetime.timedelta(microseconds=micros)
+    return moment, row_id
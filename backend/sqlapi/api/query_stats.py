@@ -0,0 +1,166 @@
+"""
+Per-statement database statistics, grouped by normalized fingerprint.
+
+- fingerprint: a statement with literals, placeholders and IN/VALUES lists
+  replaced, so "WHERE id = 3" and "WHERE id = 7" count as one query
+- install_db_wrapper: time every statement on a connection (connected to
+  connection_created in ApiConfig.ready)
+- top: the top-N fingerprints by total time, count, mean or max latency
+- reset: clear the statistics of this worker
+
+Each worker keeps count, total/max time and a latency histogram per fingerprint
+(at most QUERY_STATS_MAX_FINGERPRINTS; later new ones are counted under
+OVERFLOW). Statements slower than SLOW_QUERY_MS are logged to the
+"api.slow_query" logger. For the unbuffered nl2sql cursor, the time is that of
+execute(), not of fetching the rows.
+"""
+import bisect
+import functools
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+
+
+logger = logging.getLogger("api.slow_query")
+
+# histogram upper bounds in ms; the last bucket is everything above
+BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+OVERFLOW = "<other statements>"
+ORDERS = ("total", "count", "mean", "max")
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%s|\?")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\([^()]*\)(?:\s*,\s*\([^()]*\))*", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=4096)
+def fingerprint(sql):
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub("VALUES (...)", sql)
+    return _SPACE.sub(" ", sql).strip().rstrip(";")
+
+
+class _Stat:
+    __slots__ = ("count", "total", "max", "buckets", "sample")
+
+    def __init__(self, sample):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.sample = sample
+
+
+_stats = {}
+_lock = threading.Lock()
+_since = time.time()
+
+
+def record(sql, ms):
+    key = fingerprint(sql)
+    with _lock:
+        stat = _stats.get(key)
+        if stat is None:
+            if len(_stats) >= settings.QUERY_STATS_MAX_FINGERPRINTS:
+                key = OVERFLOW
+                stat = _stats.get(key)
+            if stat is None:
+                stat = _stats[key] = _Stat(sql[:1000])
+        stat.count += 1
+        stat.total += ms
+        if ms > stat.max:
+            stat.max = ms
+        stat.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        record(sql, ms)
+        if ms >= settings.SLOW_QUERY_MS > 0:
+            logger.warning(json.dumps({
+                "ms": round(ms, 2),
+                "fingerprint": fingerprint(sql),
+                "sql": sql[:2000],
+                "db": context["connection"].alias,
+            }))
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def _percentile(buckets, count, pct):
+    """Upper bound (ms) of the histogram bucket holding the pct-th percentile."""
+    threshold = pct / 100 * count
+    seen = 0
+    for bound, n in zip(BUCKETS_MS, buckets):
+        seen += n
+        if seen >= threshold:
+            return bound
+    return None  # above the last bound
+
+
+def top(limit=20, order="total"):
+    with _lock:
+        items = [
+            (key, stat.count, stat.total, stat.max, list(stat.buckets), stat.sample)
+            for key, stat in _stats.items()
+        ]
+
+    sort_key = {
+        "total": lambda item: item[2],
+        "count": lambda item: item[1],
+        "mean": lambda item: item[2] / item[1],
+        "max": lambda item: item[3],
+    }[order]
+    items.sort(key=sort_key, reverse=True)
+
+    results = []
+    for key, count, total, max_ms, buckets, sample in items[:limit]:
+        results.append({
+            "fingerprint": key,
+            "count": count,
+            "total_ms": round(total, 2),
+            "mean_ms": round(total / count, 2),
+            "max_ms": round(max_ms, 2),
+            "p50_ms": _percentile(buckets, count, 50),
+            "p95_ms": _percentile(buckets, count, 95),
+            "p99_ms": _percentile(buckets, count, 99),
+            "histogram": {
+                **{f"le_{bound}": n for bound, n in zip(BUCKETS_MS, buckets)},
+                "inf": buckets[-1],
+            },
+            "sample": sample,
+        })
+    return {
+        "pid": os.getpid(),
+        "since": _since,
+        "fingerprints": len(items),
+        "statements": sum(item[1] for item in items),
+        "total_ms": round(sum(item[2] for item in items), 2),
+        "order": order,
+        "top": results,
+    }
+
+
+def reset():
+    global _since
+    with _lock:
+        _stats.clear()
+        _since = time.time()
@@ -0,0 +1,155 @@
+"""
+Per-request timing: query count, DB time, view time and render time.
+
+- RequestTimingMiddleware: times a sample of requests (REQUEST_TIMING_SAMPLE_RATE),
+  adds a Server-Timing header and logs one JSON line to the "api.timing" logger
+- install_db_wrapper: count and time every statement of a timed request
+  (connected to connection_created in ApiConfig.ready)
+- span: time a named phase of the current request (e.g. serialization inside
+  a view); a no-op when the request is not sampled
+
+view is the time from the view being called until it returns; render is the
+time Django spends rendering a deferred response afterwards (DRF Response).
+JsonResponse and the catalog cache serialize inside the view, which span()
+reports separately. Rows a streaming response fetches after the view returns
+are not included.
+
+The DB wrapper is always installed and costs one context variable lookup per
+statement when the request is not sampled.
+"""
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+logger = logging.getLogger("api.timing")
+
+_current = contextvars.ContextVar("request_timing", default=None)
+
+
+class Timing:
+    __slots__ = ("start", "view_start", "view_end", "queries", "db", "spans")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.view_start = None
+        self.view_end = None
+        self.queries = 0
+        self.db = 0.0
+        self.spans = {}
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.db += time.perf_counter() - start
+        timing.queries += 1
+
+
+def install_db_wrapper(sender, connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+@contextmanager
+def span(name):
+    timing = _current.get()
+    if timing is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.spans[name] = timing.spans.get(name, 0.0) + time.perf_counter() - start
+
+
+def _sampled():
+    rate = settings.REQUEST_TIMING_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not _sampled():
+            return self.get_response(request)
+        timing = Timing()
+        token = _current.set(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, timing)
+        return response
+
+    async def __acall__(self, request):
+        if not _sampled():
+            return await self.get_response(request)
+        timing = Timing()
+        token = _current.set(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._finish(request, response, timing)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timing = _current.get()
+        if timing is not None:
+            timing.view_start = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # called after the view returns, before the response is rendered
+        timing = _current.get()
+        if timing is not None:
+            timing.view_end = time.perf_counter()
+        return response
+
+    def _finish(self, request, response, timing):
+        end = time.perf_counter()
+        view_end = timing.view_end or end
+        phases = {
+            "db": timing.db,
+            "view": view_end - timing.view_start if timing.view_start else 0.0,
+            "render": end - timing.view_end if timing.view_end else 0.0,
+            "total": end - timing.start,
+        }
+        phases.update(timing.spans)
+
+        header = ", ".join(
+            f"{name};dur={seconds * 1000:.1f}" for name, seconds in phases.items()
+        )
+        response["Server-Timing"] = f'{header}, queries;desc="{timing.queries}"'
+
+        match = getattr(request, "resolver_match", None)
+        logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "route": match.route if match else None,
+            "status": response.status_code,
+            "queries": timing.queries,
+            **{f"{name}_ms": round(seconds * 1000, 2) for name, seconds in phases.items()},
+        }))
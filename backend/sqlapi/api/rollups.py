@@ -0,0 +1,275 @@
+"""
+Rollup tables for the admin dashboards.
+
+- ACCOUNT_STATS: total and correct submissions per account
+- PROBLEM_STATS: total and correct submissions per problem
+- SUBMISSION_DAILY / SUBMISSION_WEEKLY: submissions per problem bucketed by the
+  day / week (Monday) of Time_start
+- record_submission(s): count new submissions (call in the INSERT's transaction)
+- remove_account_submissions: take accounts' submissions out of the rollups
+  (call before deleting them, in the same transaction)
+- compact_buckets: fold daily buckets of whole weeks older than
+  settings.ANALYTICS_DAILY_RETENTION_DAYS into weekly buckets
+- rebuild: recompute the tables from SUBMISSION (backfill or drift repair)
+
+New submissions always land in a daily bucket; a week's total is the sum of its
+weekly bucket and any daily buckets in it not yet compacted. Submissions dated
+before daily_cutoff() are refused (ValueError from record_submissions): their
+day may already be compacted, and a recreated daily bucket would make
+remove_account_submissions take their week's counts from the wrong bucket.
+
+The tables are created by migration 0003 (CREATE_TABLES is the same DDL, for
+the seeding schema). On a database that already had submissions, backfill them
+once with `python manage.py rebuild_stats`; `python manage.py compact_buckets`
+should run daily.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from api import versions
+
+
+CREATE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS ACCOUNT_STATS (
+        Account_number INT PRIMARY KEY,
+        Total_submissions INT NOT NULL DEFAULT 0,
+        Correct_submissions INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS PROBLEM_STATS (
+        Problem_ID INT PRIMARY KEY,
+        Submission_count INT NOT NULL DEFAULT 0,
+        Correct_submissions INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS SUBMISSION_DAILY (
+        Bucket_date DATE NOT NULL,
+        Problem_ID INT NOT NULL,
+        Submission_count INT NOT NULL DEFAULT 0,
+        Correct_submissions INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (Bucket_date, Problem_ID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS SUBMISSION_WEEKLY (
+        Week_start DATE NOT NULL,
+        Problem_ID INT NOT NULL,
+        Submission_count INT NOT NULL DEFAULT 0,
+        Correct_submissions INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (Week_start, Problem_ID)
+    )
+    """,
+]
+
+# Monday of the week containing a DATE expression
+WEEK_START_SQL = "DATE_SUB({col}, INTERVAL WEEKDAY({col}) DAY)"
+
+
+def week_start(day: datetime.date) -> datetime.date:
+    return day - datetime.timedelta(days=day.weekday())
+
+
+def _upsert_counts(cursor, table, key_columns, count_column, counts):
+    """
+    Add {key tuple: [total, correct]} to a rollup table with one multi-row upsert.
+    """
+    if not counts:
+        return
+    columns = list(key_columns) + [count_column, "Correct_submissions"]
+    row = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    args = []
+    for key, (total, correct) in counts.items():
+        args.extend(key)
+        args.extend([total, correct])
+    cursor.execute(f"""
+        INSERT INTO {table} ({", ".join(columns)})
+        VALUES {", ".join([row] * len(counts))}
+        ON DUPLICATE KEY UPDATE
+            {count_column} = {count_column} + VALUES({count_column}),
+            Correct_submissions = Correct_submissions + VALUES(Correct_submissions)
+    """, args)
+
+
+def record_submissions(cursor, submissions):
+    """
+    Count new submissions, given as (account_number, pid, is_correct, time_start)
+    tuples; each rollup gets a single multi-row upsert. Raises ValueError if a
+    time_start is before daily_cutoff().
+    """
+    cutoff = daily_cutoff()
+    by_account, by_problem, by_day = {}, {}, {}
+    for account_number, pid, is_correct, time_start in submissions:
+        if time_start.date() < cutoff:
+            raise ValueError(f"submissions before {cutoff.isoformat()} can no longer be recorded")
+        correct = 1 if is_correct else 0
+        for counts, key in (
+            (by_account, (account_number,)),
+            (by_problem, (pid,)),
+            (by_day, (time_start.date(), pid)),
+        ):
+            totals = counts.setdefault(key, [0, 0])
+            totals[0] += 1
+            totals[1] += correct
+
+    _upsert_counts(cursor, "ACCOUNT_STATS", ["Account_number"], "Total_submissions", by_account)
+    _upsert_counts(cursor, "PROBLEM_STATS", ["Problem_ID"], "Submission_count", by_problem)
+    _upsert_counts(
+        cursor, "SUBMISSION_DAILY", ["Bucket_date", "Problem_ID"], "Submission_count", by_day
+    )
+
+
+def record_submission(cursor, account_number, pid, is_correct, time_start):
+    record_submissions(cursor, [(account_number, pid, is_correct, time_start)])
+
+
+def remove_account_submissions(cursor, account_numbers):
+    placeholders = ", ".join(["%s"] * len(account_numbers))
+    cursor.execute(f"""
+        UPDATE PROBLEM_STATS ps
+        JOIN (
+            SELECT
+                Problem_ID,
+                COUNT(*) AS submission_count,
+                SUM(CASE WHEN Is_correct = TRUE THEN 1 ELSE 0 END) AS correct_submissions
+            FROM SUBMISSION
+            WHERE Account_number IN ({placeholders})
+            GROUP BY Problem_ID
+        ) s ON ps.Problem_ID = s.Problem_ID
+        SET
+            ps.Submission_count = ps.Submission_count - s.submission_count,
+            ps.Correct_submissions = ps.Correct_submissions - s.correct_submissions
+    """, list(account_numbers))
+    # a submission is counted in its daily bucket if that still exists,
+    # otherwise it has been compacted into the weekly one
+    cursor.execute(f"""
+        UPDATE SUBMISSION_DAILY b
+        JOIN (
+            SELECT
+                DATE(Time_start) AS bucket_date,
+                Problem_ID,
+                COUNT(*) AS submission_count,
+                SUM(CASE WHEN Is_correct = TRUE THEN 1 ELSE 0 END) AS correct_submissions
+            FROM SUBMISSION
+            WHERE Account_number IN ({placeholders})
+            GROUP BY DATE(Time_start), Problem_ID
+        ) s ON b.Bucket_date = s.bucket_date AND b.Problem_ID = s.Problem_ID
+        SET
+            b.Submission_count = b.Submission_count - s.submission_count,
+            b.Correct_submissions = b.Correct_submissions - s.correct_submissions
+    """, list(account_numbers))
+    cursor.execute(f"""
+        UPDATE SUBMISSION_WEEKLY b
+        JOIN (
+            SELECT
+                {WEEK_START_SQL.format(col="DATE(sub.Time_start)")} AS week_start,
+                sub.Problem_ID,
+                COUNT(*) AS submission_count,
+                SUM(CASE WHEN sub.Is_correct = TRUE THEN 1 ELSE 0 END) AS correct_submissions
+            FROM SUBMISSION sub
+            LEFT JOIN SUBMISSION_DAILY d
+                ON d.Bucket_date = DATE(sub.Time_start) AND d.Problem_ID = sub.Problem_ID
+            WHERE sub.Account_number IN ({placeholders}) AND d.Problem_ID IS NULL
+            GROUP BY week_start, sub.Problem_ID
+        ) s ON b.Week_start = s.week_start AND b.Problem_ID = s.Problem_ID
+        SET
+            b.Submission_count = b.Submission_count - s.submission_count,
+            b.Correct_submissions = b.Correct_submissions - s.correct_submissions
+    """, list(account_numbers))
+    cursor.execute(
+        f"DELETE FROM ACCOUNT_STATS WHERE Account_number IN ({placeholders})",
+        list(account_numbers),
+    )
+
+
+def daily_cutoff(today=None) -> datetime.date:
+    """
+    First day still kept as daily buckets: the Monday of the week that contains
+    today - ANALYTICS_DAILY_RETENTION_DAYS. Everything before it is compacted.
+    """
+    today = today or datetime.date.today()
+    return week_start(today - datetime.timedelta(days=settings.ANALYTICS_DAILY_RETENTION_DAYS))
+
+
+def compact_buckets(cutoff=None):
+    """
+    Move daily buckets before cutoff (a Monday) into weekly buckets.
+    Returns the number of daily rows compacted.
+    """
+    cutoff = cutoff or daily_cutoff()
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"""
+            INSERT INTO SUBMISSION_WEEKLY (Week_start, Problem_ID, Submission_count, Correct_submissions)
+            SELECT
+                {WEEK_START_SQL.format(col="Bucket_date")} AS week_start,
+                Problem_ID,
+                SUM(Submission_count),
+                SUM(Correct_submissions)
+            FROM SUBMISSION_DAILY
+            WHERE Bucket_date < %s
+            GROUP BY week_start, Problem_ID
+            ON DUPLICATE KEY UPDATE
+                Submission_count = SUBMISSION_WEEKLY.Submission_count + VALUES(Submission_count),
+                Correct_submissions = SUBMISSION_WEEKLY.Correct_submissions + VALUES(Correct_submissions)
+        """, [cutoff])
+        cursor.execute("DELETE FROM SUBMISSION_DAILY WHERE Bucket_date < %s", [cutoff])
+        compacted = cursor.rowcount
+
+    if compacted:
+        # the analytics buckets changed shape: drop their cached ETags
+        versions.bump(versions.SUBMISSIONS)
+    return compacted
+
+
+def rebuild():
+    """
+    Recompute all rollups from SUBMISSION in one transaction, then compact
+    the daily buckets.
+    Returns (account_rows, problem_rows).
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM ACCOUNT_STATS")
+            cursor.execute("""
+                INSERT INTO ACCOUNT_STATS (Account_number, Total_submissions, Correct_submissions)
+                SELECT
+                    Account_number,
+                    COUNT(*),
+                    SUM(CASE WHEN Is_correct = TRUE THEN 1 ELSE 0 END)
+                FROM SUBMISSION
+                GROUP BY Account_number
+            """)
+            account_rows = cursor.rowcount
+
+            cursor.execute("DELETE FROM PROBLEM_STATS")
+            cursor.execute("""
+                INSERT INTO PROBLEM_STATS (Problem_ID, Submission_count, Correct_submissions)
+                SELECT
+                    Problem_ID,
+                    COUNT(*),
+                    SUM(CASE WHEN Is_correct = TRUE THEN 1 ELSE 0 END)
+                FROM SUBMISSION
+                GROUP BY Problem_ID
+            """)
+            problem_rows = cursor.rowcount
+
+            cursor.execute("DELETE FROM SUBMISSION_WEEKLY")
+            cursor.execute("DELETE FROM SUBMISSION_DAILY")
+            cursor.execute("""
+                INSERT INTO SUBMISSION_DAILY (Bucket_date, Problem_ID, Submission_count, Correct_submissions)
+                SELECT
+                    DATE(Time_start),
+                    Problem_ID,
+                    COUNT(*),
+                    SUM(CASE WHEN Is_correct = TRUE THEN 1 ELSE 0 END)
+                FROM SUBMISSION
+                GROUP BY DATE(Time_start), Problem_ID
+            """)
+
+    compact_buckets()
+
+    return account_rows, problem_rows
@@ -0,0 +1,183 @@
+"""
+Declarative row mappers: cursor rows -> compact records.
+
+- Field: output name, source column (as in cursor.description) and an optional
+  transform
+- RowMapper: a record type plus its fields; all() / one() map a cursor's rows
+- memoized: cache a transform per distinct input value (tag names, flags, ...)
+- or_empty, capitalized, concept_tags, concept_names, is_one: the transforms the
+  views share
+
+A mapper is compiled once per query shape (the tuple of result column names)
+into a function that builds a record straight from the row tuple, so a view
+that selects columns in a different order or adds one still maps correctly.
+Records are __slots__ dataclasses: fast_json / orjson serialize them natively,
+and keys() / __getitem__ let DRF's encoder and code expecting a dict use them.
+"""
+import dataclasses
+import functools
+import threading
+
+
+memoized = functools.lru_cache(maxsize=1024)
+
+
+@memoized
+def or_empty(value):
+    return value or ""
+
+
+@memoized
+def capitalized(value):
+    return value.capitalize() if value else ""
+
+
+@memoized
+def concept_tags(value):
+    """ "JOIN, GROUP BY" -> ("Join", "Group by"); a tuple so the cached value is shared safely."""
+    return tuple(c.strip().capitalize() for c in value.split(",")) if value else ()
+
+
+@memoized
+def concept_names(value):
+    """ "JOIN, GROUP BY" -> ("JOIN", "GROUP BY"), as stored (get_problem)."""
+    return tuple(c.strip() for c in value.split(",")) if value else ()
+
+
+def is_one(value):
+    return value == 1
+
+
+class Field:
+    __slots__ = ("name", "column", "transform")
+
+    def __init__(self, name, column, transform=None):
+        self.name = name
+        self.column = column
+        self.transform = transform
+
+
+class _RecordMixin:
+    __slots__ = ()
+
+    def keys(self):
+        return self.__record_fields__
+
+    def __getitem__(self, key):
+        if key not in self.__record_fields__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__record_fields__}
+
+
+class RowMapper:
+    def __init__(self, name, fields):
+        self.fields = tuple(fields)
+        names = tuple(f.name for f in self.fields)
+        self.record = dataclasses.make_dataclass(
+            name, names, bases=(_RecordMixin,), slots=True,
+            namespace={"__record_fields__": names},
+        )
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def compile(self, columns):
+        """The row -> record function for one query shape (tuple of column names)."""
+        fn = self._compiled.get(columns)
+        if fn is not None:
+            return fn
+
+        positions = {column.lower(): i for i, column in enumerate(columns)}
+        namespace = {"Record": self.record}
+        args = []
+        for i, field in enumerate(self.fields):
+            index = positions.get(field.column.lower())
+            if index is None:
+                raise ValueError(
+                    f"{self.record.__name__}: column {field.column!r} not in {columns!r}"
+                )
+            if field.transform is None:
+                args.append(f"row[{index}]")
+            else:
+                namespace[f"t{i}"] = field.transform
+                args.append(f"t{i}(row[{index}])")
+        source = f"def map_row(row):\n    return Record({', '.join(args)})\n"
+        exec(compile(source, f"<row mapper {self.record.__name__}>", "exec"), namespace)
+        fn = namespace["map_row"]
+
+        with self._lock:
+            self._compiled[columns] = fn
+        return fn
+
+    def _for(self, cursor):
+        return self.compile(tuple(col[0] for col in cursor.description))
+
+    def all(self, cursor, rows=None):
+        """Map rows (default: the rest of the cursor's result)."""
+        map_row = self._for(cursor)
+        return [map_row(row) for row in (cursor.fetchall() if rows is None else rows)]
+
+    def one(self, cursor):
+        row = cursor.fetchone()
+        return None if row is None else self._for(cursor)(row)
+
+
+# -- shared mappers --------------------------------------------------------
+
+_PROBLEM_HEAD = [
+    Field("pId", "Problem_ID"),
+    Field("pTitle", "Problem_title", or_empty),
+    Field("difficultyTag", "Difficulty_level", capitalized),
+    Field("conceptTag", "SQL_concept", concept_tags),
+]
+
+# list_problems
+PROBLEM = RowMapper("Problem", _PROBLEM_HEAD + [
+    Field("pDescription", "Problem_description", or_empty),
+    Field("pSolutionId", "Tag_ID"),
+    Field("reviewed", "Review_status", is_one),
+])
+# list_problems?summary=1 (no description)
+PROBLEM_SUMMARY = RowMapper("ProblemSummary", _PROBLEM_HEAD + [
+    Field("pSolutionId", "Tag_ID"),
+    Field("reviewed", "Review_status", is_one),
+])
+# list_tag_problems
+TAG_PROBLEM = RowMapper("TagProblem", _PROBLEM_HEAD + [
+    Field("pDescription", "Problem_description", or_empty),
+    Field("reviewed", "Review_status", is_one),
+])
+
+# get_problem
+PROBLEM_DETAIL = RowMapper("ProblemDetail", [
+    Field("pId", "Problem_ID"),
+    Field("pTitle", "Problem_title"),
+    Field("difficultyTag", "Difficulty_level", capitalized),
+    Field("conceptTag", "SQL_concept", concept_names),
+    Field("pDescription", "Problem_description"),
+    Field("pSolutionId", "Tag_ID"),
+    Field("reviewed", "Review_status", is_one),
+])
+
+# list_users
+USER = RowMapper("User", [
+    Field("accountNumber", "Account_number"),
+    Field("firstName", "First_name"),
+    Field("lastName", "Last_name"),
+    Field("email", "Email"),
+    Field("isStudent", "Student_flag"),
+    Field("isAdmin", "Admin_flag"),
+    Field("registerDate", "Register_date"),
+])
+
+# get_profile
+PROFILE = RowMapper("Profile", [
+    Field("email", "Email"),
+    Field("firstName", "First_name"),
+    Field("lastName", "Last_name"),
+    Field("registerDate", "Register_date"),
+    Field("isStudent", "Student_flag"),
+    Field("isAdmin", "Admin_flag"),
+])
@@ -0,0 +1,419 @@
+"""
+Schema and synthetic data for a local MySQL stand-in (benchmarks, index work).
+
+- SCHEMA: CREATE TABLE IF NOT EXISTS for the tables the views use
+- create_schema: create them (plus the session and rollup tables) on the
+  default database
+- check_target: refuse to write test data to anything but a local database
+- BulkWriter / bulk_insert: multi-row INSERTs in chunks
+- seed: generate accounts, problems over every tag combination, and
+  submissions/attempts with plausible time distributions, at a given scale
+
+The schema mirrors the production tables closely enough for the views and
+EXPLAIN; it is not a migration for the real database. Used by
+`python manage.py generate_data` and `bench_endpoints --seed-scale`.
+"""
+import datetime
+import random
+
+from django.db import connection, transaction
+
+from api import auth_tokens, rollups, versions
+
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS USER_PROFILE (
+        Email VARCHAR(100) PRIMARY KEY,
+        First_name VARCHAR(50),
+        Last_name VARCHAR(50)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ACCOUNT (
+        Account_number INT AUTO_INCREMENT PRIMARY KEY,
+        Email VARCHAR(100) UNIQUE,
+        Register_date DATE,
+        Student_flag BOOLEAN,
+        Admin_flag BOOLEAN,
+        FOREIGN KEY (Email) REFERENCES USER_PROFILE(Email)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS USER_AUTH (
+        Email VARCHAR(100) PRIMARY KEY,
+        Password VARCHAR(255) NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS DIFFICULTY_TAG (
+        Difficulty_ID INT PRIMARY KEY,
+        Difficulty_level ENUM('EASY','MEDIUM','HARD')
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS CONCEPT_TAG (
+        Concept_ID INT PRIMARY KEY,
+        SQL_concept VARCHAR(50)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS TAG (
+        Tag_ID INT PRIMARY KEY,
+        Difficulty_ID INT,
+        Concept_ID INT,
+        FOREIGN KEY (Difficulty_ID) REFERENCES DIFFICULTY_TAG(Difficulty_ID),
+        FOREIGN KEY (Concept_ID) REFERENCES CONCEPT_TAG(Concept_ID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS PROBLEM (
+        Problem_ID INT AUTO_INCREMENT PRIMARY KEY,
+        Tag_ID INT,
+        Problem_title VARCHAR(200),
+        Problem_description VARCHAR(1000),
+        Review_status BOOLEAN,
+        Solution_ID INT,
+        FOREIGN KEY (Tag_ID) REFERENCES TAG(Tag_ID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS SOLUTION (
+        Solution_ID INT AUTO_INCREMENT PRIMARY KEY,
+        Problem_ID INT,
+        Solution_Description VARCHAR(2000),
+        FOREIGN KEY (Problem_ID) REFERENCES PROBLEM(Problem_ID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS SUBMISSION (
+        Submission_ID INT AUTO_INCREMENT PRIMARY KEY,
+        Problem_ID INT,
+        Account_number INT,
+        Submission_description VARCHAR(1000),
+        Is_correct BOOLEAN,
+        Time_start DATETIME,
+        Time_end DATETIME,
+        FOREIGN KEY (Problem_ID) REFERENCES PROBLEM(Problem_ID),
+        FOREIGN KEY (Account_number) REFERENCES ACCOUNT(Account_number),
+        INDEX idx_submission_account_time (Account_number, Time_start, Submission_ID)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ATTEMPT (
+        Attempt_ID INT AUTO_INCREMENT PRIMARY KEY,
+        Problem_ID INT,
+        Account_number INT,
+        Attempt_number INT,
+        Is_submitted BOOLEAN,
+        Submission_ID INT,
+        FOREIGN KEY (Problem_ID) REFERENCES PROBLEM(Problem_ID),
+        FOREIGN KEY (Account_number) REFERENCES ACCOUNT(Account_number)
+    )
+    """,
+]
+
+
+DIFFICULTIES = ["EASY", "MEDIUM", "HARD"]
+CONCEPTS = [
+    "SELECT", "WHERE", "ORDER BY", "JOIN", "GROUP BY", "HAVING",
+    "SUBQUERY", "AGGREGATE", "WINDOW FUNCTION", "CTE",
+]
+SEED_PASSWORD = "benchpass"
+
+# volumes at scale 1.0
+BASE_ACCOUNTS = 20000
+BASE_PROBLEMS = 2000
+SUBMISSIONS_PER_ACCOUNT = 100
+
+# chance that a submission is correct, by difficulty
+SOLVE_RATE = {"EASY": 0.6, "MEDIUM": 0.4, "HARD": 0.25}
+# relative activity by hour of day (students work afternoons and evenings)
+HOUR_WEIGHTS = [
+    1, 1, 1, 1, 1, 1, 2, 3, 5, 7, 8, 8,
+    7, 8, 9, 10, 10, 10, 11, 13, 14, 13, 9, 4,
+]
+# relative activity Monday..Sunday
+WEEKDAY_WEIGHTS = [10, 11, 11, 10, 8, 5, 6]
+ADMIN_SHARE = 0.01
+# share of attempts abandoned without submitting
+UNSUBMITTED_SHARE = 0.15
+
+LOCAL_HOSTS = ("", "localhost", "127.0.0.1", "::1")
+
+
+def check_target(force=False):
+    """Raise ValueError unless the default database is local (or force is set)."""
+    host = connection.settings_dict.get("HOST") or ""
+    if connection.vendor != "mysql":
+        raise ValueError("test data needs a MySQL database")
+    if host not in LOCAL_HOSTS and not force:
+        raise ValueError(
+            f"refusing to write test data to {host}; point DB_HOST at a local "
+            "MySQL stand-in or pass --force"
+        )
+
+
+def create_schema():
+    with connection.cursor() as cursor:
+        for ddl in SCHEMA + [auth_tokens.CREATE_TABLE] + rollups.CREATE_TABLES:
+            cursor.execute(ddl)
+
+
+class BulkWriter:
+    """Collect rows for one table and write them as multi-row INSERTs of chunk_size."""
+
+    def __init__(self, cursor, table, columns, chunk_size=5000):
+        self.cursor = cursor
+        self.table = table
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.written = 0
+        self._row_sql = "(" + ", ".join(["%s"] * len(columns)) + ")"
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        self.cursor.execute(
+            f"INSERT INTO {self.table} ({', '.join(self.columns)}) "
+            f"VALUES {', '.join([self._row_sql] * len(self.rows))}",
+            [value for row in self.rows for value in row],
+        )
+        self.written += len(self.rows)
+        self.rows = []
+
+
+def bulk_insert(cursor, table, columns, rows, chunk_size=5000):
+    writer = BulkWriter(cursor, table, columns, chunk_size)
+    for row in rows:
+        writer.add(row)
+    writer.flush()
+    return writer.written
+
+
+def _max_id(cursor, table, column):
+    cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+    return cursor.fetchone()[0]
+
+
+def _ensure_tags(cursor):
+    """Fill in every difficulty x concept TAG (and the tag tables) that is missing."""
+    cursor.execute("SELECT Difficulty_ID, Difficulty_level FROM DIFFICULTY_TAG")
+    difficulties = {level: did for did, level in cursor.fetchall()}
+    missing = [d for d in DIFFICULTIES if d not in difficulties]
+    next_id = max(difficulties.values(), default=0) + 1
+    for offset, level in enumerate(missing):
+        difficulties[level] = next_id + offset
+    bulk_insert(cursor, "DIFFICULTY_TAG", ["Difficulty_ID", "Difficulty_level"],
+                [(difficulties[level], level) for level in missing])
+
+    cursor.execute("SELECT Concept_ID, SQL_concept FROM CONCEPT_TAG")
+    concepts = {concept: cid for cid, concept in cursor.fetchall()}
+    missing = [c for c in CONCEPTS if c not in concepts]
+    next_id = max(concepts.values(), default=0) + 1
+    for offset, concept in enumerate(missing):
+        concepts[concept] = next_id + offset
+    bulk_insert(cursor, "CONCEPT_TAG", ["Concept_ID", "SQL_concept"],
+                [(concepts[concept], concept) for concept in missing])
+
+    cursor.execute("SELECT Tag_ID, Difficulty_ID, Concept_ID FROM TAG")
+    existing = {(did, cid): tid for tid, did, cid in cursor.fetchall()}
+    next_id = max(existing.values(), default=0) + 1
+    new_tags = []
+    for did in difficulties.values():
+        for cid in concepts.values():
+            if (did, cid) not in existing:
+                existing[(did, cid)] = next_id
+                new_tags.append((next_id, did, cid))
+                next_id += 1
+    bulk_insert(cursor, "TAG", ["Tag_ID", "Difficulty_ID", "Concept_ID"], new_tags)
+
+    level_of = {did: level for level, did in difficulties.items()}
+    concept_of = {cid: concept for concept, cid in concepts.items()}
+    # Tag_ID -> (difficulty level, concept)
+    return {
+        tid: (level_of[did], concept_of[cid]) for (did, cid), tid in sorted(existing.items())
+    }
+
+
+def _random_moment(rng, first_day, last_day):
+    """A datetime between the two dates, following the weekday and hour weights."""
+    span = (last_day - first_day).days
+    while True:
+        day = first_day + datetime.timedelta(days=rng.randint(0, span))
+        if rng.random() * max(WEEKDAY_WEIGHTS) < WEEKDAY_WEIGHTS[day.weekday()]:
+            break
+    hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+    return datetime.datetime.combine(day, datetime.time(hour)) + datetime.timedelta(
+        seconds=rng.randrange(3600)
+    )
+
+
+def seed(scale=1.0, random_seed=0, accounts=None, problems=None,
+         submissions_per_account=None, days=365, end_date=None,
+         chunk_size=5000, progress=None):
+    """
+    Generate synthetic data on top of what is there:
+
+    - accounts (default BASE_ACCOUNTS x scale), registered over the last `days`
+      with more sign-ups recently; ADMIN_SHARE of them admins
+    - problems (default BASE_PROBLEMS x scale) spread evenly over every
+      DIFFICULTY_TAG x CONCEPT_TAG combination, each with a SOLUTION
+    - about submissions_per_account SUBMISSION rows per student (exponentially
+      distributed), on problems picked by a Zipf-like popularity: a student
+      retries a problem until it is solved (at SOLVE_RATE) or given up, minutes
+      apart, at weekday/hour-weighted times after registration
+    - one ATTEMPT per submission plus UNSUBMITTED_SHARE abandoned attempts
+
+    The same random_seed and end_date (default today) produce the same rows.
+    Rows go in as multi-row INSERTs of chunk_size with foreign key and unique
+    checks off for the session; the rollups are rebuilt at the end.
+    progress(table, rows_written) is called after each account batch.
+    Returns {table: rows inserted}.
+    """
+    rng = random.Random(random_seed)
+    accounts = accounts if accounts is not None else max(int(BASE_ACCOUNTS * scale), 1)
+    problems = problems if problems is not None else max(int(BASE_PROBLEMS * scale), 1)
+    per_account = submissions_per_account if submissions_per_account is not None \
+        else SUBMISSIONS_PER_ACCOUNT
+    end_date = end_date or datetime.date.today()
+    start_date = end_date - datetime.timedelta(days=days)
+    progress = progress or (lambda table, rows: None)
+
+    create_schema()
+    with connection.cursor() as cursor:
+        cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0")
+        try:
+            with transaction.atomic():
+                tags = _ensure_tags(cursor)
+            counts = {}
+
+            first_account = _max_id(cursor, "ACCOUNT", "Account_number") + 1
+            account_rows = []
+            for i in range(accounts):
+                number = first_account + i
+                # triangular towards end_date: sign-ups grow over time
+                registered = start_date + datetime.timedelta(
+                    days=int(rng.triangular(0, days, days))
+                )
+                is_admin = rng.random() < ADMIN_SHARE
+                account_rows.append((number, f"seed{number}@example.com", registered, is_admin))
+
+            with transaction.atomic():
+                counts["USER_PROFILE"] = bulk_insert(
+                    cursor, "USER_PROFILE", ["Email", "First_name", "Last_name"],
+                    ((email, f"First{n}", f"Last{n}") for n, email, _, _ in account_rows),
+                    chunk_size,
+                )
+                counts["ACCOUNT"] = bulk_insert(
+                    cursor, "ACCOUNT",
+                    ["Account_number", "Email", "Register_date", "Student_flag", "Admin_flag"],
+                    ((n, email, registered, not is_admin, is_admin)
+                     for n, email, registered, is_admin in account_rows),
+                    chunk_size,
+                )
+                counts["USER_AUTH"] = bulk_insert(
+                    cursor, "USER_AUTH", ["Email", "Password"],
+                    ((email, SEED_PASSWORD) for _, email, _, _ in account_rows),
+                    chunk_size,
+                )
+            progress("ACCOUNT", counts["ACCOUNT"])
+
+            first_problem = _max_id(cursor, "PROBLEM", "Problem_ID") + 1
+            first_solution = _max_id(cursor, "SOLUTION", "Solution_ID") + 1
+            tag_ids = list(tags)
+            problem_rows = []
+            for i in range(problems):
+                pid = first_problem + i
+                tag_id = tag_ids[i % len(tag_ids)]
+                level, concept = tags[tag_id]
+                problem_rows.append((pid, tag_id, level, concept, first_solution + i))
+            with transaction.atomic():
+                counts["PROBLEM"] = bulk_insert(
+                    cursor, "PROBLEM",
+                    ["Problem_ID", "Tag_ID", "Problem_title", "Problem_description",
+                     "Review_status", "Solution_ID"],
+                    ((pid, tag_id, f"{concept.title()} practice {pid}",
+                      f"A {level.lower()} {concept} exercise on the sample schema.",
+                      rng.random() < 0.9, sid)
+                     for pid, tag_id, level, concept, sid in problem_rows),
+                    chunk_size,
+                )
+                counts["SOLUTION"] = bulk_insert(
+                    cursor, "SOLUTION", ["Solution_ID", "Problem_ID", "Solution_Description"],
+                    ((sid, pid, f"SELECT COUNT(*) FROM PROBLEM WHERE Problem_ID = {pid}")
+                     for pid, _, _, _, sid in problem_rows),
+                    chunk_size,
+                )
+            progress("PROBLEM", counts["PROBLEM"])
+
+            # popularity falls off with rank; cumulative weights keep choices() cheap
+            popularity = list(range(len(problem_rows)))
+            rng.shuffle(popularity)
+            cum_weights, total = [], 0.0
+            for rank in popularity:
+                total += 1 / (rank + 1) ** 0.8
+                cum_weights.append(total)
+
+            submissions = BulkWriter(cursor, "SUBMISSION", [
+                "Submission_ID", "Problem_ID", "Account_number", "Submission_description",
+                "Is_correct", "Time_start", "Time_end",
+            ], chunk_size)
+            attempts = BulkWriter(cursor, "ATTEMPT", [
+                "Problem_ID", "Account_number", "Attempt_number", "Is_submitted", "Submission_ID",
+            ], chunk_size)
+            next_submission = _max_id(cursor, "SUBMISSION", "Submission_ID") + 1
+
+            for index, (number, _, registered, is_admin) in enumerate(account_rows):
+                if is_admin:
+                    continue
+                target = int(rng.expovariate(1 / per_account)) if per_account else 0
+                tried = set()
+                made = 0
+                while made < target and len(tried) < len(problem_rows):
+                    pid, _, level, _, _ = rng.choices(problem_rows, cum_weights=cum_weights)[0]
+                    if pid in tried:
+                        continue
+                    tried.add(pid)
+                    moment = _random_moment(rng, registered, end_date)
+                    attempt_number = 0
+                    give_up_after = rng.randint(3, 10)
+                    solved = False
+                    while not solved and attempt_number < give_up_after and made < target:
+                        attempt_number += 1
+                        if rng.random() < UNSUBMITTED_SHARE:
+                            attempts.add((pid, number, attempt_number, False, None))
+                            continue
+                        solved = rng.random() < SOLVE_RATE[level]
+                        duration = datetime.timedelta(seconds=int(rng.lognormvariate(5, 1)) + 5)
+                        submissions.add((
+                            next_submission, pid, number,
+                            f"SELECT COUNT(*) FROM PROBLEM WHERE Problem_ID = {pid}" if solved
+                            else f"SELECT * FROM PROBLEM WHERE Problem_ID = {pid}",
+                            solved, moment, moment + duration,
+                        ))
+                        attempts.add((pid, number, attempt_number, True, next_submission))
+                        next_submission += 1
+                        made += 1
+                        moment += duration + datetime.timedelta(seconds=rng.randint(20, 900))
+                if index % 1000 == 999:
+                    progress("SUBMISSION", submissions.written)
+
+            submissions.flush()
+            attempts.flush()
+            counts["SUBMISSION"] = submissions.written
+            counts["ATTEMPT"] = attempts.written
+            progress("SUBMISSION", submissions.written)
+        finally:
+            cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1")
+
+    rollups.rebuild()
+    versions.bump(versions.CATALOG)
+    versions.bump(versions.SUBMISSIONS)
+    return counts
@@ -0,0 +1,121 @@
+"""
+Guards applied to LLM-generated SQL before and while it runs.
+
+- check_statement: parse the SQL with api/sql_validator (one SELECT over allowed tables)
+- with_time_limit: add a MAX_EXECUTION_TIME optimizer hint so MySQL aborts the
+  statement after settings.NL2SQL_MAX_EXECUTION_MS
+- check_estimated_rows: EXPLAIN the statement and reject it when the optimizer
+  expects to examine more than settings.NL2SQL_MAX_ESTIMATED_ROWS rows
+- is_timeout_error: whether a database error is MySQL's statement timeout
+- guard_counts: how often each guard rejected or interrupted a query (per worker)
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from api.sql_validator import SQLValidationError, ValidatedSQL, validate_sql
+
+
+# MySQL ER_QUERY_TIMEOUT: "maximum statement execution time exceeded"
+ER_QUERY_TIMEOUT = 3024
+
+_counts = Counter()
+_counts_lock = threading.Lock()
+
+
+class SQLGuardError(Exception):
+    """
+    Raised when a guard rejects generated SQL.
+    guard names the check ("validation", "row_estimate", "timeout").
+    """
+
+    def __init__(self, guard, detail):
+        super().__init__(detail)
+        self.guard = guard
+        self.detail = detail
+
+
+def record(guard):
+    with _counts_lock:
+        _counts[guard] += 1
+
+
+def guard_counts() -> dict:
+    with _counts_lock:
+        return dict(_counts)
+
+
+def reject(guard, detail):
+    record(guard)
+    raise SQLGuardError(guard, detail)
+
+
+def check_statement(sql: str, allowed_tables=None) -> ValidatedSQL:
+    try:
+        return validate_sql(sql, allowed_tables)
+    except SQLValidationError as e:
+        reject("validation", str(e))
+
+
+def with_time_limit(validated: ValidatedSQL, limit_ms=None, using=DEFAULT_DB_ALIAS) -> str:
+    """
+    Return the validated statement with a per-statement MAX_EXECUTION_TIME hint
+    (MySQL only; a limit of 0 leaves the statement unchanged). limit_ms defaults
+    to settings.NL2SQL_MAX_EXECUTION_MS; using is the alias it will run on.
+    """
+    if limit_ms is None:
+        limit_ms = settings.NL2SQL_MAX_EXECUTION_MS
+    if limit_ms <= 0 or connections[using].vendor != "mysql":
+        return validated.sql
+    return validated.with_hint(f"MAX_EXECUTION_TIME({int(limit_ms)})")
+
+
+def estimated_rows(sql: str) -> int:
+    """
+    Rows the MySQL optimizer expects to examine: within one SELECT (same EXPLAIN
+    id) the per-table estimates multiply, across SELECTs they add up.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN " + sql)
+        names = [col[0].lower() for col in cursor.description]
+        plan = [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    per_select = {}
+    for step in plan:
+        rows = float(step.get("rows") or 1)
+        filtered = float(step.get("filtered") or 100) / 100
+        key = step.get("id")
+        per_select[key] = per_select.get(key, 1.0) * max(rows * filtered, 1.0)
+
+    return int(sum(per_select.values()))
+
+
+def check_estimated_rows(sql: str):
+    """
+    Reject sql if EXPLAIN estimates more than NL2SQL_MAX_ESTIMATED_ROWS examined
+    rows (0 disables the check; it only runs on MySQL).
+    """
+    threshold = settings.NL2SQL_MAX_ESTIMATED_ROWS
+    if threshold <= 0 or connection.vendor != "mysql":
+        return
+
+    estimate = estimated_rows(sql)
+    if estimate > threshold:
+        reject(
+            "row_estimate",
+            f"Query would examine about {estimate} rows (limit {threshold}).",
+        )
+
+
+def is_timeout_error(exc) -> bool:
+    return bool(exc.args) and exc.args[0] == ER_QUERY_TIMEOUT
+
+
+def timeout_error() -> SQLGuardError:
+    record("timeout")
+    return SQLGuardError(
+        "timeout",
+        f"Query exceeded the {settings.NL2SQL_MAX_EXECUTION_MS} ms execution limit.",
+    )
@@ -0,0 +1,293 @@
+"""
+Parsed validation of user- and LLM-supplied SQL (shared by nl2sql and grading).
+
+- validate_sql: accept exactly one SELECT (or WITH ... SELECT) statement that reads
+  only allowed tables and calls only ALLOWED_FUNCTIONS; returns a ValidatedSQL
+  with the normalized statement
+- ValidatedSQL.with_hint: the normalized statement with an optimizer hint after
+  its top-level SELECT
+- SQLValidationError: raised with a user-facing reason when validation fails
+
+Parsing results are cached by SQL hash (settings.SQL_VALIDATOR_CACHE_MAX_ENTRIES),
+so a repeated statement is only parsed once; the allowed-table check still runs
+per call since it depends on the caller.
+"""
+import hashlib
+from collections import namedtuple
+
+import sqlparse
+from sqlparse import tokens as T
+from sqlparse.sql import Function, Identifier, IdentifierList, Parenthesis, Where
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from api.ttl_cache import TTLCache
+
+
+class SQLValidationError(ValueError):
+    """Raised when a statement is not a single read-only query over allowed tables."""
+
+
+class ValidatedSQL(namedtuple("ValidatedSQL", ["sql", "tables", "select_offset"])):
+    """
+    sql: the statement without comments, runs of whitespace or a trailing semicolon
+    tables: upper-cased names of the tables it reads ("SCHEMA.TABLE" if qualified)
+    select_offset: index in sql just past the top-level SELECT keyword
+    """
+
+    def with_hint(self, hint: str) -> str:
+        return f"{self.sql[:self.select_offset]} /*+ {hint} */{self.sql[self.select_offset:]}"
+
+
+# built-in functions a query may call: aggregates, window, control flow, string,
+# numeric, date and JSON functions. Anything else (SLEEP, BENCHMARK, LOAD_FILE,
+# GET_LOCK, user-defined functions, ...) is rejected.
+ALLOWED_FUNCTIONS = frozenset("""
+    COUNT SUM AVG MIN MAX GROUP_CONCAT STD STDDEV STDDEV_POP STDDEV_SAMP VARIANCE
+    VAR_POP VAR_SAMP BIT_AND BIT_OR BIT_XOR ANY_VALUE JSON_ARRAYAGG JSON_OBJECTAGG
+    ROW_NUMBER RANK DENSE_RANK PERCENT_RANK CUME_DIST NTILE LAG LEAD FIRST_VALUE
+    LAST_VALUE NTH_VALUE
+    IF IFNULL NULLIF COALESCE GREATEST LEAST ISNULL CAST CONVERT
+    CONCAT CONCAT_WS LENGTH CHAR_LENGTH CHARACTER_LENGTH LOWER UPPER LCASE UCASE
+    SUBSTRING SUBSTR SUBSTRING_INDEX MID LEFT RIGHT TRIM LTRIM RTRIM REPLACE REVERSE
+    LPAD RPAD LOCATE INSTR POSITION REPEAT SPACE FORMAT ASCII CHAR STRCMP FIELD
+    FIND_IN_SET ELT HEX UNHEX REGEXP_LIKE REGEXP_REPLACE REGEXP_SUBSTR REGEXP_INSTR
+    MATCH AGAINST
+    ABS CEIL CEILING FLOOR ROUND TRUNCATE MOD POW POWER SQRT EXP LN LOG LOG2 LOG10
+    SIGN PI RAND CONV RADIANS DEGREES SIN COS TAN
+    NOW CURDATE CURTIME CURRENT_DATE CURRENT_TIME CURRENT_TIMESTAMP UTC_DATE
+    UTC_TIMESTAMP DATE TIME TIMESTAMP YEAR MONTH DAY DAYOFMONTH DAYOFWEEK DAYOFYEAR
+    DAYNAME MONTHNAME WEEK WEEKDAY WEEKOFYEAR YEARWEEK QUARTER HOUR MINUTE SECOND
+    MICROSECOND DATE_ADD DATE_SUB ADDDATE SUBDATE ADDTIME SUBTIME DATEDIFF TIMEDIFF
+    TIMESTAMPDIFF TIMESTAMPADD DATE_FORMAT TIME_FORMAT STR_TO_DATE EXTRACT LAST_DAY
+    MAKEDATE MAKETIME FROM_DAYS TO_DAYS UNIX_TIMESTAMP FROM_UNIXTIME PERIOD_DIFF
+    JSON_EXTRACT JSON_UNQUOTE JSON_OBJECT JSON_ARRAY JSON_LENGTH JSON_CONTAINS
+""".split())
+
+# keywords that may follow FROM / JOIN without being a table name
+_TABLE_PREFIX_KEYWORDS = frozenset(["LATERAL"])
+# start of a clause after a table reference that ends with a parenthesized
+# list: USE / FORCE / IGNORE {INDEX|KEY} [FOR ...] (...), PARTITION (...)
+_TABLE_HINT_KEYWORDS = frozenset(["USE", "FORCE", "IGNORE", "PARTITION"])
+# keywords sqlparse lexes as a function name when "(" follows without a space
+_KEYWORD_CALLS = frozenset(["EXISTS"])
+
+_parsed = TTLCache(
+    settings.SQL_VALIDATOR_CACHE_MAX_ENTRIES, settings.SQL_VALIDATOR_CACHE_TTL
+)
+
+
+def _table_name(identifier: Identifier):
+    name = identifier.get_real_name()
+    if name is None:
+        return None
+    parent = identifier.get_parent_name()
+    return f"{parent}.{name}".upper() if parent else name.upper()
+
+
+def _is_subquery(parenthesis: Parenthesis) -> bool:
+    return any(t.ttype is T.DML or t.ttype is T.Keyword.CTE for t in parenthesis.tokens)
+
+
+def _collect_table(token, tables: set, ctes: set):
+    """Record what one FROM / JOIN item reads."""
+    if isinstance(token, Parenthesis):
+        if _is_subquery(token):
+            _collect(token, tables, ctes)
+        else:
+            # (t), (t alias), (t1, t2), (t1 JOIN t2 ON ...): tables in parentheses
+            _collect(token, tables, ctes, expect="table")
+    elif isinstance(token, IdentifierList):
+        for item in token.get_identifiers():
+            _collect_table(item, tables, ctes)
+    elif isinstance(token, Identifier):
+        inner = next((t for t in token.tokens if isinstance(t, Parenthesis)), None)
+        if inner is not None:
+            _collect_table(inner, tables, ctes)
+        else:
+            name = _table_name(token)
+            if name:
+                tables.add(name)
+    elif token.ttype in T.Name or (
+        # table names sqlparse knows as keywords (ACCOUNT, USER, ...)
+        token.ttype in T.Keyword and token.normalized not in _TABLE_PREFIX_KEYWORDS
+    ):
+        tables.add(token.value.strip("`").upper())
+    elif token.is_group:
+        _collect(token, tables, ctes)
+
+
+def _collect_ctes(token, tables: set, ctes: set):
+    items = token.get_identifiers() if isinstance(token, IdentifierList) else [token]
+    for item in items:
+        if not isinstance(item, Identifier):
+            continue
+        ctes.add(item.get_real_name().upper())
+        body = next((t for t in item.tokens if isinstance(t, Parenthesis)), None)
+        if body is not None:
+            _collect(body, tables, ctes)
+
+
+def _collect(tokenlist, tables: set, ctes: set, expect=None, in_function=False):
+    """
+    Walk a parse tree and record the names that follow FROM / JOIN (tables)
+    and WITH (common table expressions); subqueries and parenthesized table
+    references are walked recursively. Within function arguments
+    (in_function) FROM names no table: EXTRACT(YEAR FROM d), TRIM(x FROM s).
+
+    An index hint or PARTITION clause stops sqlparse from grouping the rest of
+    a FROM list, so until the next clause keyword (in_from) the hint is skipped
+    and every comma starts another table reference.
+    """
+    in_from = expect == "table"
+    in_hint = False
+    for token in tokenlist.tokens:
+        if (
+            token.is_whitespace or token.ttype in T.Comment
+            or token.match(T.Punctuation, ("(", ")"))
+        ):
+            continue
+
+        if in_hint:
+            # INDEX / KEY, FOR JOIN / ORDER BY / GROUP BY, up to the index list
+            in_hint = not isinstance(token, Parenthesis)
+            continue
+        if token.ttype is T.Keyword.CTE:
+            expect = "cte"
+            continue
+        if expect == "cte" and token.match(T.Keyword, "RECURSIVE"):
+            continue
+        if not in_function and token.ttype in T.Keyword and (
+            token.normalized == "FROM" or token.normalized.endswith("JOIN")
+        ):
+            expect = "table"
+            in_from = True
+            continue
+        if in_from and expect is None:
+            if token.ttype in T.Keyword and token.normalized in _TABLE_HINT_KEYWORDS:
+                in_hint = True
+                continue
+            if token.match(T.Punctuation, ","):
+                expect = "table"
+                continue
+            if token.ttype in T.Keyword or isinstance(token, Where):
+                in_from = False
+
+        if expect == "cte":
+            _collect_ctes(token, tables, ctes)
+        elif expect == "table":
+            _collect_table(token, tables, ctes)
+        elif isinstance(token, Parenthesis) and _is_subquery(token):
+            _collect(token, tables, ctes)
+        elif token.is_group:
+            _collect(token, tables, ctes, in_function=in_function or isinstance(token, Function))
+
+        expect = None
+
+
+def _check_functions(statement, ctes: set):
+    """Reject calls of functions outside ALLOWED_FUNCTIONS (SLEEP, LOAD_FILE, ...)."""
+    tokens = [
+        t for t in statement.flatten()
+        if not t.is_whitespace and t.ttype not in T.Comment
+    ]
+    for i, token in enumerate(tokens[:-1]):
+        if token.ttype not in T.Name or not tokens[i + 1].match(T.Punctuation, "("):
+            continue
+        previous = tokens[i - 1] if i else None
+        if previous is not None and previous.match(T.Punctuation, "."):
+            raise SQLValidationError("Calls to stored functions are not allowed.")
+        name = token.value.strip("`").upper()
+        if name in _KEYWORD_CALLS:
+            continue
+        if name in ctes or (previous is not None and previous.match(T.Keyword, "AS")):
+            continue  # column list of a CTE or derived table: r(n) AS (...), AS x(a, b)
+        if name not in ALLOWED_FUNCTIONS:
+            raise SQLValidationError(f"Function {name} is not allowed.")
+
+
+def _parse(sql: str) -> ValidatedSQL:
+    statements = [
+        s for s in sqlparse.parse(sql)
+        if s.token_first(skip_ws=True, skip_cm=True) is not None
+        and str(s).strip() != ";"
+    ]
+    if not statements:
+        raise SQLValidationError("Empty SQL statement.")
+    if len(statements) > 1:
+        raise SQLValidationError("Only a single SQL statement is allowed.")
+
+    statement = statements[0]
+    first = statement.token_first(skip_ws=True, skip_cm=True)
+    if first.ttype not in (T.DML, T.Keyword.CTE) or statement.get_type() != "SELECT":
+        raise SQLValidationError("Only SELECT statements are allowed.")
+
+    # the main query block: first DML keyword at the top level (after any CTEs)
+    main_select = next((t for t in statement.tokens if t.ttype is T.DML), None)
+    if main_select is None or main_select.normalized != "SELECT":
+        raise SQLValidationError("Only SELECT statements are allowed.")
+
+    parts = []
+    length = 0
+    select_offset = None
+    for token in statement.flatten():
+        if token.ttype in (T.DML, T.DDL) and token.normalized != "SELECT":
+            raise SQLValidationError(f"{token.normalized} is not allowed.")
+        if token.ttype in T.Keyword and token.normalized == "INTO":
+            raise SQLValidationError("SELECT ... INTO is not allowed.")
+        if token.is_whitespace or token.ttype in T.Comment:
+            text = "" if not parts or parts[-1] == " " else " "
+        else:
+            text = token.value
+        if text:
+            parts.append(text)
+            length += len(text)
+        if token is main_select:
+            select_offset = length
+
+    normalized = "".join(parts).strip().rstrip(";").rstrip()
+
+    tables, ctes = set(), set()
+    _collect(statement, tables, ctes)
+    _check_functions(statement, ctes)
+
+    return ValidatedSQL(normalized, frozenset(tables - ctes - {"DUAL"}), select_offset)
+
+
+def _allowed(table: str, allowed_tables, database: str) -> bool:
+    schema, _, name = table.rpartition(".")
+    if schema and schema != database:
+        return False
+    return name in allowed_tables
+
+
+def validate_sql(sql: str, allowed_tables=None, using=DEFAULT_DB_ALIAS) -> ValidatedSQL:
+    """
+    Validate one statement. allowed_tables is an iterable of table names
+    (case-insensitive); None allows any table. Qualified names are only accepted
+    for the database of alias using. Raises SQLValidationError.
+    """
+    if not sql or not sql.strip():
+        raise SQLValidationError("Empty SQL statement.")
+
+    key = hashlib.sha256(sql.encode("utf-8")).hexdigest()
+    result = _parsed.get(key)
+    if result is None:
+        try:
+            result = _parse(sql)
+        except SQLValidationError as e:
+            # rejections are cached too, as their message
+            result = str(e)
+        _parsed.set(key, result)
+    if isinstance(result, str):
+        raise SQLValidationError(result)
+
+    if allowed_tables is not None:
+        allowed = {t.upper() for t in allowed_tables}
+        database = str(settings.DATABASES[using]["NAME"]).upper()
+        rejected = sorted(t for t in result.tables if not _allowed(t, allowed, database))
+        if rejected:
+            raise SQLValidationError(f"Table(s) not allowed: {', '.join(rejected)}.")
+
+    return result
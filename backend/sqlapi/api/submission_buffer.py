@@ -0,0 +1,353 @@
+"""
+Write-behind buffer for submissions (settings.SUBMISSION_WRITE_BEHIND).
+
+- insert_submissions: multi-row INSERT into SUBMISSION plus the rollups
+  (also used directly by the batch endpoint)
+- enqueue: durably append one graded submission to the local journal and return;
+  a background flusher group-commits journal segments to SUBMISSION every
+  SUBMISSION_FLUSH_INTERVAL_MS or as soon as SUBMISSION_FLUSH_MAX_ROWS are waiting
+- stats: buffer depth and flush counters for this worker
+
+Each worker appends to its own journal segment in SUBMISSION_BUFFER_DIR
+("<owner>.<segment id>.log", owner being the worker's api/processes.py token,
+so a restarted worker that gets its old pid back is a different owner), fsynced
+before enqueue returns. A flush seals the segment (".sealed"), writes its rows
+and a SUBMISSION_FLUSH_LOG row for the segment id in one transaction, then
+deletes the file. On start and then every ORPHAN_SCAN_SECONDS a worker claims
+the segments of owners that are no longer running, unsealed ones included, and
+flushes them too; the flush log makes a segment that was committed just before
+a crash a no-op on replay.
+
+Segments are committed independently. When a segment is refused for its data
+(a foreign key, a value, a date before the rollup cutoff) it is renamed to
+".split" and its rows are committed one by one, each with its own flush log
+entry; rows that are refused again are appended to "<owner>.<segment id>.dead"
+(one JSON line with the row and the error) for an operator to look at, so one
+bad row never holds up the rows journaled after it. Other errors (database
+unreachable) leave every segment in place for the next round.
+
+start() runs the flusher from the server entry points (sqlapi/wsgi.py,
+sqlapi/asgi.py), so it replays crashed workers' journals without management
+commands touching the database; a worker also starts it on its first enqueue.
+"""
+import atexit
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import DataError, IntegrityError, connection, transaction
+
+from api import metrics, processes, rollups, versions
+
+
+CREATE_FLUSH_LOG = """
+    CREATE TABLE IF NOT EXISTS SUBMISSION_FLUSH_LOG (
+        Batch_id CHAR(32) PRIMARY KEY,
+        Row_count INT NOT NULL,
+        Flushed_at DATETIME NOT NULL,
+        INDEX (Flushed_at)
+    )
+"""
+FLUSH_LOG_RETENTION_DAYS = 7
+ORPHAN_SCAN_SECONDS = 60
+
+# errors that refuse a row for its content; anything else is retried as is
+ROW_ERRORS = (IntegrityError, DataError, ValueError)
+
+
+def insert_submissions(cursor, rows):
+    """
+    rows: (problem_id, account_number, submission, is_correct, time_start, time_end)
+    tuples. Call inside a transaction so the rollups move with the rows.
+    """
+    chunk_size = settings.SUBMISSION_BATCH_INSERT_ROWS
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        cursor.execute(f"""
+            INSERT INTO SUBMISSION
+            (Problem_ID, Account_number, Submission_description, Is_correct, Time_start, Time_end)
+            VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(chunk))}
+        """, [value for row in chunk for value in row])
+    rollups.record_submissions(cursor, [(row[1], row[0], row[3], row[4]) for row in rows])
+
+
+def _encode(row) -> bytes:
+    problem_id, account_number, submission, is_correct, time_start, time_end = row
+    return (json.dumps([
+        problem_id, account_number, submission, bool(is_correct),
+        time_start.isoformat(), time_end.isoformat(),
+    ]) + "\n").encode("utf-8")
+
+
+def _load(path):
+    rows = []
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                problem_id, account_number, submission, is_correct, start, end = json.loads(line)
+            except ValueError:
+                # a torn last line was never fsynced, so never acknowledged
+                continue
+            rows.append((
+                problem_id, account_number, submission, is_correct,
+                datetime.datetime.fromisoformat(start), datetime.datetime.fromisoformat(end),
+            ))
+    return rows
+
+
+class SubmissionBuffer:
+    def __init__(self, directory, interval_ms, max_rows, owner=None):
+        self.directory = directory
+        self.interval = interval_ms / 1000
+        self.max_rows = max_rows
+        self.pid = os.getpid()
+        self.owner = owner or processes.owner_token()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._file = None
+        self._segment = None
+        self._segment_rows = 0
+        self._sealed_rows = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_flush_ms = None
+        self.dead_rows = 0
+
+    # -- journal -------------------------------------------------------------
+
+    def _path(self, segment, state):
+        return os.path.join(self.directory, f"{self.owner}.{segment}.{state}")
+
+    def _open_segment(self):
+        self._segment = uuid.uuid4().hex
+        self._file = open(self._path(self._segment, "log"), "ab")
+        self._segment_rows = 0
+
+    def append(self, row):
+        data = _encode(row)
+        with self._lock:
+            if self._file is None:
+                self._open_segment()
+            self._file.write(data)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._segment_rows += 1
+            full = self._segment_rows >= self.max_rows
+        if full:
+            self._wake.set()
+
+    def _seal(self):
+        with self._lock:
+            if self._file is None or self._segment_rows == 0:
+                return
+            self._file.close()
+            os.rename(self._path(self._segment, "log"), self._path(self._segment, "sealed"))
+            self._sealed_rows += self._segment_rows
+            self._file = None
+            self._segment = None
+            self._segment_rows = 0
+
+    def depth(self):
+        with self._lock:
+            return self._segment_rows + self._sealed_rows
+
+    # -- flushing ------------------------------------------------------------
+
+    def _segments(self, state):
+        prefix = f"{self.owner}."
+        return sorted(
+            name.split(".")[1] for name in os.listdir(self.directory)
+            if name.startswith(prefix) and name.endswith(f".{state}")
+        )
+
+    def _commit_rows(self, batch_id, rows):
+        """Insert rows under a flush log id, once. Returns the number inserted."""
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM SUBMISSION_FLUSH_LOG WHERE Batch_id = %s", [batch_id]
+            )
+            if cursor.fetchone() is not None:
+                return 0
+            if rows:
+                insert_submissions(cursor, rows)
+            cursor.execute(
+                "INSERT INTO SUBMISSION_FLUSH_LOG (Batch_id, Row_count, Flushed_at) "
+                "VALUES (%s, %s, %s)",
+                [batch_id, len(rows), datetime.datetime.now()],
+            )
+        return len(rows)
+
+    def _commit_segment(self, segment):
+        path = self._path(segment, "sealed")
+        rows = _load(path)
+        inserted = self._commit_rows(segment, rows)
+        os.remove(path)
+        return len(rows), inserted
+
+    def _commit_split(self, segment):
+        """Commit a refused segment row by row; dead-letter the rows refused again."""
+        path = self._path(segment, "split")
+        rows = _load(path)
+        inserted = 0
+        for index, row in enumerate(rows):
+            batch_id = hashlib.md5(f"{segment}:{index}".encode()).hexdigest()
+            try:
+                inserted += self._commit_rows(batch_id, [row])
+            except ROW_ERRORS as e:
+                self._dead_letter(segment, row, e)
+        os.remove(path)
+        return len(rows), inserted
+
+    def _dead_letter(self, segment, row, error):
+        with open(self._path(segment, "dead"), "ab") as f:
+            line = {"row": json.loads(_encode(row)), "error": str(error)}
+            f.write((json.dumps(line) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self.dead_rows += 1
+
+    def flush(self):
+        """Seal the active segment and commit every sealed segment of this worker."""
+        with self._flush_lock:
+            self._seal()
+            start = time.perf_counter()
+            flushed = 0
+            try:
+                for segment in self._segments("split"):
+                    loaded, inserted = self._commit_split(segment)
+                    flushed += inserted
+                    with self._lock:
+                        self._sealed_rows = max(self._sealed_rows - loaded, 0)
+                for segment in self._segments("sealed"):
+                    try:
+                        loaded, inserted = self._commit_segment(segment)
+                    except ROW_ERRORS as e:
+                        # refused for its data: isolate the bad rows
+                        self.errors += 1
+                        self.last_error = str(e)
+                        os.rename(self._path(segment, "sealed"), self._path(segment, "split"))
+                        loaded, inserted = self._commit_split(segment)
+                    flushed += inserted
+                    with self._lock:
+                        self._sealed_rows = max(self._sealed_rows - loaded, 0)
+            except Exception as e:
+                # database trouble: rows stay in their segments and are retried next round
+                self.errors += 1
+                self.last_error = str(e)
+            finally:
+                connection.close_if_unusable_or_obsolete()
+
+            if flushed:
+                versions.bump(versions.SUBMISSIONS)
+                metrics.submission_rows.inc("write_behind", amount=flushed)
+                self.flushes += 1
+                self.flushed_rows += flushed
+                self.last_flush_ms = (time.perf_counter() - start) * 1000
+
+    def _claim_orphans(self):
+        """Take over segments (sealed or not) of owners that are no longer running."""
+        claimed = 0
+        for name in os.listdir(self.directory):
+            parts = name.split(".")
+            if len(parts) != 3 or parts[2] not in ("log", "sealed", "split"):
+                continue
+            owner, segment, state = parts
+            if owner == self.owner or processes.owner_alive(owner):
+                continue
+            # a split segment stays split: some of its rows may be committed already
+            state = "split" if state == "split" else "sealed"
+            try:
+                os.rename(os.path.join(self.directory, name), self._path(segment, state))
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            claimed += len(_load(self._path(segment, state)))
+        with self._lock:
+            self._sealed_rows += claimed
+
+    def _prepare(self):
+        with connection.cursor() as cursor:
+            cursor.execute(CREATE_FLUSH_LOG)
+            cursor.execute(
+                "DELETE FROM SUBMISSION_FLUSH_LOG WHERE Flushed_at < %s",
+                [datetime.datetime.now() - datetime.timedelta(days=FLUSH_LOG_RETENTION_DAYS)],
+            )
+
+    def run(self):
+        while True:
+            try:
+                self._prepare()
+                break
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                connection.close_if_unusable_or_obsolete()
+                time.sleep(max(self.interval, 1))
+        self._claim_orphans()
+        last_scan = time.monotonic()
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if time.monotonic() - last_scan >= ORPHAN_SCAN_SECONDS:
+                # workers die after start too; their acknowledged rows are ours now
+                self._claim_orphans()
+                last_scan = time.monotonic()
+            self.flush()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """The buffer of this process, started (with replay) on first use."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None or _buffer.pid != os.getpid():
+            os.makedirs(settings.SUBMISSION_BUFFER_DIR, exist_ok=True)
+            _buffer = SubmissionBuffer(
+                settings.SUBMISSION_BUFFER_DIR,
+                settings.SUBMISSION_FLUSH_INTERVAL_MS,
+                settings.SUBMISSION_FLUSH_MAX_ROWS,
+            )
+            threading.Thread(
+                target=_buffer.run, name="submission-flusher", daemon=True
+            ).start()
+            # drain on clean shutdown; anything left is replayed by the next worker
+            atexit.register(_buffer.flush)
+        return _buffer
+
+
+def start():
+    """Start this process's flusher if write-behind is enabled (server entry points)."""
+    if settings.SUBMISSION_WRITE_BEHIND:
+        get_buffer()
+
+
+def enqueue(problem_id, account_number, submission, is_correct, time_start, time_end):
+    get_buffer().append(
+        (problem_id, account_number, submission, is_correct, time_start, time_end)
+    )
+
+
+def stats() -> dict:
+    buffer = _buffer if _buffer is not None and _buffer.pid == os.getpid() else None
+    if buffer is None:
+        return {"enabled": settings.SUBMISSION_WRITE_BEHIND, "depth": 0}
+    return {
+        "enabled": settings.SUBMISSION_WRITE_BEHIND,
+        "depth": buffer.depth(),
+        "flushes": buffer.flushes,
+        "flushed_rows": buffer.flushed_rows,
+        "last_flush_ms": buffer.last_flush_ms,
+        "errors": buffer.errors,
+        "last_error": buffer.last_error,
+        "dead_rows": buffer.dead_rows,
+    }
@@ -1,3 +1,1321 @@
-from django.test import TestCase
+import contextlib
+import datetime
+import json
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.db import IntegrityError
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api import (
+    auth_tokens, catalog_cache, conditional, grading, llm_cache, metrics, processes, query_params,
+    query_stats, rollups, row_mappers, submission_buffer, ttl_cache,
+)
+from api.sql_validator import SQLValidationError, validate_sql
+
+
+class GradingFingerprintTests(SimpleTestCase):
+    def test_order_by_outside_subqueries(self):
+        self.assertTrue(grading.is_order_sensitive("SELECT a FROM t ORDER BY a"))
+        self.assertFalse(grading.is_order_sensitive(
+            "SELECT a FROM (SELECT a FROM t ORDER BY a LIMIT 5) s"
+        ))
+        self.assertFalse(grading.is_order_sensitive("SELECT 'order by' FROM t"))
+
+    def test_unordered_fingerprint_ignores_row_order(self):
+        rows = [(1, "a"), (2, "b"), (2, "b")]
+        self.assertEqual(
+            grading.fingerprint_rows(rows, 2, ordered=False),
+            grading.fingerprint_rows(list(reversed(rows)), 2, ordered=False),
+        )
+        # duplicates count
+        self.assertNotEqual(
+            grading.fingerprint_rows(rows, 2, ordered=False),
+            grading.fingerprint_rows(rows[:2], 2, ordered=False),
+        )
+
+    def test_ordered_fingerprint_depends_on_row_order(self):
+        rows = [(1,), (2,)]
+        self.assertNotEqual(
+            grading.fingerprint_rows(rows, 1, ordered=True),
+            grading.fingerprint_rows(rows[::-1], 1, ordered=True),
+        )
+
+    def test_numbers_compare_by_value(self):
+        self.assertEqual(
+            grading.fingerprint_rows([(3, Decimal("2.50"))], 2, ordered=False),
+            grading.fingerprint_rows([(Decimal("3.0"), 2.5)], 2, ordered=False),
+        )
+
+    def test_null_differs_from_empty_string(self):
+        self.assertNotEqual(
+            grading.fingerprint_rows([(None,)], 1, ordered=False),
+            grading.fingerprint_rows([("",)], 1, ordered=False),
+        )
+
+    def test_dates_and_bytes(self):
+        self.assertEqual(
+            grading.fingerprint_rows([(datetime.date(2025, 1, 2), b"x")], 2, ordered=False),
+            grading.fingerprint_rows([("2025-01-02", "x")], 2, ordered=False),
+        )
+
+    @override_settings(GRADING_DATABASE="default")
+    def test_refuses_the_live_database(self):
+        with self.assertRaises(grading.GradingError):
+            grading.grade_submission(1, "SELECT * FROM PROBLEM")
+
+    @override_settings(GRADING_DATABASE="not-configured")
+    def test_refuses_an_unconfigured_alias(self):
+        with self.assertRaises(grading.GradingUnavailable):
+            grading.grade_submission(1, "SELECT * FROM PROBLEM")
+
+
+@override_settings(GRADING_ALLOWED_TABLES=["PROBLEM"])
+class GradingAllowlistTests(SimpleTestCase):
+    def grade(self, sql, reference_tables):
+        reference = grading.Reference(
+            grading.fingerprint_rows([(1,)], 1, ordered=False), reference_tables
+        )
+        with mock.patch.object(grading, "reference", return_value=reference), \
+                mock.patch.object(grading, "_grading_alias", return_value="default"), \
+                mock.patch.object(grading, "_run_query", return_value=(1, [(1,)])):
+            return grading.grade_submission(1, sql)
+
+    def test_tables_the_reference_reads_are_allowed(self):
+        self.assertTrue(self.grade("SELECT COUNT(*) FROM SUBMISSION", ("SUBMISSION",)))
+        self.assertTrue(self.grade("SELECT COUNT(*) FROM PROBLEM", ("SUBMISSION",)))
+
+    def test_other_tables_are_not(self):
+        with self.assertRaises(grading.GradingError):
+            self.grade("SELECT COUNT(*) FROM USER_AUTH", ("SUBMISSION",))
+
+    def test_reference_records_unqualified_tables(self):
+        with mock.patch.object(grading, "connection") as connection, \
+                mock.patch.object(grading, "_grading_alias", return_value="default"), \
+                mock.patch.object(grading, "_run_query", return_value=(1, [(1,)])):
+            cursor = connection.cursor.return_value.__enter__.return_value
+            cursor.fetchone.return_value = ("SELECT COUNT(*) FROM x.SUBMISSION JOIN ACCOUNT",)
+            result = grading._compute_reference(1)
+        self.assertEqual(result.tables, ("ACCOUNT", "SUBMISSION"))
+
+    def test_missing_reference_is_unavailable(self):
+        with mock.patch.object(grading, "connection") as connection:
+            connection.cursor.return_value.__enter__.return_value.fetchone.return_value = None
+            with self.assertRaises(grading.GradingUnavailable):
+                grading._compute_reference(1)
+
+
+LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class ConditionalTests(SimpleTestCase):
+    def test_matches_if_none_match(self):
+        etag = conditional.make_etag("catalog", 7)
+        request = RequestFactory().get("/", HTTP_IF_NONE_MATCH=f'W/{etag}, "other"')
+        self.assertTrue(conditional.is_not_modified(request, etag))
+        self.assertFalse(conditional.is_not_modified(RequestFactory().get("/"), etag))
+
+    @override_settings(CACHES=LOCMEM)
+    def test_no_etag_with_per_process_versions(self):
+        etag = conditional.make_etag("catalog", 7)
+        self.assertIsNone(etag)
+        self.assertEqual(conditional.etag_headers(etag), {})
+        request = RequestFactory().get("/", HTTP_IF_NONE_MATCH="*")
+        self.assertFalse(conditional.is_not_modified(request, etag))
+
+
+class TTLCacheTests(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ttl_cache.TTLCache(2, 60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((cache.get("a"), cache.get("c")), (1, 3))
+
+    def test_entries_expire(self):
+        cache = ttl_cache.TTLCache(10, 60)
+        with mock.patch("api.ttl_cache.time.monotonic", return_value=1000.0):
+            cache.set("a", 1)
+            self.assertEqual(cache.get("a"), 1)
+        with mock.patch("api.ttl_cache.time.monotonic", return_value=1061.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_zero_ttl_disables_the_cache(self):
+        cache = ttl_cache.TTLCache(10, 0)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+    def test_evict_if(self):
+        cache = ttl_cache.TTLCache(10, 60)
+        for key in "abc":
+            cache.set(key, key)
+        cache.evict_if(lambda value: value != "b")
+        self.assertEqual([cache.get(key) for key in "abc"], [None, "b", None])
+
+    def test_question_normalization(self):
+        self.assertEqual(
+            llm_cache.normalize_question("  How many   Problems? "),
+            llm_cache.normalize_question("how many problems"),
+        )
+        self.assertNotEqual(
+            llm_cache.question_key("q", "schema a", "model"),
+            llm_cache.question_key("q", "schema b", "model"),
+        )
+
+
+class SQLValidatorTests(SimpleTestCase):
+    def assertRejected(self, sql, allowed_tables=("PROBLEM",)):
+        with self.assertRaises(SQLValidationError):
+            validate_sql(sql, allowed_tables)
+
+    def test_single_select_only(self):
+        self.assertRejected("DELETE FROM PROBLEM")
+        self.assertRejected("SELECT 1; SELECT 2")
+        self.assertRejected("SELECT * INTO OUTFILE '/tmp/x' FROM PROBLEM")
+        self.assertEqual(validate_sql("select 1 ;  -- note").sql, "select 1")
+
+    def test_tables_outside_the_allowlist(self):
+        self.assertRejected("SELECT * FROM USER_AUTH")
+        self.assertRejected("SELECT * FROM ACCOUNT")
+        self.assertRejected("SELECT * FROM PROBLEM, USER_AUTH")
+        self.assertRejected("SELECT * FROM (SELECT * FROM USER_AUTH) x")
+        self.assertRejected("SELECT (SELECT Password FROM USER_AUTH LIMIT 1) FROM PROBLEM")
+
+    def test_parenthesized_table_references(self):
+        self.assertRejected("SELECT * FROM (USER_AUTH)", allowed_tables=())
+        self.assertRejected("SELECT * FROM (USER_AUTH)")
+        self.assertRejected("SELECT * FROM ((USER_AUTH)) x")
+        self.assertRejected("SELECT u.* FROM PROBLEM p JOIN (USER_AUTH u) ON 1=1")
+        self.assertRejected("SELECT * FROM PROBLEM p JOIN (USER_AUTH u, ACCOUNT a) ON 1=1")
+        self.assertRejected("SELECT * FROM (PROBLEM p JOIN USER_AUTH u ON 1=1)")
+
+    def test_index_hints_and_partitions(self):
+        for sql in (
+            "SELECT * FROM PROBLEM USE INDEX (PRIMARY), USER_AUTH",
+            "SELECT * FROM PROBLEM p FORCE INDEX (PRIMARY), USER_AUTH",
+            "SELECT * FROM PROBLEM IGNORE INDEX (PRIMARY), USER_AUTH",
+            "SELECT * FROM PROBLEM USE KEY (PRIMARY), ACCOUNT a",
+            "SELECT * FROM PROBLEM PARTITION (p0), USER_AUTH",
+            "SELECT * FROM PROBLEM p IGNORE KEY FOR JOIN (PRIMARY) JOIN USER_AUTH u ON 1=1",
+            "SELECT * FROM (PROBLEM USE INDEX (PRIMARY), USER_AUTH)",
+        ):
+            with self.subTest(sql=sql):
+                self.assertRejected(sql)
+        self.assertEqual(
+            validate_sql("SELECT * FROM PROBLEM p USE INDEX FOR ORDER BY (PRIMARY) ORDER BY 1").tables,
+            frozenset(["PROBLEM"]),
+        )
+
+    def test_exists_without_a_space(self):
+        self.assertEqual(
+            validate_sql("SELECT * FROM PROBLEM WHERE EXISTS(SELECT 1 FROM TAG)").tables,
+            frozenset(["PROBLEM", "TAG"]),
+        )
+        self.assertRejected("SELECT * FROM PROBLEM WHERE NOT EXISTS(SELECT 1 FROM USER_AUTH)")
+
+    def test_functions_outside_the_allowlist(self):
+        self.assertRejected("SELECT SLEEP(600)")
+        self.assertRejected("SELECT LOAD_FILE('/etc/passwd') FROM PROBLEM")
+        self.assertRejected("SELECT BENCHMARK(1000000, MD5('x'))")
+        self.assertRejected("SELECT sql_study_room.f(1)")
+        validate_sql(
+            "SELECT COUNT(*), UPPER(Problem_title), EXTRACT(YEAR FROM NOW()) FROM PROBLEM "
+            "GROUP BY Problem_title", ["PROBLEM"],
+        )
+
+    def test_ctes_and_dual(self):
+        recursive = (
+            "WITH RECURSIVE r(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM r WHERE n < 3) "
+            "SELECT * FROM r"
+        )
+        self.assertEqual(validate_sql(recursive, []).tables, frozenset())
+        self.assertEqual(
+            validate_sql("WITH p AS (SELECT * FROM PROBLEM) SELECT * FROM p").tables,
+            frozenset(["PROBLEM"]),
+        )
+        self.assertEqual(validate_sql("SELECT 1 FROM DUAL", []).tables, frozenset())
+
+    def test_hint_goes_after_the_main_select(self):
+        validated = validate_sql("WITH p AS (SELECT 1) SELECT * FROM p")
+        self.assertEqual(
+            validated.with_hint("MAX_EXECUTION_TIME(5)"),
+            "WITH p AS (SELECT 1) SELECT /*+ MAX_EXECUTION_TIME(5) */ * FROM p",
+        )
+
+
+class RollupBucketTests(SimpleTestCase):
+    @override_settings(ANALYTICS_DAILY_RETENTION_DAYS=28)
+    def test_daily_cutoff_is_a_monday(self):
+        cutoff = rollups.daily_cutoff(datetime.date(2026, 10, 15))
+        self.assertEqual(cutoff, datetime.date(2026, 9, 14))
+        self.assertEqual(cutoff.weekday(), 0)
+
+    def test_backdated_submissions_are_refused(self):
+        cursor = mock.Mock()
+        old = datetime.datetime.combine(rollups.daily_cutoff(), datetime.time()) - datetime.timedelta(days=1)
+        with self.assertRaises(ValueError):
+            rollups.record_submissions(cursor, [(1, 2, True, old)])
+        cursor.execute.assert_not_called()
+
+        rollups.record_submissions(cursor, [(1, 2, True, datetime.datetime.now())])
+        self.assertEqual(cursor.execute.call_count, 3)
+
+    def compact(self, rowcount):
+        with mock.patch.object(rollups, "connection") as connection, \
+                mock.patch.object(rollups, "transaction"), \
+                mock.patch.object(rollups.versions, "bump") as bump:
+            connection.cursor.return_value.__enter__.return_value.rowcount = rowcount
+            self.assertEqual(rollups.compact_buckets(datetime.date(2026, 9, 14)), rowcount)
+        return bump
+
+    def test_compaction_invalidates_analytics_etags(self):
+        self.compact(3).assert_called_once_with(rollups.versions.SUBMISSIONS)
+        self.compact(0).assert_not_called()
+
+
+class BatchItemTests(SimpleTestCase):
+    def parse(self, **fields):
+        from api.views.submission_views import _parse_batch_item
+
+        item = {"problem_id": 1, "account_number": 2, "submission": "SELECT 1", **fields}
+        return _parse_batch_item(item, datetime.datetime.now())
+
+    def test_aware_times_are_stored_naive_utc(self):
+        day = datetime.date.today().isoformat()
+        _, _, _, start, end = self.parse(
+            time_start=f"{day}T10:00:00+02:00", time_end=f"{day}T09:00:00Z"
+        )
+        self.assertEqual(start, datetime.datetime.fromisoformat(f"{day}T08:00:00"))
+        self.assertIsNone(end.tzinfo)
+
+    def test_time_start_after_time_end(self):
+        day = datetime.date.today().isoformat()
+        with self.assertRaises(ValueError):
+            self.parse(time_start=f"{day}T10:00:00", time_end=f"{day}T09:00:00")
+
+    def test_time_start_before_the_daily_cutoff(self):
+        with self.assertRaises(ValueError):
+            self.parse(time_start="2000-01-03T10:00:00", time_end="2000-01-03T11:00:00")
+
+
+class SubmissionBufferFlushTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.buffer = submission_buffer.SubmissionBuffer(directory.name, 1000, 100)
+        now = datetime.datetime.now()
+        self.rows = [(1, account, "SELECT 1", True, now, now) for account in (1, 2, 3)]
+        for row in self.rows:
+            self.buffer.append(row)
+
+    def test_bad_row_is_dead_lettered_and_the_rest_committed(self):
+        committed = []
+
+        def commit_rows(batch_id, rows):
+            if len(rows) > 1 or rows[0][1] == 2:
+                raise IntegrityError("foreign key")
+            committed.extend(rows)
+            return len(rows)
+
+        with mock.patch.object(self.buffer, "_commit_rows", side_effect=commit_rows):
+            self.buffer.flush()
+
+        self.assertEqual([row[1] for row in committed], [1, 3])
+        self.assertEqual(self.buffer.depth(), 0)
+        self.assertEqual(self.buffer.dead_rows, 1)
+        (dead,) = [name for name in os.listdir(self.buffer.directory) if name.endswith(".dead")]
+        with open(os.path.join(self.buffer.directory, dead)) as f:
+            self.assertEqual(json.loads(f.read())["row"][1], 2)
+
+    def test_restarted_worker_with_the_same_pid_replays_its_old_journal(self):
+        # the previous run of this pid left an unsealed segment behind
+        previous = submission_buffer.SubmissionBuffer(
+            self.buffer.directory, 1000, 100, owner=f"{os.getpid()}-previous"
+        )
+        previous.append(self.rows[0])
+        restarted = self.buffer
+        restarted._claim_orphans()
+        self.assertEqual(restarted.depth(), 4)  # its own three rows and the orphan
+
+        committed = []
+
+        def commit_rows(batch_id, rows):
+            committed.extend(rows)
+            return len(rows)
+
+        with mock.patch.object(restarted, "_commit_rows", side_effect=commit_rows):
+            restarted.flush()
+        self.assertEqual(len(committed), 4)
+        self.assertEqual(os.listdir(self.buffer.directory), [])
+
+    def test_live_owners_keep_their_segments(self):
+        other = submission_buffer.SubmissionBuffer(self.buffer.directory, 1000, 100, owner="1-x")
+        other.append(self.rows[0])
+        with mock.patch("api.processes.owner_alive", return_value=True):
+            self.buffer._claim_orphans()
+        self.assertEqual(self.buffer.depth(), 3)
+
+    def test_database_errors_keep_the_segment(self):
+        with mock.patch.object(self.buffer, "_commit_rows", side_effect=OSError("down")):
+            self.buffer.flush()
+        self.assertEqual(self.buffer.depth(), 3)
+        self.assertEqual(self.buffer.dead_rows, 0)
+        self.assertEqual(len(self.buffer._segments("sealed")), 1)
+
+
+class MetricsArchiveTests(SimpleTestCase):
+    KEY = ("sqlapi_submissions_total", ("batch", "true"))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dir = directory.name
+        settings = override_settings(METRICS_DIR=self.dir)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        for patcher in (
+            mock.patch.object(metrics, "_values", {self.KEY: 1}),
+            mock.patch.object(metrics.processes, "pid_alive", lambda pid: pid == 1001),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def snapshot(self, name, value):
+        with open(os.path.join(self.dir, name), "w") as f:
+            json.dump([[self.KEY[0], list(self.KEY[1]), value]], f)
+
+    def test_exited_workers_are_archived_once(self):
+        self.snapshot("archive.json", 100)
+        self.snapshot("1001.json", 10)  # alive
+        self.snapshot("1002.json", 20)  # exited
+
+        self.assertEqual(metrics.collect()[self.KEY], 131)
+        self.assertEqual(metrics.collect()[self.KEY], 131)
+        self.assertEqual(
+            sorted(os.listdir(self.dir)),
+            ["1001.json", f"{os.getpid()}.json", "archive.json", "archive.lock"],
+        )
+        self.assertEqual(metrics._load(os.path.join(self.dir, "archive.json"))[0][2], 120)
+
+    def test_snapshot_of_an_earlier_process_with_our_pid_is_kept(self):
+        self.snapshot(f"{os.getpid()}.json", 5)  # e.g. a worker before a container restart
+        with metrics._archive_lock():
+            metrics._archive_dead(reused_pid=os.getpid())
+        self.assertEqual(metrics.collect()[self.KEY], 6)
+
+
+class ProcessOwnerTests(SimpleTestCase):
+    def test_owner_tokens(self):
+        token = processes.owner_token()
+        self.assertTrue(token.startswith(f"{os.getpid()}-"))
+        self.assertTrue(processes.owner_alive(token))
+        # this pid in an earlier incarnation
+        self.assertFalse(processes.owner_alive(f"{os.getpid()}-previous"))
+        self.assertFalse(processes.owner_alive("not-a-token"))
+
+    def test_reused_pid_is_a_different_owner(self):
+        with mock.patch("api.processes.pid_alive", return_value=True), \
+                mock.patch("api.processes._start_time", return_value="200"):
+            self.assertTrue(processes.owner_alive("999999-200"))
+            self.assertFalse(processes.owner_alive("999999-100"))
+        with mock.patch("api.processes.pid_alive", return_value=False):
+            self.assertFalse(processes.owner_alive("999999-200"))
+
+
+class QueryParamTests(SimpleTestCase):
+    def test_parse_bool(self):
+        self.assertIsNone(query_params.parse_bool(None))
+        self.assertIsNone(query_params.parse_bool(""))
+        self.assertTrue(query_params.parse_bool(" True"))
+        self.assertFalse(query_params.parse_bool("0"))
+        with self.assertRaises(ValueError):
+            query_params.parse_bool("maybe")
+
+    def test_cursor_round_trip(self):
+        naive = datetime.datetime(2026, 3, 1, 9, 30, 15, 123456)
+        aware = datetime.datetime(
+            2026, 3, 1, 11, 30, 15, 123456, tzinfo=datetime.timezone(datetime.timedelta(hours=2))
+        )
+        for moment in (naive, aware):
+            cursor = query_params.encode_cursor(moment, 42)
+            self.assertRegex(cursor, r"^[A-Za-z0-9_-]+$")
+            self.assertEqual(query_params.decode_cursor(cursor), (naive, 42))
+
+    def test_malformed_cursor(self):
+        for value in ("", "2026-03-01T09:30:00+00:00|42", "bm90LWEtY3Vyc29y", "%%%"):
+            with self.assertRaises(ValueError):
+                query_params.decode_cursor(value)
+
+
+class SubmissionHistoryTests(SimpleTestCase):
+    def list(self, **params):
+        from api.views import submission_views
+
+        request = RequestFactory().get("/", params)
+        with mock.patch.object(submission_views, "connection") as connection:
+            cursor = connection.cursor.return_value.__enter__.return_value
+            cursor.fetchall.return_value = [
+                (9, 1, 1, datetime.datetime(2026, 3, 2, 8), datetime.datetime(2026, 3, 2, 8, 5)),
+                (7, 2, 0, datetime.datetime(2026, 3, 1, 8), datetime.datetime(2026, 3, 1, 8, 5)),
+            ]
+            cursor.fetchone.return_value = (30, 12, 6, 4)
+            response = submission_views.list_submissions(request, account_number=5)
+        return response, cursor.execute.call_args_list
+
+    def test_first_page_summarizes_the_whole_filtered_set(self):
+        response, queries = self.list(limit=1, correct="false")
+        body = json.loads(response.content)
+        self.assertEqual(body["summary"]["total_submissions"], 30)
+        summary_sql, summary_args = queries[1].args
+        self.assertNotIn("LIMIT", summary_sql)
+        self.assertEqual(summary_args, [5, 0])
+
+        _, queries = self.list(cursor=body["next_cursor"])
+        page_sql, page_args = queries[0].args
+        self.assertEqual(len(queries), 1)  # no summary after the first page
+        self.assertEqual(page_args[1:3], [datetime.datetime(2026, 3, 2, 8), 9])
+
+    def test_bad_cursor_is_a_400(self):
+        response, queries = self.list(cursor="2026-03-01T08:00:00+00:00|7")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(queries, [])
+
+
+class QueryFingerprintTests(SimpleTestCase):
+    def test_literals_and_placeholders(self):
+        self.assertEqual(
+            query_stats.fingerprint("SELECT * FROM t2 WHERE a = 5 AND b = 'it''s' AND c = %s"),
+            "SELECT * FROM t2 WHERE a = ? AND b = ? AND c = ?",
+        )
+        self.assertEqual(
+            query_stats.fingerprint("SELECT t.x FROM t WHERE v = -1.5e3;"),
+            "SELECT t.x FROM t WHERE v = ?",
+        )
+
+    def test_lists_of_any_length_share_a_fingerprint(self):
+        self.assertEqual(
+            query_stats.fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s)"),
+            query_stats.fingerprint("SELECT * FROM t WHERE id IN (1)"),
+        )
+        self.assertEqual(
+            query_stats.fingerprint("INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)"),
+            "INSERT INTO t (a, b) VALUES (...)",
+        )
+
+    def test_whitespace_is_collapsed(self):
+        self.assertEqual(query_stats.fingerprint("SELECT\n  a\n FROM t "), "SELECT a FROM t")
+
+    @override_settings(QUERY_STATS_MAX_FINGERPRINTS=1000)
+    def test_top_orders_by_total_time(self):
+        query_stats.reset()
+        self.addCleanup(query_stats.reset)
+        query_stats.record("SELECT 1", 3.0)
+        query_stats.record("SELECT 2", 4.0)
+        query_stats.record("SELECT a FROM t", 5.0)
+        report = query_stats.top()
+        self.assertEqual(
+            [(row["fingerprint"], row["count"]) for row in report["top"]],
+            [("SELECT ?", 2), ("SELECT a FROM t", 1)],
+        )
+        self.assertEqual(report["top"][0]["p50_ms"], 5)
+
+
+class RowMapperTests(SimpleTestCase):
+    def cursor(self, columns, rows):
+        cursor = mock.Mock()
+        cursor.description = [(column,) for column in columns]
+        cursor.fetchall.return_value = rows
+        cursor.fetchone.return_value = rows[0] if rows else None
+        return cursor
+
+    def test_maps_by_column_name_in_any_order(self):
+        columns = ["Problem_ID", "Problem_title", "Difficulty_level", "SQL_concept",
+                   "Review_status", "Tag_ID"]
+        (record,) = row_mappers.PROBLEM_SUMMARY.all(
+            self.cursor(columns, [(7, None, "EASY", "JOIN, GROUP BY", 1, 3)])
+        )
+        self.assertEqual(record.as_dict(), {
+            "pId": 7, "pTitle": "", "difficultyTag": "Easy",
+            "conceptTag": ("Join", "Group by"), "pSolutionId": 3, "reviewed": True,
+        })
+        self.assertEqual(dict(record), record.as_dict())
+
+    def test_compiled_once_per_shape(self):
+        mapper = row_mappers.RowMapper("Pair", [row_mappers.Field("a", "A"), row_mappers.Field("b", "b")])
+        self.assertIs(mapper.compile(("A", "B")), mapper.compile(("A", "B")))
+        self.assertEqual(mapper.compile(("B", "a"))((2, 1)).as_dict(), {"a": 1, "b": 2})
+
+    def test_missing_column(self):
+        with self.assertRaises(ValueError):
+            row_mappers.USER.compile(("Account_number",))
+
+    def test_one(self):
+        self.assertIsNone(row_mappers.PROFILE.one(self.cursor(["Email"], [])))
+        record = row_mappers.USER.one(self.cursor(
+            ["Account_number", "First_name", "Last_name", "Email", "Student_flag",
+             "Admin_flag", "Register_date"],
+            [(1, "A", "B", "a@b.c", 1, 0, None)],
+        ))
+        self.assertEqual((record["accountNumber"], record.email), (1, "a@b.c"))
+        with self.assertRaises(KeyError):
+            record["Email"]
+
+
+class FakeSessionDB:
+    """Stands in for ACCOUNT and ACCOUNT_SESSION behind auth_tokens' cursor."""
+
+    def __init__(self, accounts):
+        self.accounts = accounts  # account_number -> (admin, student)
+        self.versions = {}
+        self.queries = 0
+        self._row = None
+
+    def cursor(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params):
+        self.queries += 1
+        statement = sql.lstrip()
+        if statement.startswith("INSERT"):
+            for number in params:
+                if number in self.accounts:
+                    self.versions[number] = self.versions.get(number, 0) + 1
+            return
+        if statement.startswith("SELECT Account_number, Email FROM ACCOUNT"):
+            self._rows = [(n, f"{n}@example.com") for n in sorted(self.accounts) if n in params]
+            return
+        if statement.startswith("DELETE"):
+            table = statement.split()[2]
+            for number in params:
+                if table == "ACCOUNT_SESSION":
+                    self.versions.pop(number, None)
+                elif table == "ACCOUNT":
+                    self.accounts.pop(number, None)
+            return
+        number = params[0]
+        version = self.versions.get(number, 0)
+        if "FROM ACCOUNT a" in sql:
+            flags = self.accounts.get(number)
+            self._row = None if flags is None else (*flags, version)
+        else:
+            self._row = (version,) if number in self.versions else None
+
+    def fetchone(self):
+        return self._row
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeTransaction:
+    """atomic() runs the on_commit callbacks registered inside it when it exits cleanly."""
+
+    def __init__(self):
+        self.callbacks = []
+
+    @contextlib.contextmanager
+    def atomic(self):
+        yield
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def on_commit(self, callback):
+        self.callbacks.append(callback)
+
+
+@override_settings(AUTH_REQUIRE_TOKENS=False)
+class SessionTokenTests(SimpleTestCase):
+    def setUp(self):
+        self.db = FakeSessionDB({1: (True, False), 2: (False, True)})
+        patcher = mock.patch("api.auth_tokens.connection", self.db)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        auth_tokens._principals.clear()
+        self.addCleanup(auth_tokens._principals.clear)
+
+    def request(self, token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"} if token else {}
+        return RequestFactory().get("/", **headers)
+
+    def test_issue_and_authenticate(self):
+        token = auth_tokens.issue(2)
+        self.assertEqual(
+            auth_tokens.authenticate(self.request(token)), auth_tokens.Principal(2, False, True)
+        )
+        queries = self.db.queries
+        auth_tokens.authenticate(self.request(token))
+        self.assertEqual(self.db.queries, queries)  # served from the principal cache
+
+    def test_invalid_tokens(self):
+        self.assertIsNone(auth_tokens.authenticate(self.request()))
+        self.assertIsNone(auth_tokens.authenticate(self.request(auth_tokens.issue(2) + "x")))
+        self.assertIsNone(auth_tokens.authenticate(self.request(auth_tokens.issue(3))))
+        with override_settings(AUTH_TOKEN_MAX_AGE=-1):
+            self.assertIsNone(auth_tokens.authenticate(self.request(auth_tokens.issue(2))))
+
+    def test_revoke(self):
+        old = auth_tokens.issue(2)
+        other = auth_tokens.issue(1)
+        auth_tokens.authenticate(self.request(old))
+        auth_tokens.authenticate(self.request(other))
+        auth_tokens.revoke([2])
+        self.assertIsNone(auth_tokens.authenticate(self.request(old)))
+        self.assertIsNotNone(auth_tokens.authenticate(self.request(other)))
+        self.assertIsNotNone(auth_tokens.authenticate(self.request(auth_tokens.issue(2))))
+
+    def test_admin_routes_share_one_policy(self):
+        from api.views import admin_views
+
+        request = RequestFactory().get("/admin/user-stats/")
+        with mock.patch.object(admin_views, "connection") as connection:
+            connection.cursor.return_value.__enter__.return_value.fetchall.return_value = []
+            with override_settings(AUTH_REQUIRE_TOKENS=True):
+                self.assertEqual(admin_views.admin_user_stats(request).status_code, 401)
+            self.assertEqual(admin_views.admin_user_stats(request).status_code, 200)
+
+    def test_requires_principal(self):
+        @auth_tokens.requires_principal(admin=True, enforce=None)
+        def view(request):
+            return request.principal
+
+        self.assertIsNone(view(self.request()))
+        self.assertEqual(view(self.request(auth_tokens.issue(2))).status_code, 403)
+        self.assertEqual(view(self.request(auth_tokens.issue(1))).account_number, 1)
+        self.assertEqual(view(self.request("garbage")).status_code, 401)
+        with override_settings(AUTH_REQUIRE_TOKENS=True):
+            self.assertEqual(view(self.request()).status_code, 401)
+
+
+@override_settings(AUTH_REQUIRE_TOKENS=False, USER_DELETE_CHUNK=2)
+class BulkDeleteUsersTests(SimpleTestCase):
+    def setUp(self):
+        from api.views import auth_views
+
+        self.db = FakeSessionDB({1: (True, False), 2: (False, True), 3: (False, True)})
+        for patcher in (
+            mock.patch("api.auth_tokens.connection", self.db),
+            mock.patch.object(auth_views, "connection", self.db),
+            mock.patch.object(auth_views, "transaction", FakeTransaction()),
+            mock.patch.object(auth_views.rollups, "remove_account_submissions"),
+            mock.patch.object(auth_views.versions, "bump"),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        auth_tokens._principals.clear()
+        self.addCleanup(auth_tokens._principals.clear)
+        self.view = auth_views.bulk_delete_users
+
+    def post(self, body):
+        return self.view(RequestFactory().post(
+            "/users/bulk-delete/", json.dumps(body), content_type="application/json"
+        ))
+
+    def test_dry_run_must_be_a_boolean(self):
+        for dry_run in ("false", "true", 0, None):
+            response = self.post({"account_numbers": [2], "dry_run": dry_run})
+            self.assertEqual(response.status_code, 400, dry_run)
+        self.assertEqual(set(self.db.accounts), {1, 2, 3})
+
+    def test_dates_must_parse(self):
+        for bounds in (
+            {"registered_before": "last week"},
+            {"registered_before": "2026-02-30"},
+            {"registered_after": 20260101},
+            {"registered_before": "2026-09-01", "registered_after": "01/01/2026"},
+        ):
+            self.assertEqual(self.post(bounds).status_code, 400, bounds)
+        self.assertEqual(self.db.queries, 0)
+
+    def test_revocation_only_touches_accounts_that_still_exist(self):
+        token = auth_tokens.issue(2)
+        auth_tokens.authenticate(RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+        auth_tokens.revoke([2])  # an earlier logout left a session row
+        self.assertEqual(self.db.versions, {2: 1})
+
+        response = self.post({"account_numbers": [2, 3, 4], "dry_run": False})
+
+        self.assertEqual(response.data, {"success": True, "deleted": 2, "chunks": 1})
+        self.assertEqual(set(self.db.accounts), {1})
+        self.assertEqual(self.db.versions, {})
+        self.assertIsNone(auth_tokens.authenticate(
+            RequestFactory().get("/", HTTP_AUTHORIZATION=f"Bearer {token}")
+        ))
+
+
+@override_settings(AUTH_REQUIRE_TOKENS=False)
+class SubmitAsPrincipalTests(SimpleTestCase):
+    def submit_batch(self, principal):
+        from api.views import submission_views
+
+        body = json.dumps({"submissions": [
+            {"problem_id": 1, "account_number": 9, "submission": "SELECT 1"},
+            {"problem_id": 1, "submission": "SELECT 2"},
+        ]})
+        request = RequestFactory().post(
+            "/submissions/batch/", body, content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer t",
+        )
+        with mock.patch("api.auth_tokens.authenticate", return_value=principal), \
+                mock.patch.object(submission_views, "connection"), \
+                mock.patch.object(submission_views, "transaction"), \
+                mock.patch.object(submission_views, "_existing_ids", side_effect=lambda c, t, col, ids: ids), \
+                mock.patch.object(submission_views, "grade_submission", return_value=True), \
+                mock.patch.object(submission_views.versions, "bump"), \
+                mock.patch.object(submission_views.submission_buffer, "insert_submissions") as insert:
+            response = submission_views.submit_batch(request)
+        return response, insert
+
+    def test_student_submits_as_themselves(self):
+        response, insert = self.submit_batch(auth_tokens.Principal(5, False, True))
+        self.assertEqual(json.loads(response.content)["inserted"], 2)
+        (_, rows), _ = insert.call_args
+        self.assertEqual([row[1] for row in rows], [5, 5])
+
+    def test_admin_submits_for_the_accounts_given(self):
+        response, insert = self.submit_batch(auth_tokens.Principal(1, True, False))
+        results = json.loads(response.content)["results"]
+        self.assertEqual(results[1], {"index": 1, "success": False, "error": "missing field account_number"})
+        (_, rows), _ = insert.call_args
+        self.assertEqual([row[1] for row in rows], [9])
+
+
+@override_settings(AUTH_REQUIRE_TOKENS=False, SUBMISSION_WRITE_BEHIND=False)
+class UngradableSubmissionTests(SimpleTestCase):
+    def submit(self, error):
+        from api.views import problem_views
+
+        request = RequestFactory().post(
+            "/problems/1/submit/", json.dumps({"account_number": 2, "submission": "SELECT 1"}),
+            content_type="application/json",
+        )
+        with mock.patch.object(problem_views, "connection") as connection, \
+                mock.patch.object(problem_views, "transaction") as transaction, \
+                mock.patch.object(problem_views, "grade_submission", side_effect=error):
+            connection.cursor.return_value.__enter__.return_value.fetchone.return_value = (1, 1)
+            response = problem_views.submit_problem(request, 1)
+        transaction.atomic.assert_not_called()
+        return response
+
+    def test_grading_unavailable_stores_nothing(self):
+        response = self.submit(grading.GradingUnavailable("no grading database"))
+        self.assertEqual(response.status_code, 503)
+
+    def test_ungradable_submission_stores_nothing(self):
+        response = self.submit(grading.GradingError("Query exceeded the limit"))
+        self.assertEqual(response.status_code, 422)
+
+
+class FakeCursor:
+    """A DB-API cursor returning fixed rows, recording what it executed."""
+
+    def __init__(self, columns, rows):
+        self.description = [(column,) for column in columns]
+        self.rows = rows
+        self.executed = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    def fetchall(self):
+        return list(self.rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+PROBLEM_COLUMNS = ["Problem_ID", "Problem_description", "Review_status", "Tag_ID",
+                   "Difficulty_level", "SQL_concept", "Problem_title"]
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ProblemListTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(catalog_cache, "_entries", catalog_cache.OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def list(self, rows=(), **params):
+        from api.views import problem_views
+
+        cursor = FakeCursor(PROBLEM_COLUMNS, rows)
+        with mock.patch.object(problem_views, "connection") as connection:
+            connection.cursor.return_value = cursor
+            response = problem_views.list_problems(RequestFactory().get("/problems/", params))
+        return response, cursor.executed
+
+    def test_keyset_pages(self):
+        rows = [(i, "d", 1, 3, "EASY", "JOIN", f"p{i}") for i in (4, 5, 6)]
+        response, [(sql, args)] = self.list(rows, limit=2, cursor=3)
+        body = json.loads(response.content)
+        self.assertEqual([p["pId"] for p in body["results"]], [4, 5])
+        self.assertEqual(body["next_cursor"], 5)
+        self.assertIn("p.Problem_ID > %s", sql)
+        self.assertEqual(args, [3, 3])  # after id 3, limit + 1 rows
+
+        response, _ = self.list(rows[:1], limit=2)
+        self.assertIsNone(json.loads(response.content)["next_cursor"])
+
+    def test_unpaginated_list(self):
+        response, [(sql, args)] = self.list([(1, None, 0, None, None, None, None)])
+        self.assertNotIn("LIMIT", sql)
+        self.assertEqual(json.loads(response.content), [{
+            "pId": 1, "pTitle": "", "difficultyTag": "", "conceptTag": [],
+            "pDescription": "", "pSolutionId": None, "reviewed": False,
+        }])
+
+    def test_filters(self):
+        _, [(sql, args)] = self.list(difficulty=" easy", concept="join", reviewed="true", tag=3)
+        self.assertEqual(args, ["EASY", "%join%", 1, 3])
+        for condition in ("d.Difficulty_level = %s", "c.SQL_concept LIKE %s",
+                          "p.Review_status = %s", "p.Tag_ID = %s"):
+            self.assertIn(condition, sql)
+
+        _, [(sql, _)] = self.list(summary="1")
+        self.assertIn("NULL", sql)
+        self.assertNotIn("p.Problem_description", sql)
+
+    def test_malformed_parameters(self):
+        for params in ({"reviewed": "maybe"}, {"cursor": "abc"}, {"limit": "ten"}):
+            response, executed = self.list(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(executed, [])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ProblemDetailTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(catalog_cache, "_entries", catalog_cache.OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, rows):
+        from api.views import problem_views
+
+        cursor = FakeCursor(["Problem_ID", "Problem_description", "Tag_ID", "Difficulty_level",
+                             "SQL_concept", "Problem_title", "Review_status"], rows)
+        with mock.patch.object(problem_views, "connection") as connection:
+            connection.cursor.return_value = cursor
+            return problem_views.get_problem(RequestFactory().get("/problems/7/"), pid=7)
+
+    def test_problem(self):
+        response = self.get([(7, "Find ...", 3, "MEDIUM", "JOIN, GROUP BY", None, 1)])
+        self.assertEqual(json.loads(response.content), {
+            "pId": 7, "pTitle": None, "difficultyTag": "Medium",
+            "conceptTag": ["JOIN", "GROUP BY"], "pDescription": "Find ...",
+            "pSolutionId": 3, "reviewed": True,
+        })
+
+    def test_unknown_or_unpublished_problem(self):
+        self.assertEqual(self.get([]).status_code, 404)
+
+
+class CatalogCacheTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        # a file cache is shared between processes, so versions make ETags
+        settings = override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": directory.name,
+        }})
+        settings.enable()
+        self.addCleanup(settings.disable)
+        patcher = mock.patch.object(catalog_cache, "_entries", catalog_cache.OrderedDict())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return {"build": self.builds}
+
+    def get(self, etag=None):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        request = RequestFactory().get("/problems/", **headers)
+        return catalog_cache.cached_response(request, "list_problems", "", self.build)
+
+    def test_hits_are_served_without_building(self):
+        self.assertEqual(json.loads(self.get().content), {"build": 1})
+        self.assertEqual(json.loads(self.get().content), {"build": 1})
+        self.assertEqual(self.builds, 1)
+
+    def test_writes_invalidate(self):
+        self.get()
+        catalog_cache.bump_version()
+        self.assertEqual(json.loads(self.get().content), {"build": 2})
+
+    def test_etag_round_trip(self):
+        etag = self.get()["ETag"]
+        self.assertTrue(etag)
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(self.get(f"W/{etag}").status_code, 304)
+
+        catalog_cache.bump_version()
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_missing_entries_are_not_cached(self):
+        request = RequestFactory().get("/problems/9/")
+        self.assertIsNone(catalog_cache.cached_response(request, "get_problem", 9, lambda: None))
+        self.assertEqual(len(catalog_cache._entries), 0)
+
+    @override_settings(CATALOG_CACHE_MAX_ENTRIES=2)
+    def test_entries_are_bounded(self):
+        for key in range(3):
+            catalog_cache.get_or_build("get_problem", key, self.build)
+        self.assertEqual(list(catalog_cache._entries), [("get_problem", 1), ("get_problem", 2)])
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        from api.mysql_pool import base
+
+        self.now = 1000.0
+        patcher = mock.patch.object(base.time, "monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = base.ConnectionPool(size=1, max_age=300, pre_ping=True)
+
+    def test_idle_connections_are_reused(self):
+        conn = self.pool.acquire(mock.Mock)
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(mock.Mock), conn)
+        conn.ping.assert_called_once_with(False)
+        self.assertEqual(self.pool.stats(), {"idle": 0, "created": 1, "reused": 1, "discarded": 0})
+
+    def test_dead_connections_fail_the_pre_ping(self):
+        conn = self.pool.acquire(mock.Mock)
+        self.pool.release(conn)
+        conn.ping.side_effect = OSError("gone away")
+        fresh = self.pool.acquire(mock.Mock)
+        self.assertIsNot(fresh, conn)
+        conn.close.assert_called_once_with()
+        self.assertEqual(self.pool.stats()["discarded"], 1)
+
+    def test_connections_are_recycled_after_max_age(self):
+        conn = self.pool.acquire(mock.Mock)
+        self.pool.release(conn)
+        self.now += 301
+        self.assertIsNot(self.pool.acquire(mock.Mock), conn)
+        conn.ping.assert_not_called()
+        conn.close.assert_called_once_with()
+
+        old = self.pool.acquire(mock.Mock)
+        self.now += 301
+        self.pool.release(old)  # expired while checked out
+        old.close.assert_called_once_with()
+        self.assertEqual(self.pool.stats()["idle"], 0)
+
+    def test_extra_connections_are_closed(self):
+        first, second = self.pool.acquire(mock.Mock), self.pool.acquire(mock.Mock)
+        self.pool.release(first)
+        self.pool.release(second)
+        second.close.assert_called_once_with()
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+
+class ChunkedCursor(FakeCursor):
+    def __init__(self, columns, rows):
+        super().__init__(columns, rows)
+        self.fetches = 0
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        self.fetches += 1
+        return chunk
+
+
+@override_settings(NL2SQL_FETCH_CHUNK=2)
+class CappedResultTests(SimpleTestCase):
+    def setUp(self):
+        from api.views import chat_views
+
+        self.chat_views = chat_views
+        self.close_result_cursor = chat_views.close_result_cursor
+        self.cursor = ChunkedCursor(["n"], [(i,) for i in range(5)])
+        self.closed = []
+        for patcher in (
+            mock.patch.object(chat_views, "prepare_generated_sql", lambda sql: sql),
+            mock.patch.object(chat_views, "result_cursor", lambda: self.cursor),
+            mock.patch.object(
+                chat_views, "close_result_cursor",
+                lambda cursor, exhausted: self.closed.append(exhausted),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_rows_are_fetched_in_chunks_up_to_the_cap(self):
+        columns, rows, truncated = self.chat_views.execute_sql("SELECT n FROM t", max_rows=3)
+        self.assertEqual(rows, [{"n": 0}, {"n": 1}, {"n": 2}])
+        self.assertTrue(truncated)
+        self.assertEqual(self.cursor.fetches, 2)  # the rest stays on the server
+        self.assertEqual(self.closed, [False])  # not read to the end: dropped
+
+    def test_a_result_within_the_cap_is_exhausted(self):
+        _, rows, truncated = self.chat_views.execute_sql("SELECT n FROM t", max_rows=5)
+        self.assertEqual(len(rows), 5)
+        self.assertFalse(truncated)
+        self.assertEqual(self.closed, [True])
+
+    def test_stream_ends_with_a_trailer(self):
+        lines = self.chat_views.stream_sql_ndjson("q", "SELECT n FROM t", max_rows=4)
+        decoded = [json.loads(line) for line in lines]
+        self.assertEqual(decoded[0], {"question": "q", "sql": "SELECT n FROM t", "columns": ["n"]})
+        self.assertEqual(decoded[1:5], [{"n": i} for i in range(4)])
+        self.assertEqual(decoded[5], {"row_count": 4, "truncated": True})
+        self.assertEqual(self.closed, [False])
+
+    def test_client_leaving_mid_stream_drops_the_cursor(self):
+        lines = self.chat_views.stream_sql_ndjson("q", "SELECT n FROM t", max_rows=10)
+        next(lines)
+        next(lines)
+        lines.close()
+        self.assertEqual(self.closed, [False])
+
+    def test_unread_server_side_results_drop_the_connection(self):
+        cursor = mock.Mock()
+        with mock.patch.object(self.chat_views, "connection") as connection:
+            connection.vendor = "mysql"
+            self.close_result_cursor(cursor, exhausted=True)
+            cursor.close.assert_called_once_with()
+            connection.close.assert_not_called()
+
+            self.close_result_cursor(cursor, exhausted=False)
+            connection.connection._force_close.assert_called_once_with()
+            self.assertTrue(connection.errors_occurred)
+            connection.close.assert_called_once_with()
+
+
+class SQLGuardTests(SimpleTestCase):
+    def explain(self, plan):
+        from api import sql_guard
+
+        cursor = FakeCursor(["id", "table", "rows", "filtered"], plan)
+        patcher = mock.patch.object(sql_guard, "connection")
+        connection = patcher.start()
+        self.addCleanup(patcher.stop)
+        connection.vendor = "mysql"
+        connection.cursor.return_value = cursor
+        return sql_guard
+
+    def test_estimates_multiply_within_a_select_and_add_across(self):
+        sql_guard = self.explain([
+            (1, "a", 1000, 10.0),  # 100 rows
+            (1, "b", 5, 100.0),    # joined: x 5
+            (2, "c", 40, None),    # a subquery
+        ])
+        self.assertEqual(sql_guard.estimated_rows("SELECT 1"), 540)
+
+    @override_settings(NL2SQL_MAX_ESTIMATED_ROWS=500)
+    def test_row_estimate_rejection(self):
+        sql_guard = self.explain([(1, "a", 501, 100.0)])
+        before = sql_guard.guard_counts().get("row_estimate", 0)
+        with self.assertRaises(sql_guard.SQLGuardError) as raised:
+            sql_guard.check_estimated_rows("SELECT a FROM a")
+        self.assertEqual(raised.exception.guard, "row_estimate")
+        self.assertEqual(sql_guard.guard_counts()["row_estimate"], before + 1)
+
+        self.explain([(1, "a", 500, 100.0)]).check_estimated_rows("SELECT a FROM a")
+        with override_settings(NL2SQL_MAX_ESTIMATED_ROWS=0):
+            self.explain([(1, "a", 10 ** 9, 100.0)]).check_estimated_rows("SELECT a FROM a")
+
+    def test_execution_time_hint(self):
+        from api import sql_guard
+
+        validated = sql_guard.check_statement("SELECT Problem_ID FROM PROBLEM", ["PROBLEM"])
+        self.assertIn("MAX_EXECUTION_TIME(250)", sql_guard.with_time_limit(validated, 250))
+        self.assertEqual(sql_guard.with_time_limit(validated, 0), validated.sql)
+
+    def test_validation_failures_are_guard_errors(self):
+        from api import sql_guard
+
+        with self.assertRaises(sql_guard.SQLGuardError) as raised:
+            sql_guard.check_statement("DELETE FROM PROBLEM", ["PROBLEM"])
+        self.assertEqual(raised.exception.guard, "validation")
+
+    @override_settings(NL2SQL_FETCH_CHUNK=10)
+    def test_statement_timeout(self):
+        from django.db import OperationalError
+
+        from api import sql_guard
+        from api.views import chat_views
+
+        self.assertTrue(sql_guard.is_timeout_error(OperationalError(3024, "timeout")))
+        self.assertFalse(sql_guard.is_timeout_error(OperationalError(2006, "gone away")))
+
+        cursor = ChunkedCursor(["n"], [])
+        cursor.execute = mock.Mock(side_effect=OperationalError(3024, "timeout"))
+        with mock.patch.object(chat_views, "prepare_generated_sql", lambda sql: sql), \
+                mock.patch.object(chat_views, "result_cursor", lambda: cursor), \
+                mock.patch.object(chat_views, "close_result_cursor"):
+            with self.assertRaises(sql_guard.SQLGuardError) as raised:
+                chat_views.execute_sql("SELECT n FROM t")
+        self.assertEqual(raised.exception.guard, "timeout")
+
+
+@override_settings(AUTH_REQUIRE_TOKENS=False)
+class SubmissionAnalyticsTests(SimpleTestCase):
+    def get(self, rows=(), columns=("bucket", "submission_count", "correct_submissions"),
+            headers=None, **params):
+        from api.views import admin_views
+
+        cursor = FakeCursor(columns, rows)
+        request = RequestFactory().get("/admin/submission-analytics/", params, **(headers or {}))
+        with mock.patch.object(admin_views, "connection") as connection:
+            connection.cursor.return_value = cursor
+            response = admin_views.admin_submission_analytics(request)
+        return response, cursor.executed
+
+    def test_weekly_buckets_include_uncompacted_days(self):
+        response, [(sql, args)] = self.get(start="2026-03-04", end="2026-03-20")
+        self.assertEqual(response.data["start"], "2026-03-02")  # rounded down to Monday
+        self.assertIn("FROM SUBMISSION_WEEKLY", sql)
+        self.assertIn("FROM SUBMISSION_DAILY", sql)
+        self.assertEqual(args, [datetime.date(2026, 3, 2), datetime.date(2026, 3, 20)] * 2)
+
+    def test_daily_buckets_and_solve_rates(self):
+        rows = [(datetime.date(2026, 3, 4), Decimal(4), Decimal(1)),
+                (datetime.date(2026, 3, 5), None, None)]
+        response, [(sql, args)] = self.get(rows, granularity="day", start="2026-03-04",
+                                           end="2026-03-05")
+        self.assertNotIn("SUBMISSION_WEEKLY", sql)
+        self.assertEqual(args, [datetime.date(2026, 3, 4), datetime.date(2026, 3, 5)])
+        self.assertEqual(response.data["buckets"], [
+            {"bucket": "2026-03-04", "submission_count": 4, "correct_submissions": 1,
+             "solve_rate": 0.25},
+            {"bucket": "2026-03-05", "submission_count": 0, "correct_submissions": 0,
+             "solve_rate": None},
+        ])
+
+    def test_filters_and_grouping(self):
+        _, [(sql, args)] = self.get(granularity="day", start="2026-03-04", end="2026-03-05",
+                                    group_by="concept", problem_id=7, tag_id=3, concept_id=2)
+        self.assertEqual(args[2:], [7, 3, 2])
+        for fragment in ("b.Problem_ID = %s", "t.Tag_ID = %s", "c.Concept_ID = %s",
+                         "c.Concept_ID AS concept_id", "GROUP BY b.bucket, c.Concept_ID"):
+            self.assertIn(fragment, sql)
+
+    def test_invalid_parameters(self):
+        for params in ({"granularity": "month"}, {"group_by": "student"},
+                       {"start": "2026-13-01"}, {"problem_id": "x"},
+                       {"start": "2026-03-10", "end": "2026-03-01", "granularity": "day"}):
+            response, executed = self.get(**params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertEqual(executed, [])
+
+    def test_etag_covers_the_parameters(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        with override_settings(CACHES={"default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": directory.name,
+        }}):
+            params = {"start": "2026-03-02", "end": "2026-03-08"}
+            etag = self.get(**params)[0]["ETag"]
+            self.assertEqual(
+                self.get(headers={"HTTP_IF_NONE_MATCH": etag}, **params)[0].status_code, 304
+            )
+            for changed in ({"granularity": "day"}, {"group_by": "problem"}, {"problem_id": 7}):
+                response, _ = self.get(headers={"HTTP_IF_NONE_MATCH": etag}, **params, **changed)
+                self.assertEqual(response.status_code, 200, changed)
+
+
+class RequestTimingTests(SimpleTestCase):
+    def get_response(self, request):
+        from django.http import HttpResponse
+
+        from api import request_timing
+
+        self.middleware.process_view(request, None, (), {})
+        for _ in range(2):
+            request_timing._db_wrapper(mock.Mock(), "SELECT 1", None, False, {})
+        with request_timing.span("serialize"):
+            body = b"[]"
+        return HttpResponse(body)
+
+    def call(self):
+        from api import request_timing
+
+        self.middleware = request_timing.RequestTimingMiddleware(self.get_response)
+        return self.middleware(RequestFactory().get("/problems/"))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1)
+    def test_server_timing_header(self):
+        with self.assertLogs("api.timing", "INFO") as logs:
+            response = self.call()
+        phases = dict(
+            part.strip().split(";", 1) for part in response["Server-Timing"].split(",")
+        )
+        self.assertEqual(list(phases), ["db", "view", "render", "total", "serialize", "queries"])
+        self.assertRegex(phases["db"], r"^dur=\d+\.\d$")
+        self.assertEqual(phases["queries"], 'desc="2"')
+
+        (line,) = logs.output
+        logged = json.loads(line.split(":", 2)[2])
+        self.assertEqual((logged["path"], logged["status"], logged["queries"]), ("/problems/", 200, 2))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_untouched(self):
+        self.assertNotIn("Server-Timing", self.call())
+
+
+class FastJsonTests(SimpleTestCase):
+    def test_matches_the_stock_renderer(self):
+        from rest_framework.renderers import JSONRenderer
+
+        from api import fast_json
+
+        data = {
+            "submission_count": Decimal("12"),
+            "solve_rate": Decimal("0.25"),
+            "time_start": datetime.datetime(2026, 3, 1, 9, 30, tzinfo=datetime.timezone.utc),
+            "register_date": datetime.date(2026, 3, 1),
+            "tags": ("Join", "Group by"),
+            "title": "Ünïcode",
+        }
+        self.assertEqual(json.loads(fast_json.dumps(data)), json.loads(JSONRenderer().render(data)))
+        self.assertIn(b'"2026-03-01T09:30:00Z"', fast_json.dumps(data))
+
+    def test_row_mapper_records(self):
+        from api import fast_json
+
+        cursor = FakeCursor(["Problem_ID", "Problem_title", "Difficulty_level", "SQL_concept",
+                             "Tag_ID", "Review_status"], [(7, "Joins", "EASY", "JOIN", 3, 1)])
+        records = row_mappers.PROBLEM_SUMMARY.all(cursor)
+        self.assertEqual(json.loads(fast_json.dumps(records)), [{
+            "pId": 7, "pTitle": "Joins", "difficultyTag": "Easy", "conceptTag": ["Join"],
+            "pSolutionId": 3, "reviewed": True,
+        }])
+
+    def test_response_and_renderer(self):
+        from api import fast_json
+
+        response = fast_json.FastJsonResponse({"n": Decimal("1.5")})
+        self.assertEqual(response["Content-Type"], "application/json")
+        self.assertEqual(response.content, b'{"n":1.5}')
+        self.assertEqual(fast_json.FastJSONRenderer().render(None), b"")
+        with self.assertRaises(TypeError):
+            fast_json.dumps({"n": object()})
@@ -0,0 +1,49 @@
+"""
+Named content version counters kept in the Django cache.
+
+- current: return the version for a name (seeding it on first use)
+- bump: advance the version after a write
+
+- is_shared: whether the counters are seen by every worker process
+
+With a shared cache backend every worker sees the same counters, so they work as
+cheap invalidation markers for caches and ETags.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache
+
+
+CATALOG = "catalog"
+SUBMISSIONS = "submissions"
+
+_KEY = "version:{name}"
+
+# backends whose data lives in one process
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def is_shared():
+    return settings.CACHES[DEFAULT_CACHE_ALIAS]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def current(name):
+    key = _KEY.format(name=name)
+    version = cache.get(key)
+    if version is None:
+        # seed from the clock so a version lost to eviction is never reused
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(name):
+    key = _KEY.format(name=name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), None)
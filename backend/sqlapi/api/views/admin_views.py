@@ -1,9 +1,14 @@
+import datetime
 from django.db import connection
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
+from api import conditional, fast_json, query_stats, rollups, versions
+from api.auth_tokens import requires_principal
 
 
 @api_view(["GET"])
+@renderer_classes(fast_json.RENDERERS)
+@requires_principal(admin=True, enforce=None)
 def admin_user_stats(request):
     """
     Admin-side statistics: per-user submission summary.
@@ -12,6 +17,9 @@ def admin_user_stats(request):
     - account_number, email, first_name, last_name
     - total_submissions
     - correct_submissions
+
+    Counts come from the ACCOUNT_STATS rollup (api/rollups.py), so the cost
+    grows with the number of accounts, not submissions.
     """
 
     with connection.cursor() as cursor:
@@ -22,18 +30,13 @@ def admin_user_stats(request):
                 up.Email,
                 up.First_name,
                 up.Last_name,
-                COUNT(s.Submission_ID) AS total_submissions,
-                SUM(CASE WHEN s.Is_correct = TRUE THEN 1 ELSE 0 END) AS correct_submissions
+                COALESCE(st.Total_submissions, 0) AS total_submissions,
+                COALESCE(st.Correct_submissions, 0) AS correct_submissions
             FROM ACCOUNT a
             LEFT JOIN USER_PROFILE up
                 ON a.Email = up.Email
-            LEFT JOIN SUBMISSION s
-                ON a.Account_number = s.Account_number
-            GROUP BY
-                a.Account_number,
-                up.Email,
-                up.First_name,
-                up.Last_name
+            LEFT JOIN ACCOUNT_STATS st
+                ON a.Account_number = st.Account_number
             ORDER BY
                 correct_submissions DESC,
                 total_submissions DESC,
@@ -48,6 +51,8 @@ def admin_user_stats(request):
 
 
 @api_view(["GET"])
+@renderer_classes(fast_json.RENDERERS)
+@requires_principal(admin=True, enforce=None)
 def admin_problem_stats(request):
     """
     Admin-side statistics: per-problem performance summary.
@@ -58,7 +63,19 @@ def admin_problem_stats(request):
     - sql_concept
     - submission_count
     - correct_submissions
+
+    Counts come from the PROBLEM_STATS rollup (api/rollups.py).
+
+    Sends an ETag built from the catalog and submission versions and answers
+    304 Not Modified when the client already has the current stats.
     """
+    etag = conditional.make_etag(
+        "problem-stats",
+        versions.current(versions.CATALOG),
+        versions.current(versions.SUBMISSIONS),
+    )
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag)
 
     with connection.cursor() as cursor:
         cursor.execute(
@@ -68,8 +85,8 @@ def admin_problem_stats(request):
                 p.Problem_description,
                 d.Difficulty_level,
                 c.SQL_concept,
-                COUNT(s.Submission_ID) AS submission_count,
-                SUM(CASE WHEN s.Is_correct = TRUE THEN 1 ELSE 0 END) AS correct_submissions
+                COALESCE(st.Submission_count, 0) AS submission_count,
+                COALESCE(st.Correct_submissions, 0) AS correct_submissions
             FROM PROBLEM p
             LEFT JOIN TAG t
                 ON p.Tag_ID = t.Tag_ID
@@ -77,13 +94,8 @@ def admin_problem_stats(request):
                 ON t.Difficulty_ID = d.Difficulty_ID
             LEFT JOIN CONCEPT_TAG c
                 ON t.Concept_ID = c.Concept_ID
-            LEFT JOIN SUBMISSION s
-                ON p.Problem_ID = s.Problem_ID
-            GROUP BY
-                p.Problem_ID,
-                p.Problem_description,
-                d.Difficulty_level,
-                c.SQL_concept
+            LEFT JOIN PROBLEM_STATS st
+                ON p.Problem_ID = st.Problem_ID
             ORDER BY
                 submission_count DESC,
                 p.Problem_ID ASC;
@@ -93,4 +105,208 @@ def admin_problem_stats(request):
         rows = cursor.fetchall()
 
     results = [dict(zip(columns, row)) for row in rows]
-    return Response(results)
+    return Response(results, headers=conditional.etag_headers(etag))
+
+
+ANALYTICS_GROUPS = {
+    "none": [],
+    "problem": [("p.Problem_ID", "problem_id"), ("p.Problem_title", "problem_title")],
+    "tag": [
+        ("t.Tag_ID", "tag_id"),
+        ("d.Difficulty_level", "difficulty_level"),
+        ("c.SQL_concept", "sql_concept"),
+    ],
+    "concept": [("c.Concept_ID", "concept_id"), ("c.SQL_concept", "sql_concept")],
+}
+ANALYTICS_DEFAULT_DAYS = 112
+
+
+@api_view(["GET"])
+@renderer_classes(fast_json.RENDERERS)
+@requires_principal(admin=True, enforce=None)
+def admin_submission_analytics(request):
+    """
+    Admin-side statistics: submissions and solve rates over time.
+
+    Query params (all optional):
+    - granularity: day / week (default week; weeks start on Monday and the
+      range start is rounded down to its Monday)
+    - start, end:  YYYY-MM-DD, inclusive (default: the last 16 weeks)
+    - group_by:    none / problem / tag / concept (default none)
+    - problem_id, tag_id, concept_id: filters
+
+    Reads the SUBMISSION_DAILY / SUBMISSION_WEEKLY buckets (api/rollups.py), not
+    SUBMISSION. Daily buckets before "daily_from" may already be compacted into
+    weekly ones, so day granularity only covers recent days reliably.
+
+    Response:
+        {
+            "granularity": ..., "start": ..., "end": ..., "group_by": ...,
+            "daily_from": ...,
+            "buckets": [
+                {"bucket": "YYYY-MM-DD", <group fields>, "submission_count": n,
+                 "correct_submissions": n, "solve_rate": 0..1 or null},
+                ...
+            ]
+        }
+    """
+    params = request.query_params
+
+    granularity = params.get("granularity", "week").strip().lower()
+    group_by = params.get("group_by", "none").strip().lower()
+    if granularity not in ("day", "week"):
+        return Response({"error": "granularity must be 'day' or 'week'"}, status=400)
+    if group_by not in ANALYTICS_GROUPS:
+        return Response(
+            {"error": f"group_by must be one of {', '.join(ANALYTICS_GROUPS)}"}, status=400
+        )
+
+    try:
+        end = (
+            datetime.date.fromisoformat(params["end"]) if params.get("end")
+            else datetime.date.today()
+        )
+        start = (
+            datetime.date.fromisoformat(params["start"]) if params.get("start")
+            else end - datetime.timedelta(days=ANALYTICS_DEFAULT_DAYS - 1)
+        )
+        problem_id = int(params["problem_id"]) if params.get("problem_id") else None
+        tag_id = int(params["tag_id"]) if params.get("tag_id") else None
+        concept_id = int(params["concept_id"]) if params.get("concept_id") else None
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    if granularity == "week":
+        start = rollups.week_start(start)
+    if start > end:
+        return Response({"error": "start must not be after end"}, status=400)
+
+    etag = conditional.make_etag(
+        "submission-analytics",
+        granularity,
+        group_by,
+        start.isoformat(),
+        end.isoformat(),
+        problem_id,
+        tag_id,
+        concept_id,
+        versions.current(versions.CATALOG),
+        versions.current(versions.SUBMISSIONS),
+    )
+    if conditional.is_not_modified(request, etag):
+        return conditional.not_modified(etag)
+
+    if granularity == "week":
+        buckets_sql = f"""
+            SELECT Week_start AS bucket, Problem_ID, Submission_count, Correct_submissions
+            FROM SUBMISSION_WEEKLY
+            WHERE Week_start BETWEEN %s AND %s
+            UNION ALL
+            SELECT {rollups.WEEK_START_SQL.format(col="Bucket_date")}, Problem_ID,
+                   Submission_count, Correct_submissions
+            FROM SUBMISSION_DAILY
+            WHERE Bucket_date BETWEEN %s AND %s
+        """
+        args = [start, end, start, end]
+    else:
+        buckets_sql = """
+            SELECT Bucket_date AS bucket, Problem_ID, Submission_count, Correct_submissions
+            FROM SUBMISSION_DAILY
+            WHERE Bucket_date BETWEEN %s AND %s
+        """
+        args = [start, end]
+
+    where = []
+    if problem_id is not None:
+        where.append("b.Problem_ID = %s")
+        args.append(problem_id)
+    if tag_id is not None:
+        where.append("t.Tag_ID = %s")
+        args.append(tag_id)
+    if concept_id is not None:
+        where.append("c.Concept_ID = %s")
+        args.append(concept_id)
+
+    group_columns = ANALYTICS_GROUPS[group_by]
+    select_groups = "".join(f"{expr} AS {alias}, " for expr, alias in group_columns)
+    group_exprs = ", ".join(["b.bucket"] + [expr for expr, _ in group_columns])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT
+                b.bucket,
+                {select_groups}
+                SUM(b.Submission_count) AS submission_count,
+                SUM(b.Correct_submissions) AS correct_submissions
+            FROM ({buckets_sql}) b
+            LEFT JOIN PROBLEM p
+                ON b.Problem_ID = p.Problem_ID
+            LEFT JOIN TAG t
+                ON p.Tag_ID = t.Tag_ID
+            LEFT JOIN DIFFICULTY_TAG d
+                ON t.Difficulty_ID = d.Difficulty_ID
+            LEFT JOIN CONCEPT_TAG c
+                ON t.Concept_ID = c.Concept_ID
+            {"WHERE " + " AND ".join(where) if where else ""}
+            GROUP BY {group_exprs}
+            ORDER BY {group_exprs};
+            """,
+            args,
+        )
+        columns = [col[0] for col in cursor.description]
+        rows = cursor.fetchall()
+
+    buckets = []
+    for row in rows:
+        bucket = dict(zip(columns, row))
+        bucket["bucket"] = bucket["bucket"].isoformat()
+        total = int(bucket["submission_count"] or 0)
+        correct = int(bucket["correct_submissions"] or 0)
+        bucket["submission_count"] = total
+        bucket["correct_submissions"] = correct
+        bucket["solve_rate"] = round(correct / total, 4) if total else None
+        buckets.append(bucket)
+
+    return Response(
+        {
+            "granularity": granularity,
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "group_by": group_by,
+            "daily_from": rollups.daily_cutoff().isoformat(),
+            "buckets": buckets,
+        },
+        headers=conditional.etag_headers(etag),
+    )
+
+
+@api_view(["GET", "DELETE"])
+@requires_principal(admin=True, enforce=None)
+def admin_query_stats(request):
+    """
+    Admin-side statistics: the statements using the most database time in this
+    worker (api/query_stats.py), grouped by normalized fingerprint.
+
+    Query params (optional):
+    - order: total / count / mean / max (default total)
+    - limit: number of fingerprints (default 20)
+
+    DELETE clears the statistics of the worker that serves it.
+    """
+    if request.method == "DELETE":
+        query_stats.reset()
+        return Response({"success": True})
+
+    order = request.query_params.get("order", "total").strip().lower()
+    if order not in query_stats.ORDERS:
+        return Response(
+            {"error": f"order must be one of {', '.join(query_stats.ORDERS)}"}, status=400
+        )
+    try:
+        limit = int(request.query_params.get("limit", 20))
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=400)
+    if limit < 1:
+        return Response({"error": "limit must be positive"}, status=400)
+
+    return Response(query_stats.top(limit, order))
@@ -5,12 +5,17 @@
 - POST /profile/{id}/update/    update user first/last name, return updated profile  
 - GET  /users/                  list all users with profile + account info
 - DELETE /users/{id}/           delete a user by account number
+- POST /users/bulk-delete/      delete many users (a list or a registration-date cohort) in chunks
 """
-from rest_framework.decorators import api_view
+from django.conf import settings
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
 from django.db import connection
 from django.db import IntegrityError, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_date
+from api import auth_tokens, fast_json, rollups, row_mappers, versions
+from api.auth_tokens import requires_principal
 
 @api_view(['POST'])
 def signup(request):
@@ -114,10 +119,21 @@ def login(request):
         "accountNumber": profile[2],
         "isStudent": profile[3],
         "isAdmin": profile[4],
+        "token": auth_tokens.issue(profile[2]),
     })
 
 
+@api_view(['POST'])
+@requires_principal()
+def logout(request):
+    """Revoke every session token of the caller's account."""
+    auth_tokens.revoke([request.principal.account_number])
+    return Response({"success": True})
+
+
 @api_view(['GET'])
+@renderer_classes(fast_json.RENDERERS)
+@requires_principal(account_kwarg="account_number", enforce=None)
 def get_profile(request, account_number):
     with connection.cursor() as cursor:
         cursor.execute("""
@@ -132,22 +148,16 @@ def get_profile(request, account_number):
             JOIN ACCOUNT a ON p.Email = a.Email
             WHERE a.Account_number = %s
         """, [account_number])
-        profile = cursor.fetchone()
+        profile = row_mappers.PROFILE.one(cursor)
 
     if not profile:
         return Response({"success": False, "message": "Profile not found"}, status=404)
 
-    return Response({
-        "email": profile[0],
-        "firstName": profile[1],
-        "lastName": profile[2],
-        "registerDate": profile[3],
-        "isStudent": profile[4],
-        "isAdmin": profile[5],
-    })
+    return Response(profile)
 
 
 @api_view(['POST'])
+@requires_principal(account_kwarg="account_number", enforce=None)
 def update_profile(request, account_number):
     first_name = request.data.get("firstName")
     last_name = request.data.get("lastName")
@@ -190,6 +200,8 @@ def update_profile(request, account_number):
 
 
 @api_view(['GET'])
+@renderer_classes(fast_json.RENDERERS)
+@requires_principal(admin=True, enforce=None)
 def list_users(request):
     """
     Return list of all users with profile + account info.
@@ -208,60 +220,151 @@ def list_users(request):
             JOIN USER_PROFILE p ON a.Email = p.Email
             ORDER BY a.Account_number;
         """)
-        rows = cursor.fetchall()
-
-    users = []
-    for r in rows:
-        users.append({
-            "accountNumber": r[0],
-            "firstName": r[1],
-            "lastName": r[2],
-            "email": r[3],
-            "isStudent": r[4],
-            "isAdmin": r[5],
-            "registerDate": r[6],
-        })
+        users = row_mappers.USER.all(cursor)
 
     return Response(users)
 
 
+def _delete_accounts(cursor, accounts):
+    """
+    Set-based removal of accounts given as [(account_number, email), ...]:
+    their submissions (and rollup counts), USER_AUTH, ACCOUNT_SESSION, ACCOUNT and
+    USER_PROFILE rows. Call inside a transaction.
+    """
+    numbers = [a[0] for a in accounts]
+    emails = [a[1] for a in accounts]
+    by_number = ", ".join(["%s"] * len(numbers))
+    by_email = ", ".join(["%s"] * len(emails))
+
+    rollups.remove_account_submissions(cursor, numbers)
+    cursor.execute(f"DELETE FROM SUBMISSION WHERE Account_number IN ({by_number})", numbers)
+    cursor.execute(f"DELETE FROM USER_AUTH WHERE Email IN ({by_email})", emails)
+    cursor.execute(f"DELETE FROM ACCOUNT_SESSION WHERE Account_number IN ({by_number})", numbers)
+    cursor.execute(f"DELETE FROM ACCOUNT WHERE Account_number IN ({by_number})", numbers)
+    cursor.execute(f"DELETE FROM USER_PROFILE WHERE Email IN ({by_email})", emails)
+    # tokens of deleted accounts stop working once the deletion is committed
+    transaction.on_commit(lambda: auth_tokens.revoke(numbers))
+
+
 @api_view(['DELETE'])
+@requires_principal(admin=True, enforce=None)
 def delete_user(request, account_number):
-    # 0. Fetch email for this account
-    with connection.cursor() as cursor:
+    # one transaction: either every row of the user goes or none does
+    with transaction.atomic(), connection.cursor() as cursor:
         cursor.execute("""
-            SELECT Email FROM ACCOUNT WHERE Account_number = %s
+            SELECT Account_number, Email FROM ACCOUNT WHERE Account_number = %s FOR UPDATE
         """, [account_number])
         row = cursor.fetchone()
 
-    if not row:
-        return Response({"success": False, "message": "User not found"}, status=404)
+        if not row:
+            return Response({"success": False, "message": "User not found"}, status=404)
 
-    email = row[0]
+        _delete_accounts(cursor, [row])
 
-    # 1. Delete submissions
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            DELETE FROM SUBMISSION
-            WHERE Account_number = %s
-        """, [account_number])
+    versions.bump(versions.SUBMISSIONS)
+    return Response({"success": True})
 
-    # 2. Delete USER_AUTH row
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            DELETE FROM USER_AUTH WHERE Email = %s
-        """, [email])
 
-    # 3. Delete ACCOUNT row
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            DELETE FROM ACCOUNT WHERE Account_number = %s
-        """, [account_number])
+def _parse_date(value):
+    """None for a missing bound, else a date; ValueError unless it is a YYYY-MM-DD string."""
+    if value is None or value == "":
+        return None
+    parsed = parse_date(value) if isinstance(value, str) else None  # ValueError for e.g. 2026-02-30
+    if parsed is None:
+        raise ValueError(f"invalid date: {value!r}")
+    return parsed
 
-    # 4. Delete USER_PROFILE row
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            DELETE FROM USER_PROFILE WHERE Email = %s
-        """, [email])
 
-    return Response({"success": True})
+@api_view(['POST'])
+@requires_principal(admin=True, enforce=None)
+def bulk_delete_users(request):
+    """
+    Remove many users at once, e.g. a cohort at the end of a semester.
+
+    Request body (JSON), one of:
+        {"account_numbers": [1, 2, 3]}
+        {"registered_before": "2026-09-01", "registered_after": "2026-01-01"}
+            (cohort by Register_date, inclusive bounds, either optional;
+             only student accounts without the admin flag are selected)
+    Optional: "dry_run": true to only count the matching accounts.
+    A dry_run that is not a JSON boolean or a date that is not YYYY-MM-DD is a 400.
+
+    Accounts are removed USER_DELETE_CHUNK at a time, each chunk in its own
+    transaction, so locks are held briefly and a failure keeps earlier chunks.
+
+    Response: {"success": true, "deleted": n, "chunks": n} (or {"matched": n} for a dry run)
+    """
+    data = request.data
+    account_numbers = data.get("account_numbers")
+    dry_run = data.get("dry_run", False)
+    if not isinstance(dry_run, bool):
+        return Response({"success": False, "message": "dry_run must be true or false"}, status=400)
+    try:
+        registered_before = _parse_date(data.get("registered_before"))
+        registered_after = _parse_date(data.get("registered_after"))
+    except ValueError:
+        return Response(
+            {"success": False, "message": "registered_before/registered_after must be YYYY-MM-DD dates"},
+            status=400,
+        )
+
+    where = []
+    args = []
+    if account_numbers is not None:
+        if not isinstance(account_numbers, list) or not account_numbers:
+            return Response({"success": False, "message": "account_numbers must be a non-empty list"}, status=400)
+        try:
+            account_numbers = sorted({int(n) for n in account_numbers})
+        except (TypeError, ValueError):
+            return Response({"success": False, "message": "account_numbers must be integers"}, status=400)
+        where.append(f"Account_number IN ({', '.join(['%s'] * len(account_numbers))})")
+        args.extend(account_numbers)
+    elif registered_before or registered_after:
+        where.append("Student_flag = TRUE AND Admin_flag = FALSE")
+        if registered_before:
+            where.append("Register_date <= %s")
+            args.append(registered_before)
+        if registered_after:
+            where.append("Register_date >= %s")
+            args.append(registered_after)
+    else:
+        return Response(
+            {"success": False, "message": "account_numbers or registered_before/registered_after is required"},
+            status=400,
+        )
+
+    if dry_run:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM ACCOUNT WHERE {' AND '.join(where)}", args)
+            return Response({"success": True, "matched": cursor.fetchone()[0]})
+
+    # keyset over Account_number: each chunk locks and deletes the next slice
+    chunk_size = settings.USER_DELETE_CHUNK
+    deleted = 0
+    chunks = 0
+    last = None
+    while True:
+        chunk_where = where + (["Account_number > %s"] if last is not None else [])
+        chunk_args = args + ([last] if last is not None else [])
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT Account_number, Email FROM ACCOUNT
+                WHERE {' AND '.join(chunk_where)}
+                ORDER BY Account_number
+                LIMIT %s
+                FOR UPDATE
+            """, chunk_args + [chunk_size])
+            accounts = cursor.fetchall()
+            if not accounts:
+                break
+            _delete_accounts(cursor, accounts)
+
+        deleted += len(accounts)
+        chunks += 1
+        last = accounts[-1][0]
+        if len(accounts) < chunk_size:
+            break
+
+    if deleted:
+        versions.bump(versions.SUBMISSIONS)
+    return Response({"success": True, "deleted": deleted, "chunks": chunks})
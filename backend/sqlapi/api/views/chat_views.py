@@ -5,12 +5,38 @@ Open SQL Programming:
 - Use an LLM to generate SQL
 - Execute the SQL against the MySQL database
 - Return the results as JSON
+
+nl2sql_async is the same pipeline as an async view. Served through ASGI
+(e.g. gunicorn sqlapi.asgi:application -k uvicorn.workers.UvicornWorker) an
+in-flight LLM call holds no worker thread; only the SQL execution borrows one.
 """
-from django.db import connection
+import json
+import time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, connection
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
 import os
+from api import metrics
+from api.auth_tokens import requires_principal
+from api.llm_cache import question_key, result_cache, sql_cache
+from api.sql_guard import (
+    SQLGuardError,
+    check_estimated_rows,
+    check_statement,
+    guard_counts,
+    is_timeout_error,
+    timeout_error,
+    with_time_limit,
+)
+
+LLM_MODEL = "gpt-4o-mini"
 
 # Creating the OpenAI client only when it’s first needed, 
 # instead of creating it immediately when the program starts
@@ -20,6 +46,20 @@ def get_openai_client():
         raise ValueError("OPENAI_API_KEY environment variable is not set")
     return OpenAI(api_key=api_key)
 
+
+_async_client = None
+
+# The async client keeps an HTTP connection pool, so one instance is shared
+# by all in-flight requests of the worker
+def get_async_openai_client():
+    global _async_client
+    if _async_client is None:
+        api_key = os.getenv('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable is not set")
+        _async_client = AsyncOpenAI(api_key=api_key)
+    return _async_client
+
 SCHEMA_DESCRIPTION = """
 You are an assistant that writes MySQL SELECT queries for the database `sql_study_room`.
 
@@ -98,12 +138,14 @@ Rules:
 - If the user question is ambiguous, make a reasonable assumption and still produce a SELECT query.
 """
 
+# tables generated SQL may read (the ones described above)
+NL2SQL_TABLES = frozenset({
+    "USER_PROFILE", "ACCOUNT", "DIFFICULTY_TAG", "CONCEPT_TAG",
+    "TAG", "PROBLEM", "SUBMISSION", "ATTEMPT",
+})
 
-def call_llm_for_sql(question: str) -> str:
-    """
-    Call the OpenAI API to convert a natural language question into a SQL query.
-    Returns the SQL string only.
-    """
+
+def build_llm_messages(question: str):
     prompt = f"""
 {SCHEMA_DESCRIPTION}
 
@@ -114,43 +156,240 @@ Write ONE MySQL SELECT query that answers the question.
 Output only the SQL statement, without explanation or backticks.
 """
 
+    return [
+        {
+            "role": "system",
+            "content": "You are a helpful assistant that writes safe MySQL SELECT queries."
+        },
+        {"role": "user", "content": prompt},
+    ]
+
+
+def record_llm_usage(response):
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.llm_tokens.inc("prompt", amount=usage.prompt_tokens or 0)
+        metrics.llm_tokens.inc("completion", amount=usage.completion_tokens or 0)
+
+
+def call_llm_for_sql(question: str) -> str:
+    """
+    Call the OpenAI API to convert a natural language question into a SQL query.
+    Returns the SQL string only.
+    """
     client = get_openai_client()
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {
-                "role": "system",
-                "content": "You are a helpful assistant that writes safe MySQL SELECT queries."
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0,
-    )
+    start = time.perf_counter()
+    try:
+        response = client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=build_llm_messages(question),
+            temperature=0,
+        )
+    except Exception:
+        metrics.llm_errors.inc("sync")
+        raise
+    finally:
+        metrics.llm_latency.observe(time.perf_counter() - start, "sync")
+    record_llm_usage(response)
 
     sql = response.choices[0].message.content.strip()
     return sql
 
 
-def execute_sql(sql: str):
+async def acall_llm_for_sql(question: str) -> str:
+    """Async version of call_llm_for_sql."""
+    client = get_async_openai_client()
+    start = time.perf_counter()
+    try:
+        response = await client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=build_llm_messages(question),
+            temperature=0,
+        )
+    except Exception:
+        metrics.llm_errors.inc("async")
+        raise
+    finally:
+        metrics.llm_latency.observe(time.perf_counter() - start, "async")
+    record_llm_usage(response)
+
+    sql = response.choices[0].message.content.strip()
+    return sql
+
+
+def prepare_generated_sql(sql: str) -> str:
     """
-    Execute the generated SQL and return results as:
-    (columns, rows_as_dict_list)
-    A simple safety check is enforced: only SELECT statements are allowed.
+    Run the pre-execution guards on generated SQL and return the statement to
+    execute (normalized, with the execution-time hint). Raises SQLGuardError
+    on rejection.
+    """
+    validated = check_statement(sql, NL2SQL_TABLES)
+    check_estimated_rows(validated.sql)
+    return with_time_limit(validated)
+
+
+def guard_error_body(error: SQLGuardError, sql: str) -> dict:
+    return {
+        "error": "SQL rejected",
+        "guard": error.guard,
+        "sql": sql,
+        "detail": error.detail,
+    }
+
+
+def result_cursor():
     """
-    if not sql:
-        raise ValueError("Empty SQL generated by LLM.")
+    Cursor for generated queries. On MySQL this is an unbuffered (server-side)
+    cursor: rows stay on the server until fetched, instead of execute()
+    buffering the whole result set in worker memory.
+    """
+    if connection.vendor != "mysql":
+        return connection.cursor()
+
+    from django.db.backends.mysql.base import CursorWrapper, Database
+
+    connection.ensure_connection()
+    raw = connection.connection.cursor(Database.cursors.SSCursor)
+    wrap = connection.make_debug_cursor if connection.queries_logged else connection.make_cursor
+    return wrap(CursorWrapper(raw))
+
+
+def close_result_cursor(cursor, exhausted: bool):
+    """
+    Close a cursor from result_cursor(). Closing an unbuffered cursor reads and
+    discards every row the server has not sent yet (MySQL cannot be told to
+    stop), so when the result was not read to the end (truncated, client gone,
+    error) the connection is dropped instead: the server aborts the query on
+    its next write, and the next query opens a new connection.
+    """
+    if exhausted or connection.vendor != "mysql" or connection.connection is None:
+        cursor.close()
+        return
+    connection.connection._force_close()
+    # discard rather than reuse (pooled mode) or keep (persistent mode)
+    connection.errors_occurred = True
+    connection.close()
+
 
-    stripped = sql.strip().lower()
-    if not stripped.startswith("select"):
-        raise ValueError("Only SELECT statements are allowed.")
+def fetch_capped(cursor, columns, max_rows: int):
+    """
+    Yield up to max_rows rows as dicts, fetched in chunks. Returns True from the
+    generator (StopIteration.value) if more rows were available.
+    """
+    count = 0
+    while True:
+        chunk = cursor.fetchmany(settings.NL2SQL_FETCH_CHUNK)
+        if not chunk:
+            return False
+        for row in chunk:
+            if count >= max_rows:
+                return True
+            count += 1
+            yield dict(zip(columns, row))
+
+
+def execute_sql(sql: str, max_rows: int = None):
+    """
+    Execute the generated SQL and return results as:
+    (columns, rows_as_dict_list, truncated)
+    At most max_rows rows (default settings.NL2SQL_MAX_ROWS) are returned;
+    truncated is True when the query produced more.
+    Raises SQLGuardError if a guard rejects or interrupts the query.
+    """
+    sql = prepare_generated_sql(sql)
+    if max_rows is None:
+        max_rows = settings.NL2SQL_MAX_ROWS
 
-    with connection.cursor() as cursor:
+    cursor = result_cursor()
+    exhausted = False
+    try:
         cursor.execute(sql)
         columns = [col[0] for col in cursor.description]
-        rows = cursor.fetchall()
-        results = [dict(zip(columns, row)) for row in rows]
+        results = []
+        rows = fetch_capped(cursor, columns, max_rows)
+        while True:
+            try:
+                results.append(next(rows))
+            except StopIteration as stop:
+                truncated = stop.value
+                break
+        exhausted = not truncated
+    except DatabaseError as e:
+        if is_timeout_error(e):
+            raise timeout_error() from e
+        raise
+    finally:
+        close_result_cursor(cursor, exhausted)
+
+    return columns, results, truncated
+
+
+def stream_sql_ndjson(question: str, sql: str, max_rows: int = None):
+    """
+    Execute the generated SQL and return an iterator of NDJSON lines:
+    a header ({"question", "sql", "columns"}), one line per row, and a trailer
+    ({"row_count", "truncated"}). The query runs before this returns, so SQL
+    errors surface as normal exceptions; rows are read as the response is sent.
+    A timeout while rows are being sent ends the stream with an error line
+    ({"error", "guard"}) instead of the trailer.
+    """
+    executed_sql = prepare_generated_sql(sql)
+    if max_rows is None:
+        max_rows = settings.NL2SQL_STREAM_MAX_ROWS
 
-    return columns, results
+    cursor = result_cursor()
+    try:
+        cursor.execute(executed_sql)
+        columns = [col[0] for col in cursor.description]
+    except DatabaseError as e:
+        close_result_cursor(cursor, False)
+        if is_timeout_error(e):
+            raise timeout_error() from e
+        raise
+    except Exception:
+        close_result_cursor(cursor, False)
+        raise
+
+    def encode(obj):
+        return json.dumps(obj, cls=DjangoJSONEncoder).encode("utf-8") + b"\n"
+
+    def lines():
+        exhausted = False
+        try:
+            yield encode({"question": question, "sql": sql, "columns": columns})
+            count = 0
+            rows = fetch_capped(cursor, columns, max_rows)
+            while True:
+                try:
+                    row = next(rows)
+                except StopIteration as stop:
+                    truncated = stop.value
+                    break
+                count += 1
+                yield encode(row)
+            exhausted = not truncated
+            yield encode({"row_count": count, "truncated": truncated})
+        except DatabaseError as e:
+            if not is_timeout_error(e):
+                raise
+            error = timeout_error()
+            yield encode({"error": error.detail, "guard": error.guard})
+        finally:
+            # also runs when the client disconnects mid-stream
+            close_result_cursor(cursor, exhausted)
+
+    return lines()
+
+
+def execute_sql_in_worker_thread(sql: str):
+    """
+    execute_sql for threads outside Django's request cycle (see nl2sql_async):
+    nothing closes their connections at request end, so do it here.
+    """
+    try:
+        return execute_sql(sql)
+    finally:
+        connection.close_if_unusable_or_obsolete()
 
 
 @api_view(["POST"])
@@ -163,7 +402,8 @@ def nl2sql(request):
 
     Request body (JSON):
         {
-            "question": "Show me how many problems are solved in this semester"
+            "question": "Show me how many problems are solved in this semester",
+            "stream": false    (optional, true for an NDJSON stream of rows)
         }
 
     Response (JSON):
@@ -171,38 +411,78 @@ def nl2sql(request):
             "question": "...",
             "sql": "...",
             "columns": [...],
-            "rows": [ {col: value, ...}, ... ]
+            "rows": [ {col: value, ...}, ... ],
+            "row_count": number of rows returned,
+            "truncated": true if rows were cut at NL2SQL_MAX_ROWS,
+            "cached": true if the SQL came from the question cache
         }
+
+    Queries stopped by a guard (see api/sql_guard.py) return 400 with
+    {"error": "SQL rejected", "guard": ..., "sql": ..., "detail": ...}.
     """
     question = request.data.get("question", "").strip()
+    stream = bool(request.data.get("stream", False))
 
     if not question:
         return Response({"error": "field 'question' is required"}, status=400)
 
-    # 1. Ask the LLM to generate SQL
-    try:
-        generated_sql = call_llm_for_sql(question)
-    except Exception as e:
-        return Response(
-            {
-                "error": "LLM error",
-                "detail": str(e),
-            },
-            status=500,
-        )
-
-    # 2. Execute the generated SQL
-    try:
-        columns, rows = execute_sql(generated_sql)
-    except Exception as e:
-        return Response(
-            {
-                "error": "SQL execution error",
-                "sql": generated_sql,
-                "detail": str(e),
-            },
-            status=400,
-        )
+    # 1. Ask the LLM to generate SQL (repeat questions are served from the cache)
+    cache_key = question_key(question, SCHEMA_DESCRIPTION, LLM_MODEL)
+    generated_sql = sql_cache.get(cache_key)
+    cached = generated_sql is not None
+    if not cached:
+        try:
+            generated_sql = call_llm_for_sql(question)
+        except Exception as e:
+            return Response(
+                {
+                    "error": "LLM error",
+                    "detail": str(e),
+                },
+                status=500,
+            )
+
+    # 2a. Stream rows as NDJSON while they are read from the server
+    if stream:
+        try:
+            lines = stream_sql_ndjson(question, generated_sql)
+        except SQLGuardError as e:
+            return Response(guard_error_body(e, generated_sql), status=400)
+        except Exception as e:
+            return Response(
+                {
+                    "error": "SQL execution error",
+                    "sql": generated_sql,
+                    "detail": str(e),
+                },
+                status=400,
+            )
+        if not cached:
+            sql_cache.set(cache_key, generated_sql)
+        return StreamingHttpResponse(lines, content_type="application/x-ndjson")
+
+    # 2. Execute the generated SQL (recent results for the same SQL are reused)
+    result = result_cache.get(generated_sql)
+    if result is None:
+        try:
+            result = execute_sql(generated_sql)
+        except SQLGuardError as e:
+            return Response(guard_error_body(e, generated_sql), status=400)
+        except Exception as e:
+            return Response(
+                {
+                    "error": "SQL execution error",
+                    "sql": generated_sql,
+                    "detail": str(e),
+                },
+                status=400,
+            )
+        result_cache.set(generated_sql, result)
+    columns, rows, truncated = result
+
+    # only cache SQL that actually ran
+    if not cached:
+        sql_cache.set(cache_key, generated_sql)
 
     # 3. Return the SQL and the query results
     return Response(
@@ -211,5 +491,97 @@ def nl2sql(request):
             "sql": generated_sql,
             "columns": columns,
             "rows": rows,
+            "row_count": len(rows),
+            "truncated": truncated,
+            "cached": cached,
+        }
+    )
+
+
+@csrf_exempt
+@require_POST
+async def nl2sql_async(request):
+    """
+    Async variant of nl2sql with the same request and response format.
+
+    URL:
+        POST /nl2sql/async/
+    """
+    try:
+        data = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "invalid JSON body"}, status=400)
+
+    question = str(data.get("question") or "").strip()
+
+    if not question:
+        return JsonResponse({"error": "field 'question' is required"}, status=400)
+
+    # 1. Ask the LLM to generate SQL without holding a thread while we wait
+    cache_key = question_key(question, SCHEMA_DESCRIPTION, LLM_MODEL)
+    generated_sql = sql_cache.get(cache_key)
+    cached = generated_sql is not None
+    if not cached:
+        try:
+            generated_sql = await acall_llm_for_sql(question)
+        except Exception as e:
+            return JsonResponse(
+                {
+                    "error": "LLM error",
+                    "detail": str(e),
+                },
+                status=500,
+            )
+
+    # 2. Execute the generated SQL on a pool thread (DB drivers are blocking)
+    result = result_cache.get(generated_sql)
+    if result is None:
+        try:
+            result = await sync_to_async(
+                execute_sql_in_worker_thread, thread_sensitive=False
+            )(generated_sql)
+        except SQLGuardError as e:
+            return JsonResponse(guard_error_body(e, generated_sql), status=400)
+        except Exception as e:
+            return JsonResponse(
+                {
+                    "error": "SQL execution error",
+                    "sql": generated_sql,
+                    "detail": str(e),
+                },
+                status=400,
+            )
+        result_cache.set(generated_sql, result)
+    columns, rows, truncated = result
+
+    if not cached:
+        sql_cache.set(cache_key, generated_sql)
+
+    return JsonResponse(
+        {
+            "question": question,
+            "sql": generated_sql,
+            "columns": columns,
+            "rows": rows,
+            "row_count": len(rows),
+            "truncated": truncated,
+            "cached": cached,
         }
     )
+
+
+@api_view(["GET"])
+@requires_principal(admin=True, enforce=None)
+def nl2sql_guard_stats(request):
+    """
+    How often each guard on generated SQL fired in this worker.
+
+    URL:
+        GET /nl2sql/guards/
+
+    Response (JSON):
+        {"validation": n, "row_estimate": n, "timeout": n}
+    """
+    counts = {"validation": 0, "row_estimate": 0, "timeout": 0}
+    counts.update(guard_counts())
+    return Response(counts)
@@ -0,0 +1,16 @@
+from django.http import HttpResponse
+from django.views.decorators.http import require_GET
+
+from api import metrics
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Prometheus text exposition of request, DB, LLM and submission metrics,
+    summed over all worker processes (see api/metrics.py).
+
+    URL:
+        GET /metrics
+    """
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
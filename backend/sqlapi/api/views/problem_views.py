@@ -1,141 +1,215 @@
 """
-- list_problems: returns a JSON list of all problems 
+- list_problems: returns a JSON list of problems (filterable, optional keyset pagination and summary mode)
 - get_problem: returns one problem
-- submit_problem: handles submitting a solution for a problem (inserting into SUBMISSION table)  
+- submit_problem: grades a submitted solution on the server and inserts it into the SUBMISSION table
 - add_problem: adds a new problem to the PROBLEM table
 - delete_problem: deletes a problem from the PROBLEM table
 - update_problem: updates an existing problem in the PROBLEM table
 - publish_problem: sets the Review_status of a problem to published (1)
 """
 import json
-from django.db import connection
+from django.conf import settings
+from django.db import connection, transaction
 from django.http import JsonResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 import datetime
+from api import catalog_cache, metrics, query_params, rollups, row_mappers, submission_buffer, versions
+from api.auth_tokens import requires_principal
+from api.grading import GradingError, GradingUnavailable, grade_submission
+
+PAGE_SIZE_DEFAULT = 20
+PAGE_SIZE_MAX = 100
+
 
 # List all problems
 @api_view(['GET'])
 def list_problems(request):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 
-                p.Problem_ID,
-                p.Problem_description,
-                p.Review_status,
-                t.Tag_ID,
-                d.Difficulty_level,
-                c.SQL_concept,
-                p.Problem_title
-            FROM PROBLEM p
-            LEFT JOIN TAG t ON p.Tag_ID = t.Tag_ID
-            LEFT JOIN DIFFICULTY_TAG d ON t.Difficulty_ID = d.Difficulty_ID
-            LEFT JOIN CONCEPT_TAG c ON t.Concept_ID = c.Concept_ID
-        """)
-
-        rows = cursor.fetchall()
-
-    results = []
-    for row in rows:
-        problem_id = row[0]
-        description = row[1] or ""
-        review_status = row[2]
-        tag_id = row[3]
-        difficulty = row[4] or ""
-        concept = row[5] or ""
-        title = row[6] or ""
-
-        # generate title
-        # p_title = description.split("\n")[0][:80]
-
-        concept_tags = (
-            [c.strip().capitalize() for c in concept.split(",")]
-            if concept else []
-        )
-
-        results.append({
-            "pId": problem_id,
-            "pTitle": title,
-            "difficultyTag": difficulty.capitalize() if difficulty else "",
-            "conceptTag": concept_tags,
-            "pDescription": description,
-            "pSolutionId": tag_id,
-            "reviewed": True if review_status == 1 else False   
-        })
-
-    return JsonResponse(results, safe=False)
+    """
+    Query params (all optional):
+    - difficulty: EASY / MEDIUM / HARD
+    - concept:    SQL concept name (substring match)
+    - reviewed:   true / false (review status)
+    - tag:        Tag_ID
+    - summary:    true to leave out pDescription
+    - limit, cursor: keyset pagination on Problem_ID. When either is given the
+      response is {"results": [...], "next_cursor": <id or null>}; otherwise the
+      full (filtered) list is returned as before.
+    """
+    params = request.query_params
+
+    try:
+        reviewed = query_params.parse_bool(params.get("reviewed"))
+        summary = bool(query_params.parse_bool(params.get("summary")))
+        tag_id = int(params["tag"]) if params.get("tag") else None
+        cursor_id = int(params["cursor"]) if params.get("cursor") else None
+        limit = int(params["limit"]) if params.get("limit") else None
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    paginated = limit is not None or cursor_id is not None
+    if paginated:
+        limit = min(max(limit or PAGE_SIZE_DEFAULT, 1), PAGE_SIZE_MAX)
+
+    where = []
+    args = []
+    if params.get("difficulty"):
+        where.append("d.Difficulty_level = %s")
+        args.append(params["difficulty"].strip().upper())
+    if params.get("concept"):
+        where.append("c.SQL_concept LIKE %s")
+        args.append(f"%{params['concept'].strip()}%")
+    if reviewed is not None:
+        where.append("p.Review_status = %s")
+        args.append(1 if reviewed else 0)
+    if tag_id is not None:
+        where.append("p.Tag_ID = %s")
+        args.append(tag_id)
+    if cursor_id is not None:
+        where.append("p.Problem_ID > %s")
+        args.append(cursor_id)
+
+    sql = f"""
+        SELECT 
+            p.Problem_ID,
+            {"NULL" if summary else "p.Problem_description"},
+            p.Review_status,
+            t.Tag_ID,
+            d.Difficulty_level,
+            c.SQL_concept,
+            p.Problem_title
+        FROM PROBLEM p
+        LEFT JOIN TAG t ON p.Tag_ID = t.Tag_ID
+        LEFT JOIN DIFFICULTY_TAG d ON t.Difficulty_ID = d.Difficulty_ID
+        LEFT JOIN CONCEPT_TAG c ON t.Concept_ID = c.Concept_ID
+        {"WHERE " + " AND ".join(where) if where else ""}
+        ORDER BY p.Problem_ID
+    """
+    if paginated:
+        # fetch one extra row to know whether another page exists
+        sql += " LIMIT %s"
+        args.append(limit + 1)
+
+    mapper = row_mappers.PROBLEM_SUMMARY if summary else row_mappers.PROBLEM
+
+    def build():
+        with connection.cursor() as cursor:
+            cursor.execute(sql, args)
+            rows = cursor.fetchall()
+
+            has_more = paginated and len(rows) > limit
+            if has_more:
+                rows = rows[:limit]
+            results = mapper.all(cursor, rows)
+
+        if not paginated:
+            return results
+
+        return {
+            "results": results,
+            "next_cursor": results[-1].pId if has_more else None,
+        }
+
+    cache_key = "&".join(f"{k}={v}" for k, vs in sorted(params.lists()) for v in vs)
+    return catalog_cache.cached_response(request, "list_problems", cache_key, build)
 
 
 # Get a single problem
 @api_view(['GET'])
 def get_problem(request, pid):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT 
-                p.Problem_ID,
-                p.Problem_description,
-                t.Tag_ID,
-                d.Difficulty_level,
-                c.SQL_concept,
-                p.Problem_title
-            FROM PROBLEM p
-            LEFT JOIN TAG t ON p.Tag_ID = t.Tag_ID
-            LEFT JOIN DIFFICULTY_TAG d ON t.Difficulty_ID = d.Difficulty_ID
-            LEFT JOIN CONCEPT_TAG c ON t.Concept_ID = c.Concept_ID
-            WHERE p.Problem_ID = %s AND p.Review_status = 1
-        """, [pid])
-
-        row = cursor.fetchone()
-
-        if row is None:
-            return JsonResponse({"error": "Problem not found"}, status=404)
-
-    problem_id = row[0]
-    description = row[1]
-    tag_id = row[2]
-    difficulty = row[3]
-    concept = row[4]
-    title = row[5]
-
-    # p_title = description.split("\n")[0][:80] if description else ""
-    concept_tags = (
-        [c.strip() for c in concept.split(",")] if concept else []
-    )
-
-    return JsonResponse({
-        "pId": problem_id,
-        "pTitle": title,
-        "difficultyTag": difficulty.capitalize() if difficulty else "",
-        "conceptTag": concept_tags,
-        "pDescription": description,
-        "pSolutionId": tag_id,
-        "reviewed": True
-    })
+    def build():
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT 
+                    p.Problem_ID,
+                    p.Problem_description,
+                    t.Tag_ID,
+                    d.Difficulty_level,
+                    c.SQL_concept,
+                    p.Problem_title,
+                    p.Review_status
+                FROM PROBLEM p
+                LEFT JOIN TAG t ON p.Tag_ID = t.Tag_ID
+                LEFT JOIN DIFFICULTY_TAG d ON t.Difficulty_ID = d.Difficulty_ID
+                LEFT JOIN CONCEPT_TAG c ON t.Concept_ID = c.Concept_ID
+                WHERE p.Problem_ID = %s AND p.Review_status = 1
+            """, [pid])
+            return row_mappers.PROBLEM_DETAIL.one(cursor)
+
+    response = catalog_cache.cached_response(request, "get_problem", pid, build)
+    if response is None:
+        return JsonResponse({"error": "Problem not found"}, status=404)
+    return response
 
 
 # Submit SQL answer
 @api_view(["POST"])
+@requires_principal(enforce=None)
 def submit_problem(request, pid):
     data = json.loads(request.body)
 
-    account_number = data["account_number"]
+    principal = request.principal
+    if principal is not None and not principal.is_admin:
+        # a signed-in student submits as themselves, whatever the body says
+        account_number = principal.account_number
+    else:
+        try:
+            account_number = int(data["account_number"])
+        except (KeyError, TypeError, ValueError):
+            return JsonResponse({"error": "account_number must be an integer"}, status=400)
     submission_text = data["submission"]
-    is_correct = data.get("is_correct", False)
-
-    now = datetime.datetime.now()
 
+    # checked up front: a write-behind row that violates SUBMISSION's foreign
+    # keys would only fail at flush time, after it was acknowledged
     with connection.cursor() as cursor:
         cursor.execute("""
-            INSERT INTO SUBMISSION
-            (Problem_ID, Account_number, Submission_description, Is_correct, Time_start, Time_end)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, [pid, account_number, submission_text, is_correct, now, now])
+            SELECT
+                EXISTS (SELECT 1 FROM PROBLEM WHERE Problem_ID = %s),
+                EXISTS (SELECT 1 FROM ACCOUNT WHERE Account_number = %s)
+        """, [pid, account_number])
+        problem_exists, account_exists = cursor.fetchone()
+    if not problem_exists:
+        return JsonResponse({"error": "Problem not found"}, status=404)
+    if not account_exists:
+        return JsonResponse({"error": "Account not found"}, status=404)
+
+    # grade on the server; a client-supplied is_correct is ignored. A submission
+    # that cannot be graded is not a wrong answer: nothing is stored
+    try:
+        is_correct = grade_submission(pid, submission_text)
+    except GradingUnavailable as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=503)
+    except GradingError as e:
+        return JsonResponse({"success": False, "error": str(e)}, status=422)
+
+    now = datetime.datetime.now()
+
+    if settings.SUBMISSION_WRITE_BEHIND:
+        # acknowledged once journaled; the flusher writes it to SUBMISSION
+        submission_buffer.enqueue(pid, account_number, submission_text, is_correct, now, now)
+        metrics.submissions.inc("submit", is_correct)
+        result = {"success": True, "is_correct": is_correct, "queued": True}
+    else:
+        # the dashboard rollups are updated in the same transaction as the insert
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO SUBMISSION
+                (Problem_ID, Account_number, Submission_description, Is_correct, Time_start, Time_end)
+                VALUES (%s, %s, %s, %s, %s, %s)
+            """, [pid, account_number, submission_text, is_correct, now, now])
+            rollups.record_submission(cursor, account_number, pid, is_correct, now)
+
+        versions.bump(versions.SUBMISSIONS)
+        metrics.submissions.inc("submit", is_correct)
+        metrics.submission_rows.inc("direct")
+        result = {"success": True, "is_correct": is_correct}
 
-    return JsonResponse({"success": True})
+    return JsonResponse(result)
 
 
 #add problem
 @api_view(["POST"])
+@requires_principal(admin=True, enforce=None)
 def add_problem(request):
     """
     Add a new problem into PROBLEM table
@@ -169,11 +243,13 @@ def add_problem(request):
         cursor.execute("SELECT LAST_INSERT_ID()")
         new_id = cursor.fetchone()[0]
 
+    catalog_cache.bump_version()
     return JsonResponse({"success": True, "problem_id": new_id})
 
 
 #delete problem
 @api_view(["DELETE"])
+@requires_principal(admin=True, enforce=None)
 def delete_problem(request, pid):
     with connection.cursor() as cursor:
         cursor.execute("DELETE FROM PROBLEM WHERE Problem_ID = %s", [pid])
@@ -182,10 +258,12 @@ def delete_problem(request, pid):
     if deleted == 0:
         return JsonResponse({"error": "Problem not found"}, status=404)
 
+    catalog_cache.bump_version()
     return JsonResponse({"success": True, "deleted_id": pid})
 
 
 @api_view(["PUT"])
+@requires_principal(admin=True, enforce=None)
 def update_problem(request, pid):
     """
     Update SQL problem fields from frontend
@@ -217,10 +295,12 @@ def update_problem(request, pid):
     if updated == 0:
         return JsonResponse({"error": "Problem not found"}, status=404)
 
+    catalog_cache.bump_version()
     return JsonResponse({"success": True, "updated_id": pid})
 
 
 @api_view(['POST'])
+@requires_principal(admin=True, enforce=None)
 def publish_problem(request, pid):
     try:
         with connection.cursor() as cursor:
@@ -230,6 +310,7 @@ def publish_problem(request, pid):
                 WHERE Problem_ID = %s
             """, [pid])
 
+        catalog_cache.bump_version()
         return JsonResponse({"success": True})
 
     except Exception as e:
@@ -8,6 +8,8 @@ from django.db import connection
 from django.http import JsonResponse
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from api.auth_tokens import requires_principal
+from api.grading import invalidate_reference
 
 @api_view(['GET'])
 def get_solution(request, pId):
@@ -35,6 +37,7 @@ def get_solution(request, pId):
 
 
 @api_view(['POST'])
+@requires_principal(admin=True, enforce=None)
 def add_solution(request):
     data = json.loads(request.body)
     pId = data.get('pId')
@@ -57,7 +60,8 @@ def add_solution(request):
             else:
                 # Insert new
                 cursor.execute("INSERT INTO SOLUTION (Problem_ID, Solution_Description) VALUES (%s, %s)", [pId, sDescription])
-            
+
+            invalidate_reference(pId)
             return Response({
                 'success': True
             })
@@ -69,6 +73,7 @@ def add_solution(request):
 
 
 @api_view(['PUT'])
+@requires_principal(admin=True, enforce=None)
 def update_solution(request, pid):
     data = json.loads(request.body)
     sDescription = data.get('sDescription')
@@ -81,6 +86,7 @@ def update_solution(request, pid):
     try:
         with connection.cursor() as cursor:
             cursor.execute("UPDATE SOLUTION SET Solution_Description = %s WHERE Problem_ID = %s", [sDescription, pid])
+            invalidate_reference(pid)
             return Response({
                 'success': True
             })
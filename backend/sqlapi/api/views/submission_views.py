@@ -1,23 +1,105 @@
 """
-- list-submissions: returns all submissions for a given user
+- list-submissions: returns a user's submissions (filterable, optional keyset pagination with summary counts)
+- submit_batch: grades and stores many submissions (across problems) in one request
+- submission_buffer_stats: depth and flush counters of the write-behind buffer
 """
+import datetime
+import json
+from django.conf import settings
 from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.db import connection
+from django.db import connection, transaction
+from api import metrics, query_params, rollups, submission_buffer, versions
+from api.auth_tokens import requires_principal
+from api.fast_json import FastJsonResponse
+from api.grading import GradingError, grade_submission
+
+HISTORY_PAGE_SIZE_DEFAULT = 50
+HISTORY_PAGE_SIZE_MAX = 200
+
 
 @api_view(["GET"])
+@requires_principal(account_kwarg="account_number", enforce=None)
 def list_submissions(request, account_number):
-    with connection.cursor() as cursor:
-        cursor.execute("""
-            SELECT Submission_ID, Problem_ID, Is_correct, Time_start, Time_end
-            FROM SUBMISSION
-            WHERE Account_number = %s
-        """, [account_number])
+    """
+    Query params (all optional):
+    - problem_id: only submissions to this problem
+    - correct:    true / false
+    - limit, cursor: keyset pagination, newest first (Time_start, Submission_ID).
+      When either is given the response is
+      {"results": [...], "next_cursor": <opaque str or null>, "summary": {...}}
+      otherwise the full (filtered) list is returned. summary counts every
+      submission matching problem_id/correct, not only the page, and is sent
+      with the first page (no cursor) only.
+    Served by the SUBMISSION (Account_number, Time_start, Submission_ID) index
+    (migration 0001; part of the seeding schema).
+    """
+    params = request.query_params
+
+    try:
+        problem_id = int(params["problem_id"]) if params.get("problem_id") else None
+        correct = query_params.parse_bool(params.get("correct"))
+        cursor_key = query_params.decode_cursor(params["cursor"]) if params.get("cursor") else None
+        limit = int(params["limit"]) if params.get("limit") else None
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    paginated = limit is not None or cursor_key is not None
+    if paginated:
+        limit = min(max(limit or HISTORY_PAGE_SIZE_DEFAULT, 1), HISTORY_PAGE_SIZE_MAX)
+
+    where = ["Account_number = %s"]
+    args = [account_number]
+    if problem_id is not None:
+        where.append("Problem_ID = %s")
+        args.append(problem_id)
+    if correct is not None:
+        where.append("Is_correct = %s")
+        args.append(1 if correct else 0)
 
+    page_where = list(where)
+    page_args = list(args)
+    if cursor_key is not None:
+        page_where.append("(Time_start, Submission_ID) < (%s, %s)")
+        page_args.extend(cursor_key)
+
+    sql = f"""
+        SELECT Submission_ID, Problem_ID, Is_correct, Time_start, Time_end
+        FROM SUBMISSION
+        WHERE {" AND ".join(page_where)}
+    """
+    if paginated:
+        # fetch one extra row to know whether another page exists
+        sql += " ORDER BY Time_start DESC, Submission_ID DESC LIMIT %s"
+        page_args.append(limit + 1)
+
+    summary = None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, page_args)
         rows = cursor.fetchall()
 
-    return JsonResponse([
+        if paginated and cursor_key is None:
+            cursor.execute(f"""
+                SELECT
+                    COUNT(*),
+                    SUM(CASE WHEN Is_correct = TRUE THEN 1 ELSE 0 END),
+                    COUNT(DISTINCT Problem_ID),
+                    COUNT(DISTINCT CASE WHEN Is_correct = TRUE THEN Problem_ID END)
+                FROM SUBMISSION
+                WHERE {" AND ".join(where)}
+            """, args)
+            total, correct_count, attempted, solved = cursor.fetchone()
+            summary = {
+                "total_submissions": total,
+                "correct_submissions": int(correct_count or 0),
+                "problems_attempted": attempted,
+                "problems_solved": solved,
+            }
+
+    results = [
         {
             "submission_id": r[0],
             "problem_id": r[1],
@@ -25,4 +107,209 @@ def list_submissions(request, account_number):
             "time_start": r[3],
             "time_end": r[4],
         } for r in rows
-    ], safe=False)
+    ]
+
+    if not paginated:
+        return FastJsonResponse(results)
+
+    has_more = len(results) > limit
+    results = results[:limit]
+    next_cursor = None
+    if has_more:
+        last = results[-1]
+        next_cursor = query_params.encode_cursor(last["time_start"], last["submission_id"])
+
+    body = {"results": results, "next_cursor": next_cursor}
+    if summary is not None:
+        body["summary"] = summary
+    return FastJsonResponse(body)
+
+
+def _parse_batch_item(item, now):
+    """
+    Check one batch entry's fields. Returns
+    (problem_id, account_number, submission, time_start, time_end).
+    """
+    if not isinstance(item, dict):
+        raise ValueError("each submission must be an object")
+
+    try:
+        problem_id = int(item["problem_id"])
+        account_number = int(item["account_number"])
+    except KeyError as e:
+        raise ValueError(f"missing field {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("problem_id and account_number must be integers")
+
+    submission = item.get("submission")
+    if not isinstance(submission, str) or not submission.strip():
+        raise ValueError("missing field submission")
+
+    times = []
+    for field in ("time_start", "time_end"):
+        value = item.get(field)
+        if value is None:
+            times.append(now)
+            continue
+        parsed = parse_datetime(value) if isinstance(value, str) else None
+        if parsed is None:
+            raise ValueError(f"{field} must be an ISO 8601 datetime")
+        if timezone.is_aware(parsed):
+            # stored naive, like the datetime.now() of the other submit paths
+            parsed = timezone.make_naive(parsed)
+        times.append(parsed)
+
+    time_start, time_end = times
+    if time_start > time_end:
+        raise ValueError("time_start must not be after time_end")
+    cutoff = rollups.daily_cutoff()
+    if time_start.date() < cutoff:
+        raise ValueError(f"time_start must not be before {cutoff.isoformat()}")
+
+    return problem_id, account_number, submission, time_start, time_end
+
+
+def _existing_ids(cursor, table, column, ids):
+    if not ids:
+        return set()
+    ids = sorted(ids)
+    cursor.execute(
+        f"SELECT {column} FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(ids))})",
+        ids,
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+@api_view(["POST"])
+@requires_principal(enforce=None)
+def submit_batch(request):
+    """
+    Grade and store many submissions at once (lab sessions, offline clients).
+
+    URL:
+        POST /submissions/batch/
+
+    Request body (JSON):
+        {
+            "submissions": [
+                {
+                    "problem_id": 1,
+                    "account_number": 42,
+                    "submission": "SELECT ...",
+                    "time_start": "2026-10-01T10:00:00",   (optional, default now;
+                                                             not before the daily
+                                                             bucket cutoff)
+                    "time_end": "2026-10-01T10:05:00"      (optional, default now;
+                                                             not before time_start)
+                },
+                ...
+            ]
+        }
+
+    With a non-admin token every entry is stored under the caller's account,
+    whatever its account_number says (which may then be left out); admins may
+    submit for any account.
+
+    Every entry is graded on the server like submit_problem (identical answers to
+    the same problem are graded once); an entry that cannot be graded is
+    reported with success false and not stored. Entries that pass validation are written
+    with one multi-row INSERT, together with the rollups, in a single transaction.
+
+    Response (JSON):
+        {
+            "success": true,
+            "inserted": n,
+            "results": [
+                {"index": 0, "success": true, "is_correct": true},
+                {"index": 1, "success": false, "error": "<grading error>"},
+                {"index": 2, "success": false, "error": "<why the entry was rejected>"},
+                ...
+            ]
+        }
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({"error": "invalid JSON body"}, status=400)
+
+    items = data.get("submissions") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "field 'submissions' must be a non-empty list"}, status=400)
+    if len(items) > settings.SUBMISSION_BATCH_MAX_ITEMS:
+        return JsonResponse(
+            {"error": f"at most {settings.SUBMISSION_BATCH_MAX_ITEMS} submissions per batch"},
+            status=400,
+        )
+
+    now = datetime.datetime.now()
+    principal = request.principal
+    own_account = principal.account_number if principal and not principal.is_admin else None
+    results = [None] * len(items)
+    parsed = {}
+    for index, item in enumerate(items):
+        if own_account is not None and isinstance(item, dict):
+            item = {**item, "account_number": own_account}
+        try:
+            parsed[index] = _parse_batch_item(item, now)
+        except ValueError as e:
+            results[index] = {"index": index, "success": False, "error": str(e)}
+
+    # 1. Check every referenced problem and account with one query each
+    with connection.cursor() as cursor:
+        problems = _existing_ids(cursor, "PROBLEM", "Problem_ID", {p[0] for p in parsed.values()})
+        accounts = _existing_ids(cursor, "ACCOUNT", "Account_number", {p[1] for p in parsed.values()})
+
+    # 2. Grade; each distinct (problem, answer) pair runs once
+    graded = {}
+    rows = []
+    for index, (problem_id, account_number, submission, time_start, time_end) in parsed.items():
+        if problem_id not in problems:
+            results[index] = {"index": index, "success": False, "error": "Problem not found"}
+            continue
+        if account_number not in accounts:
+            results[index] = {"index": index, "success": False, "error": "Account not found"}
+            continue
+
+        key = (problem_id, submission)
+        if key not in graded:
+            try:
+                graded[key] = (grade_submission(problem_id, submission), None)
+            except GradingError as e:
+                graded[key] = (None, str(e))
+        is_correct, grading_error = graded[key]
+
+        if grading_error:
+            # not gradable is not a wrong answer: the entry is not stored
+            results[index] = {"index": index, "success": False, "error": grading_error}
+            continue
+        rows.append((problem_id, account_number, submission, is_correct, time_start, time_end))
+        results[index] = {"index": index, "success": True, "is_correct": is_correct}
+
+    # 3. One multi-row insert per chunk, with the rollups, in one transaction
+    if rows:
+        with transaction.atomic(), connection.cursor() as cursor:
+            submission_buffer.insert_submissions(cursor, rows)
+
+        versions.bump(versions.SUBMISSIONS)
+        for row in rows:
+            metrics.submissions.inc("batch", row[3])
+        metrics.submission_rows.inc("batch", amount=len(rows))
+
+    return JsonResponse({"success": True, "inserted": len(rows), "results": results})
+
+
+@api_view(["GET"])
+@requires_principal(admin=True, enforce=None)
+def submission_buffer_stats(request):
+    """
+    Write-behind buffer metrics for this worker (see api/submission_buffer.py).
+
+    URL:
+        GET /submissions/buffer/
+
+    Response (JSON):
+        {"enabled": bool, "depth": rows not yet in SUBMISSION, "flushes": n,
+         "flushed_rows": n, "last_flush_ms": ms, "errors": n, "last_error": "...",
+         "dead_rows": rows moved to a .dead file}
+    """
+    return Response(submission_buffer.stats())
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sqlapi.settings')
 
 application = get_asgi_application()
+
+# replay write-behind journals left by crashed workers (no-op unless enabled)
+from api import submission_buffer  # noqa: E402
+
+submission_buffer.start()
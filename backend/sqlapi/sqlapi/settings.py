@@ -14,6 +14,8 @@ from pathlib import Path
 import pymysql
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 pymysql.install_as_MySQLdb()
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -23,11 +25,20 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
-# SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = 'django-insecure-p=ee^s4!#(=@uaik8-f*na1)07+-0q0=kvlrh%--4r#6dx2sk-'
-
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DJANGO_DEBUG: on by default so a dev checkout runs (runserver, test) as is;
+# deployments set DJANGO_DEBUG=0 (`manage.py check --deploy` flags it otherwise)
+DEBUG = os.environ.get('DJANGO_DEBUG', '1').lower() in ('1', 'true', 'yes')
+
+# SECURITY WARNING: keep the secret key used in production secret!
+# DJANGO_SECRET_KEY signs the session tokens (api/auth_tokens.py) and is
+# required when DEBUG is off; with DEBUG on the development key below is used
+# when it is unset.
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+if not SECRET_KEY:
+    if not DEBUG:
+        raise ImproperlyConfigured('DJANGO_SECRET_KEY must be set when DJANGO_DEBUG is off')
+    SECRET_KEY = 'django-insecure-p=ee^s4!#(=@uaik8-f*na1)07+-0q0=kvlrh%--4r#6dx2sk-'
 
 ALLOWED_HOSTS = ["*"]
 
@@ -47,6 +58,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.request_timing.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -91,6 +104,34 @@ DATABASES = {
     }
 }
 
+# DB_NAME / DB_USER / DB_PASSWORD / DB_HOST / DB_PORT override the connection
+# above when set (e.g. to point tools at a local MySQL stand-in)
+for _key in ('NAME', 'USER', 'PASSWORD', 'HOST', 'PORT'):
+    if os.environ.get(f'DB_{_key}'):
+        DATABASES['default'][_key] = os.environ[f'DB_{_key}']
+
+# Connection handling (DB_CONN_MODE):
+# - "none":       open a new connection for every request
+# - "persistent": keep one connection per worker thread for DB_CONN_MAX_AGE seconds
+# - "pooled":     per-worker pool of DB_POOL_SIZE connections (api/mysql_pool),
+#                 each recycled after DB_CONN_MAX_AGE seconds
+# Reused connections are health-checked before use in both reuse modes.
+DB_CONN_MODE = os.environ.get('DB_CONN_MODE', 'persistent')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '300'))
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '5'))
+
+if DB_CONN_MODE == 'persistent':
+    DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+elif DB_CONN_MODE == 'pooled':
+    DATABASES['default']['ENGINE'] = 'api.mysql_pool'
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['POOL'] = {
+        'SIZE': DB_POOL_SIZE,
+        'MAX_AGE': DB_CONN_MAX_AGE,
+        'PRE_PING': True,
+    }
+
 # GCP database configuration
 # DATABASES = {
 #     'default': {
@@ -134,6 +175,135 @@ DATABASES = {
 # }
 
 
+# Cache
+# Holds the version counters behind catalog invalidation and ETags (api/versions.py)
+# and the grading references, so every worker must see the same one. The default,
+# a directory under var/, is shared by the workers of one host; with several hosts
+# use a network backend (e.g. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# CACHE_LOCATION=redis://...). A per-process backend such as LocMemCache fails the
+# api.W001 system check.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', str(BASE_DIR / 'var' / 'cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', '10000')),
+        },
+    }
+}
+
+# Max serialized catalog responses (problem/tag lists) kept in each worker
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', '512'))
+
+# nl2sql caches (per worker): generated SQL per normalized question, and
+# optionally result rows per SQL with a shorter TTL (0 disables a cache)
+NL2SQL_CACHE_MAX_ENTRIES = int(os.environ.get('NL2SQL_CACHE_MAX_ENTRIES', '1024'))
+NL2SQL_SQL_TTL = int(os.environ.get('NL2SQL_SQL_TTL', '86400'))
+NL2SQL_RESULT_TTL = int(os.environ.get('NL2SQL_RESULT_TTL', '60'))
+
+# nl2sql result limits: rows returned in a JSON response, rows sent on an
+# NDJSON stream, and rows pulled from the server per fetch
+NL2SQL_MAX_ROWS = int(os.environ.get('NL2SQL_MAX_ROWS', '1000'))
+NL2SQL_STREAM_MAX_ROWS = int(os.environ.get('NL2SQL_STREAM_MAX_ROWS', '100000'))
+NL2SQL_FETCH_CHUNK = int(os.environ.get('NL2SQL_FETCH_CHUNK', '500'))
+
+# nl2sql guards: per-statement execution limit in ms (MAX_EXECUTION_TIME hint),
+# and max rows EXPLAIN may estimate a query examines (0 disables either)
+NL2SQL_MAX_EXECUTION_MS = int(os.environ.get('NL2SQL_MAX_EXECUTION_MS', '5000'))
+NL2SQL_MAX_ESTIMATED_ROWS = int(os.environ.get('NL2SQL_MAX_ESTIMATED_ROWS', '1000000'))
+
+# Grading: submissions and reference solutions run against a dedicated alias
+# holding the fixture dataset, configured with GRADING_DB_NAME / GRADING_DB_USER /
+# GRADING_DB_PASSWORD / GRADING_DB_HOST / GRADING_DB_PORT (unset parts come from
+# the default connection). Grading is refused until it is configured; it never
+# runs on the live "default" database.
+if os.environ.get('GRADING_DB_NAME'):
+    DATABASES['grading'] = dict(DATABASES['default'])
+    for _key in ('NAME', 'USER', 'PASSWORD', 'HOST', 'PORT'):
+        if os.environ.get(f'GRADING_DB_{_key}'):
+            DATABASES['grading'][_key] = os.environ[f'GRADING_DB_{_key}']
+GRADING_DATABASE = os.environ.get('GRADING_DB_ALIAS', 'grading')
+GRADING_MAX_ROWS = int(os.environ.get('GRADING_MAX_ROWS', '10000'))
+# per-statement execution limit in ms for submissions and reference solutions
+GRADING_MAX_EXECUTION_MS = int(os.environ.get('GRADING_MAX_EXECUTION_MS', str(NL2SQL_MAX_EXECUTION_MS)))
+# comma-separated tables submissions may read besides those the problem's
+# reference solution reads (default: the problem catalog)
+GRADING_ALLOWED_TABLES = [
+    t.strip() for t in os.environ.get(
+        'GRADING_ALLOWED_TABLES', 'PROBLEM,TAG,DIFFICULTY_TAG,CONCEPT_TAG'
+    ).split(',') if t.strip()
+]
+
+# Batch submission endpoint: max entries per request, rows per INSERT statement
+SUBMISSION_BATCH_MAX_ITEMS = int(os.environ.get('SUBMISSION_BATCH_MAX_ITEMS', '1000'))
+SUBMISSION_BATCH_INSERT_ROWS = int(os.environ.get('SUBMISSION_BATCH_INSERT_ROWS', '500'))
+
+# Write-behind submissions: when enabled, submit_problem acknowledges after an
+# fsynced append to a local journal and a background thread group-commits to
+# SUBMISSION every SUBMISSION_FLUSH_INTERVAL_MS or SUBMISSION_FLUSH_MAX_ROWS rows
+SUBMISSION_WRITE_BEHIND = os.environ.get('SUBMISSION_WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+SUBMISSION_BUFFER_DIR = os.environ.get('SUBMISSION_BUFFER_DIR', str(BASE_DIR / 'var' / 'submission-buffer'))
+SUBMISSION_FLUSH_INTERVAL_MS = int(os.environ.get('SUBMISSION_FLUSH_INTERVAL_MS', '200'))
+SUBMISSION_FLUSH_MAX_ROWS = int(os.environ.get('SUBMISSION_FLUSH_MAX_ROWS', '200'))
+
+# Accounts removed per transaction by POST /users/bulk-delete/
+USER_DELETE_CHUNK = int(os.environ.get('USER_DELETE_CHUNK', '100'))
+
+# Parsed SQL validation results kept per worker, keyed by SQL hash
+SQL_VALIDATOR_CACHE_MAX_ENTRIES = int(os.environ.get('SQL_VALIDATOR_CACHE_MAX_ENTRIES', '2048'))
+SQL_VALIDATOR_CACHE_TTL = int(os.environ.get('SQL_VALIDATOR_CACHE_TTL', '86400'))
+
+
+# Submission analytics: days of daily buckets kept before they are compacted
+# into weekly ones (python manage.py compact_buckets)
+ANALYTICS_DAILY_RETENTION_DAYS = int(os.environ.get('ANALYTICS_DAILY_RETENTION_DAYS', '28'))
+
+# Session tokens (api/auth_tokens.py): lifetime of a token issued at login,
+# resolved principals cached per worker (entries, seconds; also the longest a
+# revoked token stays usable on another worker), and whether account, admin and
+# catalog management routes refuse requests without a token. Until the frontend
+# sends tokens this stays off; a token that is sent is always checked.
+AUTH_TOKEN_MAX_AGE = int(os.environ.get('AUTH_TOKEN_MAX_AGE', str(7 * 24 * 3600)))
+AUTH_PRINCIPAL_CACHE_MAX_ENTRIES = int(os.environ.get('AUTH_PRINCIPAL_CACHE_MAX_ENTRIES', '10000'))
+AUTH_PRINCIPAL_TTL = int(os.environ.get('AUTH_PRINCIPAL_TTL', '60'))
+AUTH_REQUIRE_TOKENS = os.environ.get('AUTH_REQUIRE_TOKENS', '').lower() in ('1', 'true', 'yes')
+
+# Request timing (api/request_timing.py): share of requests (0.0-1.0) that get a
+# Server-Timing header and a JSON log line on the "api.timing" logger
+REQUEST_TIMING_SAMPLE_RATE = float(os.environ.get('REQUEST_TIMING_SAMPLE_RATE', '0.1'))
+
+# Query statistics (api/query_stats.py): statements slower than SLOW_QUERY_MS are
+# logged to "api.slow_query" (0 disables), and at most QUERY_STATS_MAX_FINGERPRINTS
+# distinct statements are tracked per worker (GET /admin/query-stats/)
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '500'))
+QUERY_STATS_MAX_FINGERPRINTS = int(os.environ.get('QUERY_STATS_MAX_FINGERPRINTS', '1000'))
+
+# Prometheus metrics (api/metrics.py, GET /metrics): each worker writes its values
+# to METRICS_DIR every METRICS_WRITE_INTERVAL seconds and a scrape sums them
+# (empty METRICS_DIR: report only the worker that serves the scrape)
+METRICS_DIR = os.environ.get('METRICS_DIR', str(BASE_DIR / 'var' / 'metrics'))
+METRICS_WRITE_INTERVAL = float(os.environ.get('METRICS_WRITE_INTERVAL', '5'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.timing': {
+            'handlers': ['console'],
+            'level': os.environ.get('REQUEST_TIMING_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+        'api.slow_query': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -15,21 +15,24 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.urls import path
-from api.views.auth_views import signup, login, get_profile, update_profile, list_users, delete_user
+from api.views.auth_views import signup, login, logout, get_profile, update_profile, list_users, delete_user, bulk_delete_users
 from api.views.problem_views import list_problems, get_problem, submit_problem, add_problem, delete_problem,update_problem, publish_problem
 from api.views.tag_views import list_tags, list_tag_problems
-from api.views.submission_views import list_submissions
-from api.views.chat_views import nl2sql
-from api.views.admin_views import admin_user_stats, admin_problem_stats
+from api.views.submission_views import list_submissions, submit_batch, submission_buffer_stats
+from api.views.chat_views import nl2sql, nl2sql_async, nl2sql_guard_stats
+from api.views.admin_views import admin_user_stats, admin_problem_stats, admin_submission_analytics, admin_query_stats
 from api.views.solution_views import get_solution, add_solution, update_solution
+from api.views.metrics_views import metrics_view
 
 
 urlpatterns = [
     path("auth/signup/", signup),
     path("auth/login/", login),
+    path("auth/logout/", logout),
     path("profile/<int:account_number>/", get_profile),
     path("profile/<int:account_number>/update/", update_profile),
     path("users/", list_users),
+    path("users/bulk-delete/", bulk_delete_users),
     path("users/<int:account_number>/", delete_user),
    
     path("problems/<int:pid>/update/", update_problem),
@@ -47,11 +50,19 @@ urlpatterns = [
     path("tags/", list_tags),
     path("tags/<int:tag_id>/problems/", list_tag_problems),
 
+    path("submissions/batch/", submit_batch),
+    path("submissions/buffer/", submission_buffer_stats),
     path("submissions/<int:account_number>/", list_submissions),
 
     path("nl2sql/", nl2sql),
+    path("nl2sql/async/", nl2sql_async),
+    path("nl2sql/guards/", nl2sql_guard_stats),
     
     path("admin/user-stats/", admin_user_stats),
     path("admin/problem-stats/", admin_problem_stats),
+    path("admin/submission-analytics/", admin_submission_analytics),
+    path("admin/query-stats/", admin_query_stats),
+
+    path("metrics", metrics_view),
 
 ]
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'sqlapi.settings')
 
 application = get_wsgi_application()
+
+# replay write-behind journals left by crashed workers (no-op unless enabled)
+from api import submission_buffer  # noqa: E402
+
+submission_buffer.start()
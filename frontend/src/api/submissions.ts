@@ -43,7 +43,10 @@ export async function submitProblemApi(
   );
 
   if (!response.ok) {
-    throw new Error("Failed to submit problem");
+    // 422: the answer could not be graded, 503: grading is unavailable;
+    // neither is stored as a submission
+    const body = await response.json().catch(() => ({}));
+    throw new Error(body.error || "Failed to submit problem");
   }
 
   return response.json();